@@ -207,45 +207,94 @@ function actualizarContadoresEnBotones(evaluaciones) {
 // ESTADÍSTICAS GLOBALES DEL LABORATORIO
 // ============================================
 
+// Antigüedad máxima del archivo de estadísticas para usar sus totales en lugar
+// de consultar la tabla (se regenera con agregar_evaluaciones.py)
+const MAX_ANTIGUEDAD_ESTADISTICAS_MS = 24 * 60 * 60 * 1000;
+
 /**
- * Obtener estadísticas globales del laboratorio
- * @returns {Object} {totalEvaluaciones, porcentajeUtiles, porcentajeMejorables, totalSugerencias}
+ * Totales globales del archivo de estadísticas precalculadas
+ * (procesamiento/scripts/agregar_evaluaciones.py, campo `totales`). Cuentan
+ * las mismas filas que las consultas de contarTotalesEnTabla: todas las
+ * nota_eval, los votos 'up' y 'down' y todas las falta_nota.
+ * @returns {Object|null} {totalEvaluaciones, utiles, mejorables, totalSugerencias}, o null si
+ *   el archivo no existe, no tiene totales o tiene más de MAX_ANTIGUEDAD_ESTADISTICAS_MS
  */
-async function obtenerEstadisticasGlobales() {
+async function cargarTotalesPrecalculados() {
   try {
-    // 1. Total de evaluaciones de notas (nota_eval)
-    const { count: totalEvaluaciones, error: errorEval } = await window.supabaseClient
-      .from('evaluaciones')
-      .select('*', { count: 'exact', head: true })
-      .eq('event_type', 'nota_eval');
+    const response = await fetch('../assets/datos/evaluaciones-stats.json', { cache: 'no-cache' });
+    if (!response.ok) return null;
+    const stats = await response.json();
+    if (!stats.totales) return null;
+
+    const actualizado = Date.parse(stats.actualizado);
+    if (!(Date.now() - actualizado <= MAX_ANTIGUEDAD_ESTADISTICAS_MS)) {
+      console.warn('[EvalStats] Estadísticas precalculadas desactualizadas:', stats.actualizado);
+      return null;
+    }
 
-    if (errorEval) throw errorEval;
+    return {
+      totalEvaluaciones: stats.totales.evaluaciones,
+      utiles: stats.totales.utiles,
+      mejorables: stats.totales.mejorables,
+      totalSugerencias: stats.totales.sugerencias
+    };
+  } catch (err) {
+    console.warn('No se pudieron cargar los totales precalculados:', err);
+    return null;
+  }
+}
 
-    // 2. Contar evaluaciones por tipo (útiles vs mejorables)
-    const { data: evaluacionesPorTipo, error: errorTipos } = await window.supabaseClient
-      .from('evaluaciones')
-      .select('vote')
-      .eq('event_type', 'nota_eval');
+/**
+ * Contar los totales globales consultando la tabla evaluaciones
+ * @returns {Object} {totalEvaluaciones, utiles, mejorables, totalSugerencias}
+ */
+async function contarTotalesEnTabla() {
+  // 1. Total de evaluaciones de notas (nota_eval)
+  const { count: totalEvaluaciones, error: errorEval } = await window.supabaseClient
+    .from('evaluaciones')
+    .select('*', { count: 'exact', head: true })
+    .eq('event_type', 'nota_eval');
 
-    if (errorTipos) throw errorTipos;
+  if (errorEval) throw errorEval;
 
-    let utiles = 0;
-    let mejorables = 0;
+  // 2. Contar evaluaciones por tipo (útiles vs mejorables)
+  const { data: evaluacionesPorTipo, error: errorTipos } = await window.supabaseClient
+    .from('evaluaciones')
+    .select('vote')
+    .eq('event_type', 'nota_eval');
 
-    evaluacionesPorTipo?.forEach(ev => {
-      if (ev.vote === 'up') utiles++;
-      else if (ev.vote === 'down') mejorables++;
-    });
+  if (errorTipos) throw errorTipos;
 
-    // 3. Total de sugerencias de notas nuevas (falta_nota)
-    const { count: totalSugerencias, error: errorSug } = await window.supabaseClient
-      .from('evaluaciones')
-      .select('*', { count: 'exact', head: true })
-      .eq('event_type', 'falta_nota');
+  let utiles = 0;
+  let mejorables = 0;
 
-    if (errorSug) throw errorSug;
+  evaluacionesPorTipo?.forEach(ev => {
+    if (ev.vote === 'up') utiles++;
+    else if (ev.vote === 'down') mejorables++;
+  });
+
+  // 3. Total de sugerencias de notas nuevas (falta_nota)
+  const { count: totalSugerencias, error: errorSug } = await window.supabaseClient
+    .from('evaluaciones')
+    .select('*', { count: 'exact', head: true })
+    .eq('event_type', 'falta_nota');
+
+  if (errorSug) throw errorSug;
+
+  return { totalEvaluaciones, utiles, mejorables, totalSugerencias };
+}
+
+/**
+ * Obtener estadísticas globales del laboratorio
+ * @returns {Object} {totalEvaluaciones, porcentajeUtiles, porcentajeMejorables, totalSugerencias}
+ */
+async function obtenerEstadisticasGlobales() {
+  try {
+    // Totales precalculados; si no están disponibles se consulta la tabla
+    const { totalEvaluaciones, utiles, mejorables, totalSugerencias } =
+      (await cargarTotalesPrecalculados()) || (await contarTotalesEnTabla());
 
-    // 4. Calcular porcentajes
+    // Calcular porcentajes
     const total = utiles + mejorables;
     const porcentajeUtiles = total > 0 ? Math.round((utiles / total) * 100) : 0;
     const porcentajeMejorables = total > 0 ? Math.round((mejorables / total) * 100) : 0;
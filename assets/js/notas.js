@@ -2,6 +2,22 @@
 // GESTIÓN DE NOTAS
 // ============================================
 
+/**
+ * Cargar los contadores de evaluaciones por nota del archivo de estadísticas
+ * @returns {Object|null} {nota_id: {total, utiles, mejorables, falta_nota}} o null si no existe
+ */
+async function cargarContadoresPrecalculados() {
+  try {
+    const response = await fetch('../assets/datos/evaluaciones-stats.json', { cache: 'no-cache' });
+    if (!response.ok) return null;
+    const stats = await response.json();
+    return stats.notas || null;
+  } catch (err) {
+    console.warn('No se pudieron cargar los contadores precalculados:', err);
+    return null;
+  }
+}
+
 /**
  * Cargar todas las notas activas (con caché)
  */
@@ -22,54 +38,64 @@ async function cargarNotasActivas() {
     return [];
   }
   
-  // Cargar contadores de evaluaciones para cada nota
-  try {
-    const { data: evaluaciones, error: evalError } = await window.supabaseClient
-      .from('evaluaciones')
-      .select('nota_id, vote')
-      .not('nota_id', 'is', null);  // Solo evaluaciones con nota_id
+  // Contadores precalculados (procesamiento/scripts/agregar_evaluaciones.py);
+  // si no están disponibles se cuentan a partir de la tabla evaluaciones
+  const precalculados = await cargarContadoresPrecalculados();
+  if (precalculados) {
+    notas.forEach(nota => {
+      nota.evaluaciones = precalculados[nota.nota_id] || { total: 0, utiles: 0, mejorables: 0 };
+    });
+    console.log('✓ Contadores de evaluaciones precalculados');
+  } else {
+    // Cargar contadores de evaluaciones para cada nota
+    try {
+      const { data: evaluaciones, error: evalError } = await window.supabaseClient
+        .from('evaluaciones')
+        .select('nota_id, vote')
+        .not('nota_id', 'is', null);  // Solo evaluaciones con nota_id
     
-    console.log('Evaluaciones cargadas:', evaluaciones?.length || 0);
+      console.log('Evaluaciones cargadas:', evaluaciones?.length || 0);
     
-    if (!evalError && evaluaciones && evaluaciones.length > 0) {
-      // Debug: mostrar primeras evaluaciones
-      console.log('Ejemplo de evaluaciones:', evaluaciones.slice(0, 3));
+      if (!evalError && evaluaciones && evaluaciones.length > 0) {
+        // Debug: mostrar primeras evaluaciones
+        console.log('Ejemplo de evaluaciones:', evaluaciones.slice(0, 3));
       
-      // Crear mapa de contadores por nota_id
-      const contadores = {};
-      evaluaciones.forEach(e => {
-        if (!e.nota_id) return; // Saltar si no hay nota_id
+        // Crear mapa de contadores por nota_id
+        const contadores = {};
+        evaluaciones.forEach(e => {
+          if (!e.nota_id) return; // Saltar si no hay nota_id
         
-        if (!contadores[e.nota_id]) {
-          contadores[e.nota_id] = { total: 0, utiles: 0, mejorables: 0 };
-        }
-        contadores[e.nota_id].total++;
-        // Soportar ambos formatos de vote: up/down y util/mejorable
-        if (e.vote === 'up' || e.vote === 'util') contadores[e.nota_id].utiles++;
-        if (e.vote === 'down' || e.vote === 'mejorable') contadores[e.nota_id].mejorables++;
-      });
+          if (!contadores[e.nota_id]) {
+            contadores[e.nota_id] = { total: 0, utiles: 0, mejorables: 0 };
+          }
+          contadores[e.nota_id].total++;
+          // Soportar ambos formatos de vote: up/down y util/mejorable
+          if (e.vote === 'up' || e.vote === 'util') contadores[e.nota_id].utiles++;
+          if (e.vote === 'down' || e.vote === 'mejorable') contadores[e.nota_id].mejorables++;
+        });
       
-      console.log('Contadores generados:', Object.keys(contadores).length, 'notas con evaluaciones');
-      console.log('Ejemplo de contadores:', Object.entries(contadores).slice(0, 3));
+        console.log('Contadores generados:', Object.keys(contadores).length, 'notas con evaluaciones');
+        console.log('Ejemplo de contadores:', Object.entries(contadores).slice(0, 3));
       
-      // Agregar contadores a cada nota
-      notas.forEach(nota => {
-        nota.evaluaciones = contadores[nota.nota_id] || { total: 0, utiles: 0, mejorables: 0 };
-      });
+        // Agregar contadores a cada nota
+        notas.forEach(nota => {
+          nota.evaluaciones = contadores[nota.nota_id] || { total: 0, utiles: 0, mejorables: 0 };
+        });
       
-      console.log('✓ Contadores de evaluaciones agregados');
-    } else {
-      console.log('No hay evaluaciones en la BD o error:', evalError);
+        console.log('✓ Contadores de evaluaciones agregados');
+      } else {
+        console.log('No hay evaluaciones en la BD o error:', evalError);
+        notas.forEach(nota => {
+          nota.evaluaciones = { total: 0, utiles: 0, mejorables: 0 };
+        });
+      }
+    } catch (err) {
+      console.warn('No se pudieron cargar contadores de evaluaciones:', err);
+      // Agregar contadores vacíos si falla
       notas.forEach(nota => {
         nota.evaluaciones = { total: 0, utiles: 0, mejorables: 0 };
       });
     }
-  } catch (err) {
-    console.warn('No se pudieron cargar contadores de evaluaciones:', err);
-    // Agregar contadores vacíos si falla
-    notas.forEach(nota => {
-      nota.evaluaciones = { total: 0, utiles: 0, mejorables: 0 };
-    });
   }
   
   // Debug: mostrar estructura de las primeras notas
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agregación incremental de la tabla `evaluaciones`.
+
+Lee una exportación de evaluaciones (CSV, JSONL, una base SQLite con la
+tabla `evaluaciones` o, si está instalado psycopg, una URL postgresql://) y
+mantiene un archivo de estadísticas con los recuentos por nota, por versión
+de nota y por pasaje:
+
+  total      evaluaciones nota_eval
+  utiles     votos util/up
+  mejorables votos mejorable/down
+  falta_nota sugerencias de nota faltante
+
+Además guarda en `totales` los recuentos globales del laboratorio con la
+misma semántica que las consultas que sustituyen: todas las filas nota_eval
+(tengan o no nota_id), los votos 'up' y 'down' exactamente y todas las
+filas falta_nota (tengan o no pasaje_id).
+
+El archivo guarda también una marca de agua (timestamp, id) de la última
+evaluación contada: en cada ejecución solo se leen y suman las posteriores,
+así que no hace falta recorrer de nuevo toda la tabla. Con --reconstruir se
+descarta el estado y se cuenta todo desde cero.
+
+Las páginas leen los recuentos de este archivo en lugar de consultar la
+tabla evaluaciones.
+
+Uso:
+  python agregar_evaluaciones.py evaluaciones.csv
+  python agregar_evaluaciones.py evaluaciones.jsonl -o ../../assets/datos/evaluaciones-stats.json
+  python agregar_evaluaciones.py supabase.db --reconstruir
+  python agregar_evaluaciones.py postgresql://usuario@host/base
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+SCRIPT_DIR = Path(__file__).parent
+STATS_POR_DEFECTO = SCRIPT_DIR.parent.parent / 'assets' / 'datos' / 'evaluaciones-stats.json'
+
+COLUMNAS = ('id', 'timestamp', 'event_type', 'pasaje_id', 'nota_id', 'nota_version', 'vote')
+
+# Se aceptan los dos formatos de voto, como en notas.js
+VOTOS_UTIL = ('util', 'up')
+VOTOS_MEJORABLE = ('mejorable', 'down')
+
+
+def contador_vacio():
+    return {'total': 0, 'utiles': 0, 'mejorables': 0, 'falta_nota': 0}
+
+
+def totales_vacios():
+    return {'evaluaciones': 0, 'utiles': 0, 'mejorables': 0, 'sugerencias': 0}
+
+
+def estado_vacio():
+    return {'marca_agua': None, 'evaluaciones': 0, 'notas': {}, 'versiones': {}, 'pasajes': {},
+            'totales': totales_vacios()}
+
+
+def _instante(valor):
+    """datetime comparable de un timestamp de la tabla (texto ISO 8601 o datetime)"""
+    if isinstance(valor, datetime):
+        instante = valor
+    else:
+        instante = datetime.fromisoformat(str(valor).strip())
+    if instante.tzinfo is None:
+        instante = instante.replace(tzinfo=timezone.utc)
+    return instante
+
+
+def _id(valor):
+    return int(valor) if valor not in (None, '') else 0
+
+
+def normalizar_version(valor):
+    """Versión como en la columna numeric(4,1) de notas: '1.0', '2.5'"""
+    if valor in (None, ''):
+        return None
+    try:
+        return f'{float(valor):.1f}'
+    except ValueError:
+        return str(valor)
+
+
+def posterior(fila, marca_agua):
+    """¿La fila es posterior a la marca de agua (timestamp, id)?"""
+    if marca_agua is None:
+        return True
+    clave = (_instante(fila['timestamp']), _id(fila.get('id')))
+    return clave > (_instante(marca_agua['timestamp']), marca_agua['id'])
+
+
+# --- Fuentes -------------------------------------------------------------
+
+def leer_csv(ruta, marca_agua=None):
+    with open(ruta, 'r', encoding='utf-8', newline='') as f:
+        for fila in csv.DictReader(f):
+            if posterior(fila, marca_agua):
+                yield fila
+
+
+def leer_jsonl(ruta, marca_agua=None):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for linea in f:
+            if linea.strip():
+                fila = json.loads(linea)
+                if posterior(fila, marca_agua):
+                    yield fila
+
+
+def _consulta(parametro, marca_agua):
+    """SELECT de las columnas necesarias, desde la marca de agua y en orden (timestamp, id)"""
+    columnas = ', '.join(f'"{c}"' for c in COLUMNAS)
+    sql = f'SELECT {columnas} FROM evaluaciones'
+    parametros = ()
+    if marca_agua is not None:
+        sql += f' WHERE "timestamp" > {parametro} OR ("timestamp" = {parametro} AND id > {parametro})'
+        parametros = (marca_agua['timestamp'], marca_agua['timestamp'], marca_agua['id'])
+    return sql + ' ORDER BY "timestamp", id', parametros
+
+
+def leer_sqlite(ruta, marca_agua=None):
+    sql, parametros = _consulta('?', marca_agua)
+    conexion = sqlite3.connect(str(ruta))
+    try:
+        for valores in conexion.execute(sql, parametros):
+            yield dict(zip(COLUMNAS, valores))
+    finally:
+        conexion.close()
+
+
+def leer_postgres(url, marca_agua=None):
+    try:
+        import psycopg
+    except ImportError:
+        sys.exit('Para leer de PostgreSQL hace falta instalar psycopg (pip install psycopg)')
+
+    sql, parametros = _consulta('%s', marca_agua)
+    with psycopg.connect(url) as conexion, conexion.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        for valores in cursor:
+            yield dict(zip(COLUMNAS, valores))
+
+
+def leer_evaluaciones(origen, marca_agua=None):
+    """Evaluaciones posteriores a la marca de agua, según el tipo de origen"""
+    if str(origen).startswith(('postgresql://', 'postgres://')):
+        return leer_postgres(origen, marca_agua)
+    sufijo = Path(origen).suffix.lower()
+    if sufijo == '.csv':
+        return leer_csv(origen, marca_agua)
+    if sufijo in ('.jsonl', '.ndjson'):
+        return leer_jsonl(origen, marca_agua)
+    if sufijo in ('.db', '.sqlite', '.sqlite3'):
+        return leer_sqlite(origen, marca_agua)
+    raise ValueError(f'Formato de origen no reconocido: {origen}')
+
+
+# --- Agregación ----------------------------------------------------------
+
+def _sumar(tabla, clave, fila):
+    contador = tabla.setdefault(clave, contador_vacio())
+    if fila.get('event_type') == 'falta_nota':
+        contador['falta_nota'] += 1
+        return
+    contador['total'] += 1
+    voto = (fila.get('vote') or '').strip()
+    if voto in VOTOS_UTIL:
+        contador['utiles'] += 1
+    elif voto in VOTOS_MEJORABLE:
+        contador['mejorables'] += 1
+
+
+def _sumar_totales(totales, fila):
+    if fila.get('event_type') == 'falta_nota':
+        totales['sugerencias'] += 1
+        return
+    totales['evaluaciones'] += 1
+    voto = fila.get('vote')
+    if voto == 'up':
+        totales['utiles'] += 1
+    elif voto == 'down':
+        totales['mejorables'] += 1
+
+
+def agregar(estado, filas):
+    """
+    Suma las filas al estado y avanza la marca de agua.
+    Los totales globales solo se suman si el estado los tiene: un archivo
+    anterior a ellos no cuenta las filas ya procesadas (ver --reconstruir).
+    Retorna el número de evaluaciones añadidas.
+    """
+    totales = estado.get('totales')
+    marca = estado['marca_agua']
+    clave_marca = None if marca is None else (_instante(marca['timestamp']), marca['id'])
+    nuevas = 0
+
+    for fila in filas:
+        clave = (_instante(fila['timestamp']), _id(fila.get('id')))
+        if clave_marca is None or clave > clave_marca:
+            clave_marca = clave
+            ts = fila['timestamp']
+            marca = {'timestamp': ts.isoformat() if isinstance(ts, datetime) else str(ts), 'id': clave[1]}
+
+        if fila.get('event_type') not in ('nota_eval', 'falta_nota'):
+            continue
+        if totales is not None:
+            _sumar_totales(totales, fila)
+        nota_id = fila.get('nota_id') or None
+        pasaje_id = fila.get('pasaje_id')
+        if nota_id:
+            _sumar(estado['notas'], nota_id, fila)
+            version = normalizar_version(fila.get('nota_version'))
+            if version is not None:
+                _sumar(estado['versiones'].setdefault(nota_id, {}), version, fila)
+        if pasaje_id not in (None, ''):
+            _sumar(estado['pasajes'], str(pasaje_id), fila)
+        nuevas += 1
+
+    estado['marca_agua'] = marca
+    estado['evaluaciones'] += nuevas
+    return nuevas
+
+
+def cargar_estado(ruta):
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return estado_vacio()
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def guardar_estado(estado, ruta):
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    estado['actualizado'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    temporal.replace(ruta)
+
+
+def actualizar_estadisticas(origen, salida, reconstruir=False):
+    """Lee las evaluaciones nuevas de `origen` y actualiza `salida`; retorna (estado, nuevas)"""
+    estado = estado_vacio() if reconstruir else cargar_estado(salida)
+    nuevas = agregar(estado, leer_evaluaciones(origen, estado['marca_agua']))
+    guardar_estado(estado, salida)
+    return estado, nuevas
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Agregar de forma incremental los votos de la tabla evaluaciones')
+    p.add_argument('origen', help='Exportación CSV/JSONL, base SQLite o URL postgresql://')
+    p.add_argument('-o', '--output', default=str(STATS_POR_DEFECTO), help='Archivo de estadísticas (JSON)')
+    p.add_argument('--reconstruir', action='store_true', help='Ignorar el estado guardado y contar desde cero')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        estado, nuevas = actualizar_estadisticas(args.origen, args.output, args.reconstruir)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(1)
+
+    marca = estado['marca_agua']
+    print(f"✓ {nuevas} evaluaciones nuevas ({estado['evaluaciones']} en total)")
+    print(f"  Notas: {len(estado['notas'])}  Pasajes: {len(estado['pasajes'])}")
+    if 'totales' not in estado:
+        print("⚠ El archivo no tiene totales globales; ejecuta con --reconstruir para calcularlos",
+              file=sys.stderr)
+    if marca:
+        print(f"  Marca de agua: {marca['timestamp']} (id {marca['id']})")
+    print(f"  Estadísticas guardadas en: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
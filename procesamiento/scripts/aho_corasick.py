@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Autómata de Aho–Corasick para buscar muchas cadenas a la vez.
+
+Se construye una vez con todos los patrones (las palabras anotadas y las
+palabras de sus contextos) y recorre el texto en una sola pasada, informando
+de todas las apariciones de todos los patrones, también las solapadas.
+"""
+
+from collections import deque
+
+
+class AutomataAhoCorasick:
+    """
+    Autómata sobre un conjunto de patrones no vacíos.
+
+    `patrones` conserva el orden de inserción (sin repetidos); `buscar`
+    devuelve los índices de esa lista.
+    """
+
+    def __init__(self, patrones):
+        self.patrones = []
+        self._id_de = {}
+
+        # Transiciones, enlace de fallo y patrones que terminan en cada estado
+        self._hijos = [{}]
+        self._fallo = [0]
+        self._salida = [()]
+
+        for patron in patrones:
+            if patron and patron not in self._id_de:
+                self._id_de[patron] = len(self.patrones)
+                self.patrones.append(patron)
+                self._insertar(patron)
+        self._enlazar()
+
+    def _insertar(self, patron):
+        estado = 0
+        for ch in patron:
+            siguiente = self._hijos[estado].get(ch)
+            if siguiente is None:
+                siguiente = len(self._hijos)
+                self._hijos[estado][ch] = siguiente
+                self._hijos.append({})
+                self._fallo.append(0)
+                self._salida.append(())
+            estado = siguiente
+        self._salida[estado] += (self._id_de[patron],)
+
+    def _enlazar(self):
+        """Enlaces de fallo en anchura; cada estado hereda la salida de su enlace"""
+        cola = deque(self._hijos[0].values())
+        while cola:
+            estado = cola.popleft()
+            for ch, hijo in self._hijos[estado].items():
+                cola.append(hijo)
+                fallo = self._fallo[estado]
+                while fallo and ch not in self._hijos[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._hijos[fallo].get(ch, 0)
+                self._fallo[hijo] = destino if destino != hijo else 0
+                self._salida[hijo] += self._salida[self._fallo[hijo]]
+
+    def __len__(self):
+        return len(self.patrones)
+
+    def indice(self, patron):
+        """Índice del patrón en `patrones`, o None si no está"""
+        return self._id_de.get(patron)
+
+    def buscar(self, texto):
+        """Genera (inicio, fin, índice_patrón) de cada aparición, en orden de fin"""
+        hijos, fallo, salida, patrones = self._hijos, self._fallo, self._salida, self.patrones
+        estado = 0
+        for pos, ch in enumerate(texto):
+            while estado and ch not in hijos[estado]:
+                estado = fallo[estado]
+            estado = hijos[estado].get(ch, 0)
+            for pid in salida[estado]:
+                yield pos + 1 - len(patrones[pid]), pos + 1, pid
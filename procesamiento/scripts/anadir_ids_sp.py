@@ -1,25 +1,42 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Asignar xml:id secuenciales a todos los elementos <sp> de un archivo XML/TEI.
+Asignar xml:id a todos los elementos <sp> de un archivo XML/TEI.
+
+Por defecto los ids existentes se mantienen: un índice de los xml:id en uso
+permite dar a cada <sp> nuevo (o con un id repetido) un id que cae entre el
+de su anterior y el de su siguiente, sin mover los demás. Si hay un hueco
+entero se usa (sp-13 entre sp-12 y sp-15); si no, un id fraccionario
+(sp-12.1 entre sp-12 y sp-13, sp-12.1.1 entre sp-12.1 y sp-12.2). Así
+insertar un parlamento no invalida las referencias a los posteriores
+(target de notas, pasajes, evaluaciones, cachés).
+
+La renumeración secuencial completa solo se hace si se pide con --renumerar,
+y entonces se genera un mapa {id anterior: id nuevo} con los que cambian
+para actualizar las referencias.
 
-Por defecto sobrescribe ids existentes (para asegurarse de que son secuenciales).
 Opciones disponibles:
-  - --preserve : no modificar ids existentes (solo añade donde faltan)
-  - --inplace  : sobrescribir el archivo de entrada (puedes usar --backup para copiar .bak)
-  - --output   : fichero de salida
-  - --prefix   : prefijo del id (default: sp)
-  - --start    : número inicial (default: 1)
+  - --renumerar : renumerar todos los <sp> de forma secuencial
+  - --mapa      : con --renumerar, guardar el mapa de renombrado en JSON
+  - --inplace   : sobrescribir el archivo de entrada (puedes usar --backup para copiar .bak)
+  - --output    : fichero de salida
+  - --prefix    : prefijo del id (default: sp)
+  - --start     : número inicial (default: 1)
 
 Ejemplo:
   python anadir_ids_sp.py assets/xml/fuenteovejuna.xml --inplace --backup
+  python anadir_ids_sp.py assets/xml/fuenteovejuna.xml --inplace --renumerar --mapa renombrados_sp.json
 """
 
 import argparse
+import json
+import re
 import sys
 import shutil
 import xml.etree.ElementTree as ET
 
+from etapas import etapa
+
 XML_NS = 'http://www.w3.org/XML/1998/namespace'
 XML_ID_ATTR = '{%s}id' % XML_NS
 
@@ -32,14 +49,159 @@ def parse_args():
     p.add_argument('--backup', action='store_true', help='Hacer copia de seguridad antes de sobrescribir (input.bak)')
     p.add_argument('--prefix', default='sp', help='Prefijo para los ids (default: sp)')
     p.add_argument('--start', type=int, default=1, help='Número inicial (default: 1)')
-    p.add_argument('--preserve', action='store_true', help='No modificar xml:id ya existentes (solo añadir donde falta)')
+    p.add_argument('--renumerar', action='store_true', help='Renumerar todos los <sp> de forma secuencial')
+    p.add_argument('--mapa', help='Con --renumerar, guardar el mapa {id anterior: id nuevo} en este JSON')
+    p.add_argument('--preserve', action='store_true', help='Mantener los xml:id existentes (es el comportamiento por defecto)')
     return p.parse_args()
 
 
 def local_name(tag):
+    if not isinstance(tag, str):
+        # Comentarios e instrucciones de procesamiento (lxml)
+        return ''
     return tag.split('}')[-1] if '}' in tag else tag
 
 
+def clave_id(xml_id, prefix='sp'):
+    """Clave ordenable de un id prefix-N o prefix-N.M...: 'sp-12.1' -> (12, 1); None si no sigue el patrón"""
+    m = re.fullmatch(re.escape(prefix) + r'-(\d+(?:\.\d+)*)', xml_id or '')
+    return tuple(int(x) for x in m.group(1).split('.')) if m else None
+
+
+def formatear_id(clave, prefix='sp'):
+    return f"{prefix}-{'.'.join(str(x) for x in clave)}"
+
+
+def id_entre(anterior, siguiente, usados, prefix='sp', start=1):
+    """
+    Clave libre estrictamente entre `anterior` y `siguiente` (claves o None):
+    primero un entero del hueco, si lo hay; si no, una fracción por debajo
+    de `anterior`.
+    """
+    if anterior is None:
+        anterior = (start - 1,)
+    if siguiente is not None and (siguiente <= anterior or (siguiente[:len(anterior)] == anterior
+                                                            and not any(siguiente[len(anterior):]))):
+        # Ids existentes desordenados, o iguales salvo ceros (sp-12 y sp-12.0):
+        # no hay hueco, se usa el primer entero libre
+        siguiente = None
+
+    candidata = (anterior[0] + 1,)
+    while formatear_id(candidata, prefix) in usados:
+        candidata = (candidata[0] + 1,)
+    if siguiente is None or candidata < siguiente:
+        return candidata
+
+    # Sin hueco entero: el siguiente en el mismo nivel (sp-12.1 -> sp-12.2)
+    # o, si no cabe, un nivel más (sp-12 -> sp-12.1, sp-12.1 -> sp-12.1.1)
+    if len(anterior) > 1:
+        candidata = anterior[:-1] + (anterior[-1] + 1,)
+        while candidata < siguiente:
+            if formatear_id(candidata, prefix) not in usados:
+                return candidata
+            candidata = candidata[:-1] + (candidata[-1] + 1,)
+    base = anterior
+    while True:
+        candidata = base + (1,)
+        while candidata < siguiente:
+            if formatear_id(candidata, prefix) not in usados:
+                return candidata
+            candidata = candidata[:-1] + (candidata[-1] + 1,)
+        # sp-12 y sp-12.1 no dejan sitio a sp-12.N: se baja a sp-12.0.N
+        base = base + (0,)
+
+
+def elegir_conservados(sp_elems, prefix='sp'):
+    """
+    Qué <sp> conservan su id. Un id repetido (p. ej. un parlamento copiado)
+    se queda en la aparición que encaja en el orden de sus vecinos, o en la
+    primera si ninguna encaja; las demás se tratan como <sp> nuevos.
+    """
+    posiciones = {}
+    for i, e in enumerate(sp_elems):
+        xml_id = e.get(XML_ID_ATTR)
+        if xml_id is not None:
+            posiciones.setdefault(xml_id, []).append(i)
+    conservar = [False] * len(sp_elems)
+    for lista in posiciones.values():
+        if len(lista) == 1:
+            conservar[lista[0]] = True
+
+    claves = [clave_id(e.get(XML_ID_ATTR), prefix) if conservar[i] else None for i, e in enumerate(sp_elems)]
+    for xml_id, lista in posiciones.items():
+        if len(lista) == 1:
+            continue
+        clave = clave_id(xml_id, prefix)
+        elegida = lista[0]
+        for i in lista:
+            anterior = next((c for c in reversed(claves[:i]) if c is not None), None)
+            siguiente = next((c for c in claves[i + 1:] if c is not None), None)
+            if clave is not None and (anterior is None or anterior < clave) and (siguiente is None or clave < siguiente):
+                elegida = i
+                break
+        conservar[elegida] = True
+    return conservar
+
+
+def asignar_ids_sp(root, prefix='sp', start=1, renumerar=False):
+    """
+    Asigna xml:id a los <sp>.
+    Retorna {'procesados', 'nuevos': [ids asignados a <sp> sin id o con id
+    repetido], 'mapa': {id anterior: id nuevo} (solo al renumerar)}.
+    """
+    sp_elems = [e for e in root.iter() if local_name(e.tag) == 'sp']
+    resultado = {'procesados': len(sp_elems), 'nuevos': [], 'mapa': {}}
+
+    if renumerar:
+        for i, e in enumerate(sp_elems, start):
+            anterior, new_id = e.get(XML_ID_ATTR), f"{prefix}-{i}"
+            if anterior is None:
+                resultado['nuevos'].append(new_id)
+            elif anterior != new_id:
+                resultado['mapa'][anterior] = new_id
+            e.set(XML_ID_ATTR, new_id)
+        return resultado
+
+    # Índice de los xml:id del documento
+    usados = {e.get(XML_ID_ATTR) for e in root.iter() if isinstance(e.tag, str) and e.get(XML_ID_ATTR)}
+    conservar = elegir_conservados(sp_elems, prefix)
+
+    # Clave del siguiente id conservado con el patrón, para cada posición
+    siguientes = [None] * len(sp_elems)
+    siguiente = None
+    for i in range(len(sp_elems) - 1, -1, -1):
+        siguientes[i] = siguiente
+        if conservar[i]:
+            siguiente = clave_id(sp_elems[i].get(XML_ID_ATTR), prefix) or siguiente
+
+    anterior = None
+    for i, e in enumerate(sp_elems):
+        if conservar[i]:
+            anterior = clave_id(e.get(XML_ID_ATTR), prefix) or anterior
+            continue
+        anterior = id_entre(anterior, siguientes[i], usados, prefix, start)
+        new_id = formatear_id(anterior, prefix)
+        usados.add(new_id)
+        e.set(XML_ID_ATTR, new_id)
+        resultado['nuevos'].append(new_id)
+    return resultado
+
+
+@etapa('anadir_ids_sp', orden=50)
+def etapa_anadir_ids_sp(root, opciones):
+    """Asigna xml:id a los parlamentos nuevos sin mover los existentes (sp-N, sp-N.M)"""
+    resultado = asignar_ids_sp(
+        root,
+        prefix=opciones.get('prefijo_sp', 'sp'),
+        renumerar=opciones.get('renumerar_sp', False),
+    )
+    # El mapa de renombrado queda disponible para quien ejecuta el pipeline
+    if resultado['mapa'] and 'mapa_ids_sp' in opciones:
+        opciones['mapa_ids_sp'].update(resultado['mapa'])
+    return {'sp_procesados': resultado['procesados'], 'ids_nuevos': len(resultado['nuevos']),
+            'renombrados': len(resultado['mapa'])}
+
+
 def pretty_write(tree, out_path):
     """Escribe el árbol XML intentando:
       - usar el namespace por defecto (sin prefijo ns0:)
@@ -98,17 +260,7 @@ def main():
         sys.exit(1)
 
     root = tree.getroot()
-    sp_elems = [e for e in root.iter() if local_name(e.tag) == 'sp']
-
-    i = args.start
-    for e in sp_elems:
-        # Si preserve está activo y ya existe xml:id, la dejamos
-        if args.preserve and e.get(XML_ID_ATTR) is not None:
-            i += 1
-            continue
-        new_id = f"{args.prefix}-{i}"
-        e.set(XML_ID_ATTR, new_id)
-        i += 1
+    resultado = asignar_ids_sp(root, args.prefix, args.start, args.renumerar)
 
     # Determinar ruta de salida
     if args.inplace:
@@ -133,7 +285,15 @@ def main():
         print(f'Error escribiendo {out_path}: {e}', file=sys.stderr)
         sys.exit(1)
 
-    print(f'Procesados {len(sp_elems)} elementos <sp>. IDs asignados desde {args.prefix}-{args.start} en {out_path}')
+    if args.mapa:
+        with open(args.mapa, 'w', encoding='utf-8') as fh:
+            json.dump(resultado['mapa'], fh, ensure_ascii=False, indent=2)
+
+    print(f"Procesados {resultado['procesados']} elementos <sp> en {out_path}")
+    print(f"  IDs nuevos: {len(resultado['nuevos'])}" + (f" ({', '.join(resultado['nuevos'][:10])})" if resultado['nuevos'] else ''))
+    if args.renumerar:
+        print(f"  Renumerados desde {args.prefix}-{args.start}: {len(resultado['mapa'])} ids cambiados"
+              + (f" (mapa en {args.mapa})" if args.mapa else ''))
 
 
 if __name__ == '__main__':
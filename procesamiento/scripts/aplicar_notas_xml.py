@@ -2,93 +2,414 @@
 # -*- coding: utf-8 -*-
 """
 Script para aplicar las notas al XML de Fuenteovejuna
-Inserta los números de nota en el texto para posterior conversión a <seg>
+Envuelve cada palabra anotada en un <seg xml:id="seg-N-k"> (N: verso, k:
+orden dentro del verso) y enlaza la nota correspondiente de notas.xml con
+target="#seg-N-k", todo en la misma pasada.
+
+También conserva el modo anterior, que solo inserta marcas {N} en el texto.
 """
 
 import json
 import re
+from bisect import bisect_left, bisect_right
 from pathlib import Path
 from lxml import etree
 import shutil
 
+from etapas import etapa
+from localizador_versos import XML_ID, LocalizadorVersos, nombre_local
+
 
 def normalizar_texto_simple(texto):
     """Normaliza texto para búsqueda simple"""
     return texto.lower().strip()
 
 
-def insertar_nota_en_verso(l_elem, palabra, numero_nota):
+def rango_palabra(texto, palabra):
     """
-    Inserta el número de nota después de una palabra específica en un verso.
-    Retorna True si se insertó correctamente.
+    (inicio, fin) de la palabra anotada en el texto plano del verso, o None
+    si no aparece. Busca primero la palabra completa y, si no, cualquier
+    aparición (sin distinguir mayúsculas).
     """
-    # Obtener todo el texto del verso
-    texto_completo = ''.join(l_elem.itertext())
     palabra_lower = palabra.lower()
-    
-    # Buscar la palabra en el texto (case insensitive)
-    texto_lower = texto_completo.lower()
+    texto_lower = texto.lower()
     
     # Intentar encontrar la palabra completa
     patron = r'\b' + re.escape(palabra_lower) + r'\b'
     match = re.search(patron, texto_lower)
+    if match:
+        return match.start(), match.end()
+    
+    # Búsqueda más flexible si no hay match exacto
+    pos_inicio = texto_lower.find(palabra_lower)
+    if pos_inicio < 0:
+        return None
+    return pos_inicio, pos_inicio + len(palabra_lower)
+
+
+def posicion_nota(texto, palabra):
+    """Posición justo después de la palabra anotada, o None si no aparece"""
+    rango = rango_palabra(texto, palabra)
+    return rango[1] if rango else None
+
+
+def mapa_offsets(l_elem):
+    """
+    Tramos de texto del verso en orden de documento, como `itertext()`:
+    [(offset_inicio, nodo, 'text' | 'tail')]. Retorna (texto_plano, tramos).
+    """
+    tramos = []
+    partes = []
+    longitud = 0
+    
+    def anadir(nodo, atributo):
+        nonlocal longitud
+        texto = getattr(nodo, atributo)
+        if texto:
+            tramos.append((longitud, nodo, atributo))
+            partes.append(texto)
+            longitud += len(texto)
+    
+    def recorrer(nodo):
+        # El texto de comentarios e instrucciones no forma parte del verso
+        if isinstance(nodo.tag, str):
+            anadir(nodo, 'text')
+            for hijo in nodo:
+                recorrer(hijo)
+        if nodo is not l_elem:
+            anadir(nodo, 'tail')
+    
+    recorrer(l_elem)
+    return ''.join(partes), tramos
+
+
+def insertar_notas_en_verso(l_elem, notas):
+    """
+    Inserta de una vez las marcas {N} de varias notas en un verso.
+    `notas` es una lista de (palabra, numero_nota). Las posiciones se
+    calculan sobre el texto original del verso y las marcas se aplican de
+    la última a la primera, así que unas no desplazan a otras; si dos notas
+    caen en el mismo punto quedan en el orden de la lista.
+    Retorna la lista de numero_nota que no se pudieron insertar.
+    """
+    texto, tramos = mapa_offsets(l_elem)
+    inicios = [inicio for inicio, _, _ in tramos]
+    
+    no_insertadas = []
+    # tramo -> [(offset_local, orden, marca)]
+    por_tramo = {}
+    for orden, (palabra, numero_nota) in enumerate(notas):
+        pos_fin = posicion_nota(texto, palabra)
+        if pos_fin is None or not tramos:
+            no_insertadas.append(numero_nota)
+            continue
+        # Al final de un tramo la marca va en ese tramo, no al inicio del siguiente
+        t = max(bisect_left(inicios, pos_fin) - 1, 0)
+        por_tramo.setdefault(t, []).append((pos_fin - inicios[t], orden, '{' + str(numero_nota) + '}'))
+    
+    for t, inserciones in por_tramo.items():
+        _, nodo, atributo = tramos[t]
+        original = getattr(nodo, atributo)
+        partes = []
+        anterior = 0
+        for offset, _, marca in sorted(inserciones):
+            partes.append(original[anterior:offset])
+            partes.append(marca)
+            anterior = offset
+        partes.append(original[anterior:])
+        setattr(nodo, atributo, ''.join(partes))
+    
+    return no_insertadas
+
+
+def insertar_nota_en_verso(l_elem, palabra, numero_nota):
+    """
+    Inserta el número de nota después de una palabra específica en un verso.
+    Retorna True si se insertó correctamente.
+    """
+    return not insertar_notas_en_verso(l_elem, [(palabra, numero_nota)])
+
+
+def _agrupar_por_verso(localizador, mapeo):
+    """
+    Agrupa las entradas del mapeo por verso. Retorna (por_verso, fallidas),
+    con por_verso {<l>: [índices en el mapeo]} y fallidas {índice: entrada}.
+    """
+    por_verso = {}
+    fallidas = {}
+    for i, item in enumerate(mapeo):
+        l_elem = localizador.verso(item['verso'])
+        if l_elem is None:
+            fallidas[i] = {
+                'numero_nota': item['numero_nota'],
+                'motivo': f'Verso {item["verso"]} no encontrado',
+                'palabra': item['palabra']
+            }
+            continue
+        por_verso.setdefault(l_elem, []).append(i)
+    return por_verso, fallidas
+
+
+def _fallo_insercion(item, texto_verso):
+    return {
+        'numero_nota': item['numero_nota'],
+        'motivo': f'No se pudo insertar en verso {item["verso"]}',
+        'palabra': item['palabra'],
+        'texto_verso': texto_verso
+    }
+
+
+def aplicar_notas_en_arbol(root, mapeo_data, detalle=True):
+    """
+    Inserta las marcas {N} de las notas con mapeo claro en un árbol XML ya
+    cargado en memoria (modo anterior a los <seg>). Las notas se agrupan por
+    verso y cada verso se recorre una sola vez.
+    Retorna (aplicadas, fallidas), en el orden del mapeo.
+    """
+    mapeo = mapeo_data['mapeo']
+    por_verso, resultados = _agrupar_por_verso(LocalizadorVersos(root), mapeo)
+    
+    for j, (l_elem, indices) in enumerate(por_verso.items(), 1):
+        if detalle and j % 100 == 0:
+            print(f"  Procesando verso {j}/{len(por_verso)}...")
+        
+        texto_verso = ''.join(l_elem.itertext())
+        notas = [(mapeo[i]['palabra'], mapeo[i]['numero_nota']) for i in indices]
+        no_insertadas = set(insertar_notas_en_verso(l_elem, notas))
+        
+        for i in indices:
+            if mapeo[i]['numero_nota'] in no_insertadas:
+                resultados[i] = _fallo_insercion(mapeo[i], texto_verso)
+            else:
+                resultados[i] = mapeo[i]['numero_nota']
     
-    if not match:
-        # Intentar búsqueda más flexible si no hay match exacto
-        if palabra_lower in texto_lower:
-            pos_inicio = texto_lower.index(palabra_lower)
-            pos_fin = pos_inicio + len(palabra_lower)
+    resultados = [resultados[i] for i in sorted(resultados)]
+    aplicadas = [r for r in resultados if not isinstance(r, dict)]
+    fallidas = [r for r in resultados if isinstance(r, dict)]
+    return aplicadas, fallidas
+
+
+def crear_segs_en_verso(l_elem, notas, nuevo_id):
+    """
+    Envuelve en <seg> las palabras anotadas de un verso, en una sola pasada.
+    `notas` es una lista de (palabra, numero_nota) y `nuevo_id()` da el
+    siguiente xml:id libre del verso; los ids se reparten en orden de
+    aparición. Si la palabra ya está dentro de un <seg> se reutiliza ese
+    segmento, así que volver a aplicar un mapeo no anida segs; dos notas
+    nuevas sobre la misma palabra comparten también el mismo <seg>.
+    No se crean segmentos que crucen límites de elementos ni que se solapen.
+    Retorna {numero_nota: xml_id del seg}; las notas que faltan han fallado.
+    """
+    texto, tramos = mapa_offsets(l_elem)
+    inicios = [inicio for inicio, _, _ in tramos]
+    
+    # Segmentos ya existentes (solo texto): (inicio, fin, seg)
+    existentes = [(inicio, inicio + len(nodo.text), nodo) for inicio, nodo, atributo in tramos
+                  if atributo == 'text' and nombre_local(nodo.tag) == 'seg' and len(nodo) == 0]
+    
+    destinos = {}
+    nuevos = []     # (inicio, fin, tramo, numero_nota)
+    ocupados = []
+    compartidos = {}    # numero_nota -> numero_nota de la nota que crea el seg
+    for palabra, numero_nota in notas:
+        rango = rango_palabra(texto, palabra)
+        if rango is None:
+            continue
+        inicio, fin = rango
+        seg = next((s for s_inicio, s_fin, s in existentes if s_inicio <= inicio and fin <= s_fin), None)
+        if seg is not None:
+            if not seg.get(XML_ID):
+                seg.set(XML_ID, nuevo_id())
+            destinos[numero_nota] = seg.get(XML_ID)
+            continue
+        t = bisect_right(inicios, inicio) - 1
+        if t < 0 or fin > inicios[t] + len(getattr(tramos[t][1], tramos[t][2])):
+            continue
+        mismo = next((n for n_inicio, n_fin, _, n in nuevos if (n_inicio, n_fin) == rango), None)
+        if mismo is not None:
+            compartidos[numero_nota] = mismo
+            continue
+        if any(inicio < o_fin and o_inicio < fin for o_inicio, o_fin in ocupados):
+            continue
+        ocupados.append(rango)
+        nuevos.append((inicio, fin, t, numero_nota))
+    
+    if not nuevos:
+        return destinos
+    
+    # Ids en orden de aparición; cortes de derecha a izquierda dentro de cada
+    # tramo para que los offsets pendientes sigan siendo válidos
+    nuevos.sort()
+    ids = {numero_nota: nuevo_id() for _, _, _, numero_nota in nuevos}
+    padres = {hijo: padre for padre in l_elem.iter() for hijo in padre}
+    tag_seg = l_elem.tag[:-1] + 'seg'
+    
+    for inicio, fin, t, numero_nota in reversed(nuevos):
+        base, nodo, atributo = tramos[t]
+        original = getattr(nodo, atributo)
+        antes = original[:inicio - base]
+        seg = l_elem.makeelement(tag_seg, {XML_ID: ids[numero_nota]})
+        seg.text = original[inicio - base:fin - base]
+        seg.tail = original[fin - base:] or None
+        setattr(nodo, atributo, antes or None)
+        if atributo == 'text':
+            nodo.insert(0, seg)
         else:
-            return False
-    else:
-        pos_inicio = match.start()
-        pos_fin = match.end()
-    
-    # Reconstruir el verso insertando la nota
-    # Necesitamos mantener la estructura XML si hay elementos internos
-    
-    if len(l_elem) == 0 and l_elem.text:
-        # Caso simple: solo texto sin elementos hijos
-        texto = l_elem.text
-        l_elem.text = texto[:pos_fin] + '{' + str(numero_nota) + '}' + texto[pos_fin:]
-        return True
-    
-    # Caso complejo: hay elementos hijos (como <seg>)
-    # Necesitamos encontrar en qué parte está el texto
-    posicion_actual = 0
-    
-    # Revisar texto inicial
-    if l_elem.text:
-        len_texto = len(l_elem.text)
-        if pos_fin <= len_texto:
-            l_elem.text = l_elem.text[:pos_fin] + '{' + str(numero_nota) + '}' + l_elem.text[pos_fin:]
-            return True
-        posicion_actual += len_texto
-    
-    # Revisar elementos hijos
-    for child in l_elem:
-        if child.text:
-            len_texto = len(child.text)
-            if posicion_actual <= pos_fin <= posicion_actual + len_texto:
-                pos_relativa = pos_fin - posicion_actual
-                child.text = child.text[:pos_relativa] + '{' + str(numero_nota) + '}' + child.text[pos_relativa:]
-                return True
-            posicion_actual += len_texto
+            padre = padres[nodo]
+            padre.insert(list(padre).index(nodo) + 1, seg)
+        destinos[numero_nota] = ids[numero_nota]
+    for numero_nota, mismo in compartidos.items():
+        destinos[numero_nota] = ids[mismo]
+    
+    return destinos
+
+
+def crear_segs_en_arbol(root, mapeo_data, detalle=True, omitir=()):
+    """
+    Crea los <seg xml:id="seg-N-k"> de las notas con mapeo claro en un árbol
+    ya cargado en memoria, salvo las de `omitir` (números de nota).
+    Retorna (destinos, fallidas): destinos es {numero_nota: xml_id del seg}
+    y fallidas sigue el orden del mapeo.
+    """
+    localizador = LocalizadorVersos(root)
+    mapeo = [item for item in mapeo_data['mapeo'] if item['numero_nota'] not in omitir]
+    por_verso, fallidas = _agrupar_por_verso(localizador, mapeo)
+    destinos = {}
+    
+    for j, (l_elem, indices) in enumerate(por_verso.items(), 1):
+        if detalle and j % 100 == 0:
+            print(f"  Procesando verso {j}/{len(por_verso)}...")
+        
+        numero_verso = mapeo[indices[0]]['verso']
+        contador = [0]
+        
+        def nuevo_id():
+            while True:
+                contador[0] += 1
+                seg_id = f'seg-{numero_verso}-{contador[0]}'
+                if not localizador.id_en_uso(seg_id):
+                    localizador.registrar_seg(seg_id, l_elem)
+                    return seg_id
+        
+        texto_verso = ''.join(l_elem.itertext())
+        notas = [(mapeo[i]['palabra'], mapeo[i]['numero_nota']) for i in indices]
+        creados = crear_segs_en_verso(l_elem, notas, nuevo_id)
+        destinos.update(creados)
         
-        if child.tail:
-            len_tail = len(child.tail)
-            if posicion_actual <= pos_fin <= posicion_actual + len_tail:
-                pos_relativa = pos_fin - posicion_actual
-                child.tail = child.tail[:pos_relativa] + '{' + str(numero_nota) + '}' + child.tail[pos_relativa:]
-                return True
-            posicion_actual += len_tail
+        for i in indices:
+            if mapeo[i]['numero_nota'] not in creados:
+                fallidas[i] = _fallo_insercion(mapeo[i], texto_verso)
     
-    return False
+    return destinos, [fallidas[i] for i in sorted(fallidas)]
 
 
-def aplicar_notas_automaticas(xml_file, mapeo_data):
+# Etiqueta de apertura de una <note> seguida del número con que empieza su texto
+PATRON_NOTA = re.compile(r'<note\b(?P<atributos>[^>]*)>\s*(?P<numero>\d+)\s')
+PATRON_TARGET = re.compile(r'\btarget="([^"]*)"')
+PATRON_XML_ID = re.compile(r'\bxml:id="([^"]*)"')
+
+
+def enlaces_notas(contenido):
+    """{numero_nota: target} de las notas de notas.xml que ya están enlazadas"""
+    enlaces = {}
+    for match in PATRON_NOTA.finditer(contenido):
+        target = PATRON_TARGET.search(match.group('atributos'))
+        if target and target.group(1) not in ('', '#'):
+            enlaces[int(match.group('numero'))] = target.group(1)
+    return enlaces
+
+
+def enlazar_notas(contenido, destinos):
     """
-    Aplica las notas con mapeo claro al XML
+    Apunta cada <note> del texto de notas.xml a su <seg>: la nota se
+    reconoce por el número con que empieza su texto. Solo se rellenan target
+    vacíos ('#') y xml:id vacíos; los enlaces ya hechos no se tocan.
+    El xml:id de la nota es el primer n-N-k libre del verso N (varias notas
+    pueden compartir un mismo <seg>, así que no se deriva del id del seg).
+    Se editan solo esos atributos, sin reserializar el resto del archivo.
+    Retorna (contenido, resumen).
+    """
+    resumen = {'notas_enlazadas': 0, 'ya_enlazadas': 0, 'conflictos': []}
+    usados = {m.group(1) for m in PATRON_XML_ID.finditer(contenido) if m.group(1)}
+    
+    def id_nota(seg_id):
+        verso = seg_id[len('seg-'):].rsplit('-', 1)[0]
+        k = 1
+        while f'n-{verso}-{k}' in usados:
+            k += 1
+        usados.add(f'n-{verso}-{k}')
+        return f'n-{verso}-{k}'
+    
+    def enlazar(match):
+        numero = int(match.group('numero'))
+        if numero not in destinos:
+            return match.group(0)
+        seg_id = destinos[numero]
+        atributos = match.group('atributos')
+        target = PATRON_TARGET.search(atributos)
+        actual = target.group(1) if target else ''
+        if actual not in ('', '#'):
+            if actual == '#' + seg_id:
+                resumen['ya_enlazadas'] += 1
+            else:
+                resumen['conflictos'].append((numero, actual, '#' + seg_id))
+            return match.group(0)
+        
+        nuevo_target = f'target="#{seg_id}"'
+        if target:
+            atributos = atributos[:target.start()] + nuevo_target + atributos[target.end():]
+        else:
+            atributos += ' ' + nuevo_target
+        xml_id = PATRON_XML_ID.search(atributos)
+        if xml_id is None:
+            atributos = f' xml:id="{id_nota(seg_id)}"' + atributos
+        elif not xml_id.group(1):
+            atributos = atributos[:xml_id.start()] + f'xml:id="{id_nota(seg_id)}"' + atributos[xml_id.end():]
+        resumen['notas_enlazadas'] += 1
+        inicio = match.start('atributos') - match.start()
+        fin = match.end('atributos') - match.start()
+        return match.group(0)[:inicio] + atributos + match.group(0)[fin:]
+    
+    return PATRON_NOTA.sub(enlazar, contenido), resumen
+
+
+def enlazar_archivo_notas(notas_file, destinos, salida=None):
+    """
+    Enlaza notas.xml con los segmentos y escribe el resultado en `salida`
+    (por defecto el propio notas.xml, solo si ha cambiado)
+    """
+    contenido = Path(notas_file).read_text(encoding='utf-8')
+    nuevo, resumen = enlazar_notas(contenido, destinos)
+    if salida is not None and Path(salida).resolve() != Path(notas_file).resolve():
+        Path(salida).write_text(nuevo, encoding='utf-8')
+    elif nuevo != contenido:
+        Path(notas_file).write_text(nuevo, encoding='utf-8')
+    return resumen
+
+
+@etapa('aplicar_notas', orden=80, requiere=('mapeo',))
+def etapa_aplicar_notas(root, opciones):
+    """Crea los <seg> de las notas según el mapeo (notas.xml se enlaza al escribir)"""
+    with open(opciones['mapeo'], 'r', encoding='utf-8') as f:
+        mapeo_data = json.load(f)
+    notas_file = opciones.get('notas')
+    
+    # Las notas ya enlazadas en notas.xml (a mano o en otra pasada) no se tocan
+    omitir = enlaces_notas(Path(notas_file).read_text(encoding='utf-8')) if notas_file else {}
+    destinos, fallidas = crear_segs_en_arbol(root, mapeo_data, detalle=False, omitir=omitir)
+    # La etapa no escribe notas.xml: deja los destinos para que el pipeline
+    # lo enlace después de escribir la obra (ver pipeline.procesar_archivo)
+    opciones.setdefault('destinos_notas', {}).update(destinos)
+    resumen = {'segs': len(set(destinos.values())), 'notas': len(destinos), 'fallidas': len(fallidas)}
+    if notas_file:
+        resumen['ya_enlazadas'] = len(omitir)
+    return resumen
+
+
+def aplicar_notas_automaticas(xml_file, mapeo_data, notas_file=None):
+    """
+    Crea los <seg> de las notas con mapeo claro en el XML y, si se indica,
+    enlaza notas.xml. Retorna (aplicadas, fallidas).
     """
     # Hacer backup del XML original
     backup_file = xml_file.parent / (xml_file.stem + '_backup.xml')
@@ -98,48 +419,21 @@ def aplicar_notas_automaticas(xml_file, mapeo_data):
     # Parsear XML
     tree = etree.parse(xml_file)
     root = tree.getroot()
-    ns = {'tei': 'http://www.tei-c.org/ns/1.0'}
-    
-    aplicadas = []
-    fallidas = []
     
     print("\nAplicando notas al XML...")
     
-    for i, item in enumerate(mapeo_data['mapeo'], 1):
-        numero_nota = item['numero_nota']
-        palabra = item['palabra']
-        verso_num = item['verso']
-        
-        if i % 100 == 0:
-            print(f"  Procesando {i}/{len(mapeo_data['mapeo'])}...")
-        
-        # Buscar el verso por número
-        versos = root.xpath(f'.//tei:l[@n="{verso_num}"]', namespaces=ns)
-        
-        if not versos:
-            fallidas.append({
-                'numero_nota': numero_nota,
-                'motivo': f'Verso {verso_num} no encontrado',
-                'palabra': palabra
-            })
-            continue
-        
-        l_elem = versos[0]
-        
-        # Intentar insertar la nota
-        if insertar_nota_en_verso(l_elem, palabra, numero_nota):
-            aplicadas.append(numero_nota)
-        else:
-            fallidas.append({
-                'numero_nota': numero_nota,
-                'motivo': f'No se pudo insertar en verso {verso_num}',
-                'palabra': palabra,
-                'texto_verso': ''.join(l_elem.itertext())
-            })
+    omitir = enlaces_notas(notas_file.read_text(encoding='utf-8')) if notas_file else {}
+    destinos, fallidas = crear_segs_en_arbol(root, mapeo_data, omitir=omitir)
     
     # Guardar XML modificado
     tree.write(str(xml_file), encoding='utf-8', xml_declaration=True, pretty_print=True)
     
+    if notas_file is not None:
+        enlace = enlazar_archivo_notas(notas_file, destinos)
+        print(f"✓ Notas enlazadas en {notas_file}: {enlace['notas_enlazadas']} "
+              f"(ya enlazadas antes: {len(omitir)})")
+    
+    aplicadas = [item['numero_nota'] for item in mapeo_data['mapeo'] if item['numero_nota'] in destinos]
     return aplicadas, fallidas
 
 
@@ -174,6 +468,7 @@ def main():
     script_dir = Path(__file__).parent
     xml_file = script_dir.parent / 'fuenteovejuna.xml'
     mapeo_file = script_dir.parent / 'mapeo_notas.json'
+    notas_file = script_dir.parent / 'notas.xml'
     informe_file = script_dir.parent / 'notas_revision_manual.csv'
     
     print("=== Aplicación automática de notas ===\n")
@@ -187,7 +482,8 @@ def main():
     print(f"Notas ambiguas: {len(mapeo_data['multiples'])}")
     
     # Aplicar notas automáticas
-    aplicadas, fallidas_auto = aplicar_notas_automaticas(xml_file, mapeo_data)
+    aplicadas, fallidas_auto = aplicar_notas_automaticas(
+        xml_file, mapeo_data, notas_file if notas_file.exists() else None)
     
     print(f"\n✓ Notas aplicadas exitosamente: {len(aplicadas)}")
     print(f"✗ Notas que fallaron en aplicación: {len(fallidas_auto)}")
@@ -204,8 +500,8 @@ def main():
     print(f"  - Múltiples candidatos: {len(mapeo_data['multiples'])}")
     print(f"  - Fallaron al insertar: {len(fallidas_auto)}")
     
-    print(f"\nFormato de notas insertadas: palabra{{número}}")
-    print(f"Ejemplo: Maestre{{1}}")
+    print(f"\nFormato de notas insertadas: <seg xml:id=\"seg-verso-k\">palabra</seg>")
+    print(f"Ejemplo: <seg xml:id=\"seg-1-1\">Maestre</seg>")
     print(f"\nPróximo paso: Revisar {informe_file} y aplicar manualmente las notas restantes")
 
 
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Árbol BK para búsquedas aproximadas en un vocabulario.
+
+Cada nodo guarda una palabra y cuelga a sus hijos según la distancia de
+edición (Levenshtein) a ella. Por la desigualdad triangular, al buscar
+palabras a distancia ≤ d de una consulta q solo hace falta bajar por los
+hijos cuya distancia al nodo esté en [dist(q, nodo) - d, dist(q, nodo) + d],
+de modo que se compara con una pequeña parte del vocabulario.
+"""
+
+
+def levenshtein(a, b):
+    """Distancia de edición (inserciones, borrados y sustituciones)"""
+    if len(a) < len(b):
+        a, b = b, a
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1,
+                              actual[j - 1] + 1,
+                              anterior[j - 1] + (ca != cb)))
+        anterior = actual
+    return anterior[-1]
+
+
+class ArbolBK:
+    """Árbol BK sobre un conjunto de palabras"""
+
+    def __init__(self, palabras=(), distancia=levenshtein):
+        self.distancia = distancia
+        self.raiz = None        # (palabra, {distancia: nodo})
+        self._tamano = 0
+        for palabra in palabras:
+            self.anadir(palabra)
+
+    def __len__(self):
+        return self._tamano
+
+    def anadir(self, palabra):
+        if self.raiz is None:
+            self.raiz = (palabra, {})
+            self._tamano = 1
+            return
+        nodo = self.raiz
+        while True:
+            d = self.distancia(palabra, nodo[0])
+            if d == 0:
+                return
+            hijo = nodo[1].get(d)
+            if hijo is None:
+                nodo[1][d] = (palabra, {})
+                self._tamano += 1
+                return
+            nodo = hijo
+
+    def buscar(self, consulta, max_distancia):
+        """Lista de (distancia, palabra) a distancia ≤ max_distancia, de menor a mayor"""
+        if self.raiz is None:
+            return []
+        resultados = []
+        pendientes = [self.raiz]
+        while pendientes:
+            palabra, hijos = pendientes.pop()
+            d = self.distancia(consulta, palabra)
+            if d <= max_distancia:
+                resultados.append((d, palabra))
+            for dist_hijo, hijo in hijos.items():
+                if d - max_distancia <= dist_hijo <= d + max_distancia:
+                    pendientes.append(hijo)
+        resultados.sort()
+        return resultados
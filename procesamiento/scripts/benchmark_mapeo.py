@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del mapeo de notas: recorrido completo por nota frente al índice de versos.
+
+Compara el método anterior (un parseo del XML y una normalización de todos los
+versos por cada nota) con `IndiceVersos` (un único parseo e índice invertido),
+y comprueba que ambos producen exactamente los mismos candidatos.
+
+Uso:
+  python benchmark_mapeo.py
+  python benchmark_mapeo.py --xml ../../assets/xml/fuenteovejuna.xml --notas 100
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from lxml import etree
+
+from indice_versos import IndiceVersos
+from normalizacion import normalizar_texto
+
+
+def encontrar_palabra_sin_indice(xml_file, palabra, contexto):
+    """Implementación de referencia: parsea y recorre la obra completa en cada nota"""
+    tree = etree.parse(str(xml_file))
+    root = tree.getroot()
+    ns = {'tei': 'http://www.tei-c.org/ns/1.0'}
+
+    palabra_norm = normalizar_texto(palabra)
+    contexto_norm = normalizar_texto(contexto)
+
+    candidatos = []
+    for l in root.xpath('.//tei:l', namespaces=ns):
+        texto_verso = ''.join(l.itertext())
+        texto_verso_norm = normalizar_texto(texto_verso)
+        if palabra_norm in texto_verso_norm:
+            palabras_contexto = contexto_norm.split()
+            palabras_encontradas = sum(1 for p in palabras_contexto if p in texto_verso_norm)
+            score = palabras_encontradas / len(palabras_contexto) if palabras_contexto else 0
+
+            parent = l.getparent()
+            if parent is not None:
+                index = list(parent).index(l)
+                versos_cerca = []
+                for i in range(max(0, index-2), min(len(parent), index+3)):
+                    if i < len(parent) and parent[i].tag.endswith('l'):
+                        versos_cerca.append(''.join(parent[i].itertext()))
+                contexto_ampliado_norm = normalizar_texto(' '.join(versos_cerca))
+                palabras_encontradas_amp = sum(1 for p in palabras_contexto if p in contexto_ampliado_norm)
+                score_ampliado = palabras_encontradas_amp / len(palabras_contexto) if palabras_contexto else 0
+                if score_ampliado > score:
+                    score = score_ampliado
+
+            candidatos.append({
+                'verso': l.get('n', ''),
+                'texto': texto_verso.strip(),
+                'score': score,
+                'xpath': tree.getpath(l)
+            })
+
+    candidatos.sort(key=lambda x: x['score'], reverse=True)
+    return candidatos
+
+
+def parse_args():
+    script_dir = Path(__file__).parent
+    p = argparse.ArgumentParser(description='Benchmark del mapeo de notas al XML')
+    p.add_argument('--xml', default=str(script_dir.parent.parent / 'assets' / 'xml' / 'fuenteovejuna.xml'),
+                   help='XML TEI de la obra')
+    p.add_argument('--posiciones', default=str(script_dir.parent / 'posiciones_notas.json'),
+                   help='JSON con las posiciones de las notas')
+    p.add_argument('--notas', type=int, default=None,
+                   help='Limitar el número de notas (el método sin índice es lento)')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    with open(args.posiciones, 'r', encoding='utf-8') as f:
+        notas = json.load(f)
+    if args.notas:
+        notas = notas[:args.notas]
+
+    print(f"XML: {args.xml}")
+    print(f"Notas: {len(notas)}\n")
+
+    t0 = time.perf_counter()
+    referencia = [encontrar_palabra_sin_indice(args.xml, n['palabra'], n['contexto']) for n in notas]
+    t_sin_indice = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    indice = IndiceVersos(args.xml)
+    t_construccion = time.perf_counter() - t0
+    resultados = [indice.buscar(n['palabra'], n['contexto']) for n in notas]
+    t_con_indice = time.perf_counter() - t0
+
+    diferencias = [n['numero'] for n, a, b in zip(notas, referencia, resultados) if a != b]
+
+    print("=== Resultados ===")
+    print(f"Sin índice (parseo por nota): {t_sin_indice:8.3f} s")
+    print(f"Con índice (total):           {t_con_indice:8.3f} s")
+    print(f"  - construcción del índice:  {t_construccion:8.3f} s")
+    print(f"  - consultas:                {t_con_indice - t_construccion:8.3f} s")
+    if t_con_indice > 0:
+        print(f"Aceleración: x{t_sin_indice / t_con_indice:.1f}")
+
+    if diferencias:
+        print(f"\n✗ {len(diferencias)} notas con candidatos distintos: {diferencias[:20]}")
+    else:
+        print("\n✓ Candidatos idénticos en ambos métodos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de las etapas de procesamiento sobre la obra real y sobre obras
+sintéticas escaladas.
+
+Mide cada etapa por separado: extracción de notas del HTML, mapeo de notas,
+conversión de notas.txt y las etapas del pipeline TEI (numeración, ids de
+versos y parlamentos, @who, puntuación y aplicación de notas). Para cada
+escala se guarda el tiempo de reloj (mínimo y media de varias repeticiones)
+y el pico de memoria reservada desde Python (tracemalloc, en una ronda
+aparte para no distorsionar los tiempos; no incluye la memoria interna de
+libxml2).
+
+La obra sintética ×N repite N veces los actos de la obra real, sin @n,
+xml:id ni @who para que las etapas tengan el mismo trabajo que con una obra
+nueva; las notas, el HTML y notas.txt se repiten N veces. Con el exponente
+de crecimiento entre escalas (1 ≈ lineal, 2 ≈ cuadrático) se ven las
+regresiones de complejidad.
+
+Uso:
+  python benchmark_pipeline.py
+  python benchmark_pipeline.py --escalas 1,10,100 --repeticiones 3 -o benchmark.json
+  python benchmark_pipeline.py --comparar benchmark_base.json --tolerancia 1.5
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import math
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from lxml import etree
+
+import mapear_notas_xml
+from convertir_notas_xml import convertir_notas_a_xml
+from extraer_posiciones_notas import extraer_posiciones
+from localizador_versos import XML_ID, nombre_local
+from numerar_versos import buscar_actos
+from pipeline import seleccionar_etapas
+
+
+SCRIPT_DIR = Path(__file__).parent
+PROCESAMIENTO_DIR = SCRIPT_DIR.parent
+
+
+def escalar_obra(xml_file, factor, salida):
+    """Escribe en `salida` la obra con sus actos repetidos `factor` veces"""
+    tree = etree.parse(str(xml_file))
+    root = tree.getroot()
+    actos = buscar_actos(root)
+
+    # Quitar lo que asignan las etapas para que tengan trabajo que hacer, y
+    # cualquier otro xml:id para que las copias no los dupliquen
+    for acto in actos:
+        for elem in acto.iter():
+            elem.attrib.pop(XML_ID, None)
+            tag = nombre_local(elem.tag)
+            if tag == 'l':
+                elem.attrib.pop('n', None)
+            elif tag == 'sp':
+                elem.attrib.pop('who', None)
+
+    padre = actos[-1].getparent()
+    posicion = padre.index(actos[-1])
+    for _ in range(factor - 1):
+        for acto in actos:
+            posicion += 1
+            padre.insert(posicion, copy.deepcopy(acto))
+
+    tree.write(str(salida), encoding='utf-8', xml_declaration=True)
+
+
+def escalar_mapeo(mapeo_data, factor, versos_por_copia):
+    """Repite el mapeo para cada copia de la obra, desplazando los números de verso"""
+    mapeo = []
+    for k in range(factor):
+        for item in mapeo_data['mapeo']:
+            if not str(item['verso']).isdigit():
+                continue
+            nuevo = dict(item)
+            nuevo['verso'] = str(int(item['verso']) + k * versos_por_copia)
+            mapeo.append(nuevo)
+    return {'mapeo': mapeo, 'no_encontradas': [], 'multiples': []}
+
+
+def preparar_corpus(rutas, factor, tmp_dir):
+    """
+    Archivos de entrada de una escala. También la escala 1 pasa por
+    escalar_obra (sin xml:id, @n ni @who), para que todas las escalas midan
+    el mismo trabajo por verso.
+    """
+    html = sorted(Path(rutas['html_dir']).glob('*.html'))
+    with open(rutas['posiciones'], 'r', encoding='utf-8') as f:
+        posiciones = json.load(f)
+
+    xml = tmp_dir / f'obra_x{factor}.xml'
+    escalar_obra(rutas['xml'], factor, xml)
+
+    notas_txt = tmp_dir / f'notas_x{factor}.txt'
+    contenido = Path(rutas['notas_txt']).read_text(encoding='utf-8')
+    notas_txt.write_text('\n'.join([contenido] * factor), encoding='utf-8')
+
+    with open(rutas['mapeo'], 'r', encoding='utf-8') as f:
+        mapeo_data = json.load(f)
+    versos = max((int(l.get('n')) for l in etree.parse(str(rutas['xml'])).iter('{*}l')
+                  if (l.get('n') or '').isdigit()), default=0)
+    mapeo = tmp_dir / f'mapeo_x{factor}.json'
+    with open(mapeo, 'w', encoding='utf-8') as f:
+        json.dump(escalar_mapeo(mapeo_data, factor, versos), f, ensure_ascii=False)
+
+    return {
+        'xml': xml,
+        'html': html * factor,
+        'posiciones': posiciones * factor,
+        'notas_txt': notas_txt,
+        'mapeo': mapeo,
+        'salida_notas': tmp_dir / f'notas_x{factor}.xml',
+    }
+
+
+def medir(funcion, memoria=False):
+    """Retorna (segundos, pico_bytes) de una llamada; pico_bytes solo con memoria=True"""
+    if memoria:
+        tracemalloc.start()
+    try:
+        t0 = time.perf_counter()
+        funcion()
+        segundos = time.perf_counter() - t0
+        pico = tracemalloc.get_traced_memory()[1] if memoria else None
+    finally:
+        if memoria:
+            tracemalloc.stop()
+    return segundos, pico
+
+
+def ejecutar_ronda(corpus, motor='lxml', memoria=False):
+    """Ejecuta todas las etapas una vez. Retorna {etapa: (segundos, pico_bytes)}."""
+    ronda = {}
+
+    ronda['extraccion'] = medir(
+        lambda: extraer_posiciones(corpus['html'], detalle=False, motor=motor), memoria)
+
+    # Sin índices de rondas anteriores: se mide también su construcción
+    mapear_notas_xml._indices.clear()
+    ronda['mapeo'] = medir(
+        lambda: mapear_notas_xml.mapear_notas(corpus['posiciones'], corpus['xml'], detalle=False), memoria)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        ronda['conversion_notas'] = medir(
+            lambda: convertir_notas_a_xml(corpus['notas_txt'], corpus['salida_notas']), memoria)
+
+    # Etapas del pipeline, en orden, sobre un único árbol
+    opciones = {'mapeo': str(corpus['mapeo'])}
+    etapas, _ = seleccionar_etapas(None, opciones)
+    root = etree.parse(str(corpus['xml'])).getroot()
+    for e in etapas:
+        ronda[e.nombre] = medir(lambda: e.funcion(root, opciones), memoria)
+
+    return ronda
+
+
+def medir_escala(corpus, repeticiones=1, motor='lxml', memoria=True):
+    """Estadísticas por etapa de una escala"""
+    tiempos = {}
+    for _ in range(repeticiones):
+        for nombre, (segundos, _) in ejecutar_ronda(corpus, motor).items():
+            tiempos.setdefault(nombre, []).append(segundos)
+
+    picos = {}
+    if memoria:
+        picos = {nombre: pico for nombre, (_, pico) in ejecutar_ronda(corpus, motor, memoria=True).items()}
+
+    return {
+        nombre: {
+            'segundos_min': min(valores),
+            'segundos_media': statistics.mean(valores),
+            'pico_bytes': picos.get(nombre),
+        }
+        for nombre, valores in tiempos.items()
+    }
+
+
+def exponentes(resultados):
+    """Exponente de crecimiento de cada etapa entre la escala menor y la mayor"""
+    escalas = sorted(resultados['escalas'], key=int)
+    if len(escalas) < 2:
+        return {}
+    menor, mayor = escalas[0], escalas[-1]
+    ratio_escala = math.log(int(mayor) / int(menor))
+    salida = {}
+    for nombre, datos in resultados['escalas'][mayor]['etapas'].items():
+        base = resultados['escalas'][menor]['etapas'].get(nombre)
+        if base and base['segundos_min'] > 0 and datos['segundos_min'] > 0:
+            salida[nombre] = math.log(datos['segundos_min'] / base['segundos_min']) / ratio_escala
+    return salida
+
+
+def comparar(resultados, base, tolerancia, minimo=0.005):
+    """
+    Etapas más lentas que en `base` por encima de `tolerancia` (cociente de
+    tiempos mínimos). Se ignoran las que tardan menos de `minimo` segundos.
+    """
+    regresiones = []
+    for escala, datos in resultados['escalas'].items():
+        etapas_base = base.get('escalas', {}).get(escala, {}).get('etapas', {})
+        for nombre, actual in datos['etapas'].items():
+            anterior = etapas_base.get(nombre)
+            if not anterior or max(anterior['segundos_min'], actual['segundos_min']) < minimo:
+                continue
+            cociente = actual['segundos_min'] / max(anterior['segundos_min'], 1e-9)
+            if cociente > tolerancia:
+                regresiones.append((escala, nombre, anterior['segundos_min'], actual['segundos_min'], cociente))
+    return regresiones
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Benchmark de las etapas de procesamiento')
+    p.add_argument('--xml', default=str(PROCESAMIENTO_DIR.parent / 'assets' / 'xml' / 'fuenteovejuna.xml'),
+                   help='XML TEI de la obra')
+    p.add_argument('--html-dir', default=str(PROCESAMIENTO_DIR / 'html-bvmc'), help='Carpeta con los HTML')
+    p.add_argument('--posiciones', default=str(PROCESAMIENTO_DIR / 'posiciones_notas.json'),
+                   help='JSON con las posiciones de las notas')
+    p.add_argument('--mapeo', default=str(PROCESAMIENTO_DIR / 'mapeo_notas.json'), help='Mapeo de notas')
+    p.add_argument('--notas-txt', default=str(PROCESAMIENTO_DIR / 'notas.txt'), help='Archivo notas.txt')
+    p.add_argument('--escalas', default='1,10', help='Factores de escala separados por comas (default: 1,10)')
+    p.add_argument('--repeticiones', type=int, default=3, help='Repeticiones por escala (default: 3)')
+    p.add_argument('--motor', choices=['bs4', 'lxml'], default='lxml', help='Motor de extracción HTML')
+    p.add_argument('--sin-memoria', action='store_true', help='No medir el pico de memoria')
+    p.add_argument('-o', '--output', help='Guardar los resultados en JSON')
+    p.add_argument('--comparar', help='JSON de una ejecución anterior con el que comparar')
+    p.add_argument('--tolerancia', type=float, default=1.5,
+                   help='Cociente de tiempos a partir del cual hay regresión (default: 1.5)')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    rutas = {
+        'xml': args.xml,
+        'html_dir': args.html_dir,
+        'posiciones': args.posiciones,
+        'mapeo': args.mapeo,
+        'notas_txt': args.notas_txt,
+    }
+    escalas = [int(e) for e in args.escalas.split(',') if e.strip()]
+
+    resultados = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticiones': args.repeticiones,
+        'motor': args.motor,
+        'escalas': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in escalas:
+            corpus = preparar_corpus(rutas, factor, Path(tmp))
+            print(f"=== Escala x{factor} ({len(corpus['posiciones'])} notas, "
+                  f"{len(corpus['html'])} HTML) ===")
+            etapas = medir_escala(corpus, args.repeticiones, args.motor, memoria=not args.sin_memoria)
+            resultados['escalas'][str(factor)] = {
+                'notas': len(corpus['posiciones']),
+                'bytes_xml': corpus['xml'].stat().st_size,
+                'etapas': etapas,
+            }
+            for nombre, datos in etapas.items():
+                pico = f"{datos['pico_bytes'] / 2**20:9.1f} MiB" if datos['pico_bytes'] is not None else ''
+                print(f"  {nombre:32s} {datos['segundos_min']:9.4f} s  (media {datos['segundos_media']:.4f} s) {pico}")
+            print()
+
+    crecimiento = exponentes(resultados)
+    if crecimiento:
+        resultados['exponentes'] = crecimiento
+        print(f"=== Crecimiento x{escalas[0]} → x{escalas[-1]} (1 ≈ lineal, 2 ≈ cuadrático) ===")
+        for nombre, exponente in crecimiento.items():
+            aviso = '  ⚠' if exponente > 1.5 else ''
+            print(f"  {nombre:32s} {exponente:5.2f}{aviso}")
+        print()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"✓ Resultados guardados en: {args.output}")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args.tolerancia)
+        if regresiones:
+            print(f"\n✗ {len(regresiones)} regresiones (tolerancia x{args.tolerancia}):")
+            for escala, nombre, antes, ahora, cociente in regresiones:
+                print(f"  x{escala} {nombre}: {antes:.4f} s → {ahora:.4f} s (x{cociente:.2f})")
+            sys.exit(1)
+        print(f"\n✓ Sin regresiones respecto a {args.comparar}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché de construcción por contenido (SHA-256).
+
+Cada etapa se identifica con una clave calculada a partir de:
+  - el nombre de la etapa
+  - sus parámetros
+  - el contenido de sus archivos de entrada
+  - el código de los scripts que la implementan
+
+Si la clave coincide con la de la última ejecución y las salidas siguen
+intactas, la etapa se omite. Las salidas se guardan también en un almacén
+direccionado por contenido, de modo que si alguien las borra o las modifica
+a mano se restauran sin volver a ejecutar la etapa.
+"""
+
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+
+TAMANO_BLOQUE = 1 << 16
+
+
+def hash_archivo(ruta):
+    """SHA-256 del contenido de un archivo"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class CacheConstruccion:
+    """Manifiesto de claves por etapa y almacén de salidas"""
+
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+        self.objetos = self.directorio / 'objetos'
+        self.ruta_manifiesto = self.directorio / 'manifiesto.json'
+        self.manifiesto = {}
+        if self.ruta_manifiesto.exists():
+            try:
+                with open(self.ruta_manifiesto, 'r', encoding='utf-8') as f:
+                    self.manifiesto = json.load(f)
+            except (OSError, ValueError):
+                # Manifiesto corrupto: se reconstruye desde cero
+                self.manifiesto = {}
+
+    @staticmethod
+    def clave(etapa, entradas, parametros=None, codigo=()):
+        """Clave SHA-256 de una etapa a partir de sus entradas, parámetros y código"""
+        h = hashlib.sha256()
+        h.update(etapa.encode('utf-8'))
+        h.update(json.dumps(parametros or {}, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        for grupo in (entradas, codigo):
+            h.update(b'\0')
+            for ruta in grupo:
+                h.update(Path(ruta).name.encode('utf-8'))
+                h.update(hash_archivo(ruta).encode('ascii'))
+        return h.hexdigest()
+
+    def vigente(self, etapa, clave, salidas):
+        """
+        Indica si la etapa puede omitirse. Restaura desde el almacén las
+        salidas que falten o hayan cambiado.
+        """
+        registro = self.manifiesto.get(etapa)
+        if not registro or registro.get('clave') != clave:
+            return False
+
+        hashes = registro.get('salidas', {})
+        for salida in salidas:
+            esperado = hashes.get(str(salida))
+            if esperado is None:
+                return False
+            salida = Path(salida)
+            if salida.exists() and hash_archivo(salida) == esperado:
+                continue
+            objeto = self.objetos / esperado
+            if not objeto.exists():
+                return False
+            salida.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(objeto, salida)
+        return True
+
+    def registrar(self, etapa, clave, salidas):
+        """Guarda la clave de la etapa y una copia de sus salidas"""
+        self.objetos.mkdir(parents=True, exist_ok=True)
+        hashes = {}
+        for salida in salidas:
+            digest = hash_archivo(salida)
+            objeto = self.objetos / digest
+            if not objeto.exists():
+                shutil.copyfile(salida, objeto)
+            hashes[str(salida)] = digest
+        self.manifiesto[etapa] = {'clave': clave, 'salidas': hashes}
+        self.guardar()
+        self._limpiar_objetos()
+
+    def _limpiar_objetos(self):
+        """Elimina del almacén las salidas que ya no referencia ninguna etapa"""
+        en_uso = {d for registro in self.manifiesto.values() for d in registro.get('salidas', {}).values()}
+        for objeto in self.objetos.iterdir():
+            if objeto.name not in en_uso:
+                objeto.unlink()
+
+    def guardar(self):
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        temporal = self.ruta_manifiesto.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.manifiesto, f, ensure_ascii=False, indent=2)
+        temporal.replace(self.ruta_manifiesto)
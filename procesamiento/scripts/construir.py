@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reconstrucción incremental de los datos de notas.
+
+Encadena las etapas:
+  1. extraer  : html-bvmc/*.html              → posiciones_notas.json
+  2. mapear   : posiciones_notas.json + XML   → mapeo_notas.json
+  3. convertir: notas.txt                     → notas.xml
+  4. prerenderizar: XML + notas de la web     → HTML de la sala de lectura
+                                                 e índice de notas
+
+Cada etapa se omite si sus entradas, parámetros y código no han cambiado
+desde la última ejecución (ver cache_construccion.py), así que tras editar
+solo notas.txt únicamente se vuelve a ejecutar la conversión.
+
+Uso:
+  python construir.py
+  python construir.py --forzar
+  python construir.py --etapas mapear,convertir
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from cache_construccion import CacheConstruccion
+
+
+SCRIPT_DIR = Path(__file__).parent
+PROCESAMIENTO_DIR = SCRIPT_DIR.parent
+
+# La salida no depende del número de procesos, solo del motor
+PARAMETROS_EXTRAER = {'motor': 'lxml', 'procesos': 3}
+
+EtapaConstruccion = namedtuple('EtapaConstruccion', ['nombre', 'entradas', 'salidas', 'parametros', 'codigo', 'ejecutar'])
+
+
+def _codigo(*modulos):
+    return [SCRIPT_DIR / f'{m}.py' for m in modulos]
+
+
+def definir_etapas(rutas):
+    """Etapas de construcción en orden, a partir de las rutas configuradas"""
+
+    def extraer():
+        from extraer_posiciones_notas import extraer_posiciones, guardar_posiciones
+        notas = extraer_posiciones(rutas['html'], detalle=False, **PARAMETROS_EXTRAER)
+        guardar_posiciones(notas, rutas['posiciones'])
+
+    def mapear():
+        from mapear_notas_xml import mapear_notas, guardar_mapeo
+        with open(rutas['posiciones'], 'r', encoding='utf-8') as f:
+            notas = json.load(f)
+        guardar_mapeo(mapear_notas(notas, rutas['xml'], detalle=False), rutas['mapeo'])
+
+    def convertir():
+        from convertir_notas_xml import convertir_notas_a_xml
+        convertir_notas_a_xml(rutas['notas_txt'], rutas['notas_xml'])
+
+    def prerenderizar():
+        from prerenderizar_lectura import prerenderizar_archivos
+        prerenderizar_archivos(rutas['xml'], rutas['notas_lectura'], rutas['lectura'], detalle=False)
+
+    lectura = Path(rutas['lectura'])
+    stem = Path(rutas['xml']).stem
+
+    return [
+        EtapaConstruccion('extraer', list(rutas['html']), [rutas['posiciones']], {'motor': PARAMETROS_EXTRAER['motor']},
+                          _codigo('extraer_posiciones_notas', 'normalizacion'), extraer),
+        EtapaConstruccion('mapear', [rutas['posiciones'], rutas['xml']], [rutas['mapeo']], {},
+                          _codigo('mapear_notas_xml', 'indice_versos', 'aho_corasick', 'arbol_bk', 'normalizacion'), mapear),
+        EtapaConstruccion('convertir', [rutas['notas_txt']], [rutas['notas_xml']], {},
+                          _codigo('convertir_notas_xml'), convertir),
+        EtapaConstruccion('prerenderizar', [rutas['xml'], rutas['notas_lectura']],
+                          [lectura / f'{stem}.html', lectura / f'{stem}.elementos.json', lectura / 'notas.json'], {},
+                          _codigo('prerenderizar_lectura'), prerenderizar),
+    ]
+
+
+def construir(rutas, cache_dir, nombres=None, forzar=False, detalle=True):
+    """
+    Ejecuta las etapas que lo necesiten.
+    Retorna [(nombre, 'ejecutada' | 'reutilizada', segundos)].
+    """
+    cache = CacheConstruccion(cache_dir)
+    informe = []
+
+    for e in definir_etapas(rutas):
+        if nombres is not None and e.nombre not in nombres:
+            continue
+
+        t0 = time.perf_counter()
+        faltan = [str(r) for r in e.entradas if not Path(r).exists()]
+        if faltan:
+            raise FileNotFoundError(f"Etapa '{e.nombre}': no existen {', '.join(faltan)}")
+
+        clave = cache.clave(e.nombre, e.entradas, e.parametros, e.codigo)
+        if not forzar and cache.vigente(e.nombre, clave, e.salidas):
+            estado = 'reutilizada'
+        else:
+            e.ejecutar()
+            cache.registrar(e.nombre, clave, e.salidas)
+            estado = 'ejecutada'
+
+        segundos = time.perf_counter() - t0
+        informe.append((e.nombre, estado, segundos))
+        if detalle:
+            marca = '✓' if estado == 'ejecutada' else '='
+            print(f"  {marca} {e.nombre:13s} {estado:12s} ({segundos:.3f} s)")
+
+    return informe
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Reconstruir posiciones, mapeo y notas.xml con caché por contenido')
+    p.add_argument('--html-dir', default=str(PROCESAMIENTO_DIR / 'html-bvmc'), help='Carpeta con los HTML de la BVMC')
+    p.add_argument('--xml', default=str(PROCESAMIENTO_DIR.parent / 'assets' / 'xml' / 'fuenteovejuna.xml'),
+                   help='XML TEI de la obra')
+    p.add_argument('--notas-lectura', default=str(PROCESAMIENTO_DIR.parent / 'assets' / 'xml' / 'notas.xml'),
+                   help='Notas TEI que publica la sala de lectura')
+    p.add_argument('--lectura', default=str(PROCESAMIENTO_DIR.parent / 'assets' / 'lectura'),
+                   help='Carpeta de salida del pre-renderizado de la sala de lectura')
+    p.add_argument('--notas-txt', default=str(PROCESAMIENTO_DIR / 'notas.txt'), help='Archivo de notas en texto')
+    p.add_argument('--salida', default=str(PROCESAMIENTO_DIR), help='Carpeta de salida de los archivos generados')
+    p.add_argument('--cache', default=str(PROCESAMIENTO_DIR / '.cache'), help='Carpeta de la caché')
+    p.add_argument('--etapas', help='Etapas a ejecutar, separadas por comas (extraer,mapear,convertir,prerenderizar)')
+    p.add_argument('--forzar', action='store_true', help='Ejecutar todas las etapas aunque no hayan cambiado')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    salida = Path(args.salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    rutas = {
+        'html': sorted(Path(args.html_dir).glob('*.html')),
+        'xml': Path(args.xml),
+        'notas_txt': Path(args.notas_txt),
+        'posiciones': salida / 'posiciones_notas.json',
+        'mapeo': salida / 'mapeo_notas.json',
+        'notas_xml': salida / 'notas.xml',
+        'notas_lectura': Path(args.notas_lectura),
+        'lectura': Path(args.lectura),
+    }
+    nombres = {n.strip() for n in args.etapas.split(',')} if args.etapas else None
+
+    print("=== Construcción incremental ===\n")
+    t0 = time.perf_counter()
+    try:
+        informe = construir(rutas, args.cache, nombres, forzar=args.forzar)
+    except FileNotFoundError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(1)
+
+    ejecutadas = sum(1 for _, estado, _ in informe if estado == 'ejecutada')
+    print(f"\n✓ {ejecutadas} etapas ejecutadas, {len(informe) - ejecutadas} reutilizadas "
+          f"en {time.perf_counter() - t0:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
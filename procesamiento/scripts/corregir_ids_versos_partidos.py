@@ -1,56 +1,76 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Script para corregir IDs de versos partidos con parte F que tienen -a
-Cambia el sufijo de -a a -b en todos los versos con part="F"
+Script para corregir IDs de versos partidos con parte M/F que tienen -a
+Cambia el sufijo -a por el que corresponde según el orden de las partes (ver motor_versos.py)
 """
 
+import argparse
 import xml.etree.ElementTree as ET
-import re
+import shutil
+from pathlib import Path
 
-# Ruta al archivo XML
-xml_file = r'c:\Users\david\OneDrive - UAB\Documents\Todos a una\digital-edition\fuenteovejuna.xml'
-backup_file = r'c:\Users\david\OneDrive - UAB\Documents\Todos a una\digital-edition\fuenteovejuna_backup_correccion.xml'
+from motor_versos import procesar_versos
 
 # Registrar namespace TEI
 ET.register_namespace('', 'http://www.tei-c.org/ns/1.0')
 ET.register_namespace('xml', 'http://www.w3.org/XML/1998/namespace')
 
-# Parsear el archivo
-tree = ET.parse(xml_file)
-root = tree.getroot()
+# Ruta por defecto al archivo XML
+XML_POR_DEFECTO = Path(__file__).parent.parent.parent / 'assets' / 'xml' / 'fuenteovejuna.xml'
 
 # Namespace
 ns = {'tei': 'http://www.tei-c.org/ns/1.0', 'xml': 'http://www.w3.org/XML/1998/namespace'}
 
-# Contador de correcciones
-correcciones = 0
-
-# Buscar todos los versos con part="F" que tengan xml:id terminando en -a
-for l in root.findall('.//tei:l', ns):
-    part_attr = l.get('part')
-    xml_id = l.get('{http://www.w3.org/XML/1998/namespace}id')
-    
-    # Si es parte F y tiene xml:id terminando en -a
-    if part_attr == 'F' and xml_id and xml_id.endswith('-a'):
-        old_id = xml_id
-        # Cambiar el sufijo de -a a -b
-        new_id = re.sub(r'-a$', '-b', old_id)
-        
-        l.set('{http://www.w3.org/XML/1998/namespace}id', new_id)
-        correcciones += 1
-        print(f"Cambiado xml:id de '{old_id}' a '{new_id}' en part=\"F\"")
-
-# Hacer backup del archivo original
-import shutil
-shutil.copy2(xml_file, backup_file)
-print(f"\nBackup creado en: {backup_file}")
 
-# Guardar el archivo modificado
-tree.write(xml_file, encoding='utf-8', xml_declaration=True)
+def corregir_ids(root, detalle=True):
+    """
+    Cambia el sufijo -a de las partes M/F por el que les corresponde por
+    orden (-b, -c...).
+    Retorna el número de correcciones realizadas.
+    """
+    informe = procesar_versos(root, numerar=False, ids=False)
+
+    for conflicto in informe['ids_en_uso']:
+        print(f"⚠ No se cambia '{conflicto['verso']}': xml:id '{conflicto['esperado']}' ya está en uso")
+    if detalle:
+        for cambio in informe['cambios']:
+            print(f"Cambiado xml:id de '{cambio['antes']}' a '{cambio['despues']}'")
+
+    return informe['ids_corregidos']
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    p.add_argument('input', nargs='?', default=str(XML_POR_DEFECTO), help='Archivo XML/TEI (default: assets/xml/fuenteovejuna.xml)')
+    p.add_argument('--backup-file', help='Copia de seguridad (default: <input>_backup_correccion.xml)')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    xml_file = args.input
+    backup_file = args.backup_file or str(Path(xml_file).with_suffix('')) + '_backup_correccion.xml'
+
+    # Parsear el archivo
+    tree = ET.parse(xml_file)
+    root = tree.getroot()
+
+    correcciones = corregir_ids(root)
+
+    # Hacer backup del archivo original
+    shutil.copy2(xml_file, backup_file)
+    print(f"\nBackup creado en: {backup_file}")
+
+    # Guardar el archivo modificado
+    tree.write(xml_file, encoding='utf-8', xml_declaration=True)
+
+    print(f"\n=== RESUMEN ===")
+    print(f"Correcciones realizadas: {correcciones}")
+    print(f"Archivo actualizado: {xml_file}")
+    print(f"\nAhora revisa manualmente los versos con parte M usando búsqueda en VS Code:")
+    print(r'Regex: <l\s+(?:n="\d+"\s+)?part="M"')
+
 
-print(f"\n=== RESUMEN ===")
-print(f"Correcciones realizadas: {correcciones}")
-print(f"Archivo actualizado: {xml_file}")
-print(f"\nAhora revisa manualmente los versos con parte M usando búsqueda en VS Code:")
-print(r'Regex: <l\s+(?:n="\d+"\s+)?part="M"')
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de etapas del pipeline de procesamiento TEI.
+
+Cada script de procesamiento registra su transformación con el decorador
+`etapa`. Una etapa es una función `(root, opciones) -> dict` que modifica el
+árbol en memoria y retorna un resumen de lo que ha hecho; no lee ni escribe
+ficheros. El orden indica su posición en el pipeline completo y `requiere`
+lista las opciones sin las que no puede ejecutarse (p. ej. 'mapeo').
+"""
+
+from collections import namedtuple
+
+
+Etapa = namedtuple('Etapa', ['nombre', 'orden', 'funcion', 'descripcion', 'requiere'])
+
+ETAPAS = {}
+
+
+def etapa(nombre, orden, requiere=()):
+    """Decorador que registra una función como etapa del pipeline"""
+    def registrar(funcion):
+        descripcion = (funcion.__doc__ or '').strip().split('\n')[0]
+        ETAPAS[nombre] = Etapa(nombre, orden, funcion, descripcion, tuple(requiere))
+        return funcion
+    return registrar
+
+
+def etapas_ordenadas(nombres=None):
+    """Retorna las etapas registradas (o solo las indicadas) en orden de pipeline"""
+    if nombres is None:
+        seleccion = list(ETAPAS.values())
+    else:
+        desconocidas = [n for n in nombres if n not in ETAPAS]
+        if desconocidas:
+            raise KeyError(f"Etapas desconocidas: {', '.join(desconocidas)}")
+        seleccion = [ETAPAS[n] for n in nombres]
+    return sorted(seleccion, key=lambda e: e.orden)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportación por fragmentos para la carga diferida.
+
+Divide el XML de la obra y notas.xml en fragmentos que la web puede cargar
+por separado:
+  - uno por acto (<div type="act">);
+  - uno por pasaje, a partir de una exportación de la tabla `pasajes` de
+    Supabase (JSON o CSV con orden, inicio_xmlid, fin_xmlid, acto, titulo).
+
+Cada fragmento se escribe como <clave>.xml (el texto) y <clave>.notas.xml
+(solo las notas cuyo target apunta dentro del fragmento), y cada archivo se
+comprime además en .gz y, si está instalado el módulo `brotli`, en .br.
+Un manifest.json describe todos los fragmentos y pasajes.json guarda la
+tabla de ids y notas de cada pasaje. La carpeta de salida por defecto,
+assets/fragmentos, no se versiona: se regenera con este script.
+
+Los actos y pasajes se resuelven como intervalos de orden de documento
+(ver resolver_pasajes.py).
+
+Uso:
+  python exportar_fragmentos.py
+  python exportar_fragmentos.py --pasajes pasajes.json --salida ../../assets/fragmentos
+  python exportar_fragmentos.py --sin-comprimir
+"""
+
+import argparse
+import copy
+import gzip
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+from lxml import etree
+
+from localizador_versos import XML_ID
+from resolver_pasajes import (IndiceDocumento, cargar_notas, cargar_pasajes, indice_notas,
+                              notas_del_intervalo, resolver_pasaje)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+SCRIPT_DIR = Path(__file__).parent
+ASSETS_DIR = SCRIPT_DIR.parent.parent / 'assets'
+TEI_NS = 'http://www.tei-c.org/ns/1.0'
+
+
+def versos_de(elementos):
+    """(primer, último) @n numérico de los versos del fragmento, o None"""
+    numeros = [int(e.get('n')) for elem in elementos for e in elem.iter('{*}l') if (e.get('n') or '').isdigit()]
+    return [min(numeros), max(numeros)] if numeros else None
+
+
+def notas_subconjunto(notas_root, nota_ids):
+    """Copia de notas.xml con solo las notas indicadas"""
+    nota_ids = set(nota_ids)
+    subconjunto = copy.deepcopy(notas_root)
+    for nota in list(subconjunto.iter('{*}note')):
+        if nota.get(XML_ID) not in nota_ids:
+            nota.getparent().remove(nota)
+    return subconjunto
+
+
+def serializar(elem):
+    return etree.tostring(elem, xml_declaration=True, encoding='utf-8')
+
+
+def contenedor_pasaje(elementos, pasaje):
+    """<div type="pasaje"> de TEI con copia de los elementos del pasaje"""
+    div = etree.Element(f'{{{TEI_NS}}}div', nsmap={None: TEI_NS})
+    div.set('type', 'pasaje')
+    div.set('n', str(pasaje['orden']))
+    div.text = '\n'
+    for elem in elementos:
+        copia = copy.deepcopy(elem)
+        copia.tail = '\n'
+        div.append(copia)
+    return div
+
+
+def escribir_comprimido(ruta, datos, comprimir=True):
+    """Escribe datos y sus versiones .gz/.br; retorna {variante: bytes}"""
+    ruta.write_bytes(datos)
+    tamanos = {'xml': len(datos)}
+    if comprimir:
+        # mtime=0 para que la salida no cambie entre ejecuciones
+        gz = gzip.compress(datos, compresslevel=9, mtime=0)
+        ruta.with_name(ruta.name + '.gz').write_bytes(gz)
+        tamanos['gz'] = len(gz)
+        if brotli is not None:
+            br = brotli.compress(datos, quality=11)
+            ruta.with_name(ruta.name + '.br').write_bytes(br)
+            tamanos['br'] = len(br)
+    return tamanos
+
+
+def escribir_fragmento(salida_dir, clave, raiz, nota_ids, notas_root, comprimir):
+    """Escribe el texto y las notas de un fragmento; retorna su entrada del manifiesto"""
+    ruta_xml = salida_dir / f'{clave}.xml'
+    ruta_notas = salida_dir / f'{clave}.notas.xml'
+    ruta_xml.parent.mkdir(parents=True, exist_ok=True)
+
+    datos = serializar(raiz)
+    notas = notas_subconjunto(notas_root, nota_ids)
+    datos_notas = serializar(notas)
+
+    return {
+        'xml': ruta_xml.relative_to(salida_dir).as_posix(),
+        'notas': ruta_notas.relative_to(salida_dir).as_posix(),
+        'hash': hashlib.sha256(datos + datos_notas).hexdigest()[:12],
+        'num_notas': len(nota_ids),
+        'bytes': {
+            'xml': escribir_comprimido(ruta_xml, datos, comprimir),
+            'notas': escribir_comprimido(ruta_notas, datos_notas, comprimir),
+        },
+    }
+
+
+def exportar_fragmentos(xml_file, notas_file, salida_dir, pasajes=(), comprimir=True, detalle=True):
+    """
+    Escribe los fragmentos por acto y por pasaje y el manifest.json.
+    Retorna el manifiesto.
+    """
+    salida_dir = Path(salida_dir)
+    salida_dir.mkdir(parents=True, exist_ok=True)
+
+    indice = IndiceDocumento(etree.parse(str(xml_file)).getroot())
+    notas_root = cargar_notas(notas_file)
+    notas_por_destino = indice_notas(notas_root)
+
+    manifiesto = {
+        'obra': Path(xml_file).stem,
+        'compresion': ['gz'] + (['br'] if brotli is not None else []) if comprimir else [],
+        'actos': [],
+        'pasajes': [],
+    }
+
+    for o in indice.por_tipo.get('div', []):
+        acto = indice.elementos[o]
+        if acto.get('type') != 'act':
+            continue
+        n = acto.get('n') or str(len(manifiesto['actos']) + 1)
+        raiz = copy.deepcopy(acto)
+        raiz.tail = None
+        intervalo = (o, indice.fines[o])
+        entrada = {'n': n, 'intervalo': list(intervalo), 'versos': versos_de([acto])}
+        entrada.update(escribir_fragmento(salida_dir, f'actos/acto-{n}', raiz,
+                                          notas_del_intervalo(indice, intervalo, notas_por_destino),
+                                          notas_root, comprimir))
+        manifiesto['actos'].append(entrada)
+
+    tabla, fallidos = {}, []
+    for pasaje in pasajes:
+        entrada_tabla, motivo = resolver_pasaje(indice, pasaje, notas_por_destino)
+        if entrada_tabla is None:
+            fallidos.append(pasaje)
+            if detalle:
+                print(f"  ✗ Pasaje {pasaje['orden']} ({pasaje['inicio_xmlid']} → {pasaje['fin_xmlid']}): {motivo}")
+            continue
+        tabla[str(entrada_tabla['orden'])] = entrada_tabla
+        elementos = [indice.elementos[r] for r in indice.raices(entrada_tabla['intervalo'])]
+        entrada = {k: entrada_tabla[k] for k in ('orden', 'id', 'acto', 'titulo', 'inicio_xmlid', 'fin_xmlid')}
+        entrada['versos'] = versos_de(elementos)
+        entrada.update(escribir_fragmento(salida_dir, f"pasajes/pasaje-{pasaje['orden']}",
+                                          contenedor_pasaje(elementos, pasaje), entrada_tabla['notas'],
+                                          notas_root, comprimir))
+        manifiesto['pasajes'].append(entrada)
+
+    if pasajes:
+        with open(salida_dir / 'pasajes.json', 'w', encoding='utf-8') as f:
+            json.dump(tabla, f, ensure_ascii=False, separators=(',', ':'))
+
+    with open(salida_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+
+    if detalle:
+        print(f"  Actos: {len(manifiesto['actos'])}")
+        print(f"  Pasajes: {len(manifiesto['pasajes'])}" + (f" ({len(fallidos)} sin resolver)" if fallidos else ''))
+        if comprimir and brotli is None:
+            print("  (módulo brotli no instalado: solo se genera .gz)")
+    return manifiesto
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Exportar la obra y sus notas en fragmentos por acto y por pasaje')
+    p.add_argument('xml', nargs='?', default=str(ASSETS_DIR / 'xml' / 'fuenteovejuna.xml'), help='XML TEI de la obra')
+    p.add_argument('--notas', default=str(ASSETS_DIR / 'xml' / 'notas.xml'), help='Archivo de notas TEI')
+    p.add_argument('--pasajes', help='Exportación de la tabla pasajes (JSON o CSV)')
+    p.add_argument('--salida', default=str(ASSETS_DIR / 'fragmentos'), help='Carpeta de salida')
+    p.add_argument('--sin-comprimir', action='store_true', help='No generar las versiones .gz/.br')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    pasajes = cargar_pasajes(args.pasajes) if args.pasajes else []
+
+    print("=== Exportación por fragmentos ===\n")
+    manifiesto = exportar_fragmentos(args.xml, args.notas, args.salida, pasajes,
+                                     comprimir=not args.sin_comprimir)
+    print(f"\n✓ Manifiesto guardado en: {Path(args.salida) / 'manifest.json'}")
+
+    if len(manifiesto['pasajes']) < len(pasajes):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
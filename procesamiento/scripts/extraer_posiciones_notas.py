@@ -5,40 +5,16 @@ Script para extraer las posiciones de las notas de los archivos HTML
 y crear un mapeo de dónde debe ir cada nota en el XML
 """
 
+import argparse
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from bs4 import BeautifulSoup
+import lxml.html
 import json
 
-
-def limpiar_texto(texto):
-    """Limpia el texto de espacios y entidades HTML"""
-    # Convertir entidades HTML comunes
-    conversiones = {
-        '&ntilde;': 'ñ',
-        '&aacute;': 'á',
-        '&eacute;': 'é',
-        '&iacute;': 'í',
-        '&oacute;': 'ó',
-        '&uacute;': 'ú',
-        '&Ntilde;': 'Ñ',
-        '&Aacute;': 'Á',
-        '&Eacute;': 'É',
-        '&Iacute;': 'Í',
-        '&Oacute;': 'Ó',
-        '&Uacute;': 'Ú',
-        '&iquest;': '¿',
-        '&iexcl;': '¡',
-        '&ordm;': 'º',
-        '&ordf;': 'ª',
-    }
-    
-    for entidad, caracter in conversiones.items():
-        texto = texto.replace(entidad, caracter)
-    
-    # Normalizar espacios
-    texto = ' '.join(texto.split())
-    return texto
+from normalizacion import limpiar_texto
 
 
 def extraer_notas_de_html(archivo_html):
@@ -105,33 +81,208 @@ def extraer_notas_de_html(archivo_html):
     return notas_encontradas
 
 
-def main():
-    """Función principal"""
-    script_dir = Path(__file__).parent
-    html_dir = script_dir.parent / 'html'
+def _cadena(elem):
+    """Equivalente lxml de `Tag.string` en BeautifulSoup"""
+    hijos = list(elem)
+    if not hijos:
+        return elem.text
+    if len(hijos) == 1 and not elem.text and not hijos[0].tail:
+        if isinstance(hijos[0].tag, str):
+            return _cadena(hijos[0])
+        return hijos[0].text
+    return None
+
+
+def _texto(elem):
+    """Texto de un elemento y sus descendientes, sin comentarios (como `get_text`)"""
+    if not isinstance(elem.tag, str):
+        return ''
+    return ''.join(elem.itertext())
+
+
+def _textos_contenedor(parent):
+    """
+    Recorre una sola vez los hijos directos de un contenedor y retorna
+    (texto_completo, {sup hijo directo: texto anterior a él}).
+    """
+    partes = [parent.text or '']
+    antes_de = {}
+    for child in parent:
+        if child.tag == 'sup':
+            antes_de[child] = ''.join(partes)
+        partes.append(_texto(child))
+        partes.append(child.tail or '')
+    return ''.join(partes), antes_de
+
+
+def extraer_notas_de_html_lxml(archivo_html):
+    """
+    Igual que `extraer_notas_de_html` pero con lxml.html, en una sola pasada
+    lineal: el texto de cada contenedor (td, p, strong) se calcula una vez y
+    se reutiliza para todos sus superíndices.
+    """
+    with open(archivo_html, 'rb') as f:
+        contenido = f.read()
     
-    print("Extrayendo posiciones de notas de los archivos HTML...")
+    doc = lxml.html.document_fromstring(contenido, parser=lxml.html.HTMLParser(encoding='utf-8'))
+    notas_encontradas = []
+    contenedores = {}
     
-    todas_las_notas = []
+    for sup in doc.iter('sup'):
+        link = sup.find('.//a')
+        if link is None:
+            continue
+        cadena = _cadena(link)
+        if not cadena or not cadena.strip().isdigit():
+            continue
+        numero_nota = int(cadena.strip())
+        
+        parent = sup.getparent()
+        while parent is not None and parent.tag not in ['td', 'p', 'strong']:
+            parent = parent.getparent()
+        if parent is None:
+            continue
+        
+        if parent not in contenedores:
+            contenedores[parent] = _textos_contenedor(parent)
+        texto_completo, antes_de = contenedores[parent]
+        
+        # Si el <sup> no es hijo directo del contenedor se toma todo su texto,
+        # como hace el recorrido de `parent.children` con BeautifulSoup
+        texto_antes_sup = limpiar_texto(antes_de.get(sup, texto_completo))
+        
+        palabras = texto_antes_sup.strip().split()
+        if palabras:
+            contexto = ' '.join(palabras[-5:]) if len(palabras) >= 5 else ' '.join(palabras)
+            notas_encontradas.append({
+                'numero': numero_nota,
+                'palabra': palabras[-1],
+                'contexto': contexto,
+                'texto_completo': limpiar_texto(texto_completo)[:200]
+            })
     
-    # Procesar todos los archivos HTML
-    archivos_html = sorted(html_dir.glob('*.html'))
+    return notas_encontradas
+
+
+MOTORES = {
+    'bs4': extraer_notas_de_html,
+    'lxml': extraer_notas_de_html_lxml,
+}
+
+
+def extraer_posiciones(archivos_html, detalle=True, motor='bs4', procesos=1):
+    """
+    Extrae las notas de todos los archivos HTML y las retorna ordenadas por número.
+    Con procesos > 1 los archivos se procesan en paralelo.
+    """
+    extraer = MOTORES[motor]
+    archivos_html = list(archivos_html)
     
-    for archivo in archivos_html:
-        print(f"\nProcesando: {archivo.name}")
-        notas = extraer_notas_de_html(archivo)
+    if procesos > 1 and len(archivos_html) > 1:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(archivos_html))) as pool:
+            resultados = list(pool.map(extraer, archivos_html))
+    else:
+        resultados = [extraer(archivo) for archivo in archivos_html]
+    
+    todas_las_notas = []
+    for archivo, notas in zip(archivos_html, resultados):
+        if detalle:
+            print(f"\nProcesando: {Path(archivo).name}")
+            print(f"  Encontradas {len(notas)} notas")
         todas_las_notas.extend(notas)
-        print(f"  Encontradas {len(notas)} notas")
     
     # Ordenar por número de nota
     todas_las_notas.sort(key=lambda x: x['numero'])
+    return todas_las_notas
+
+
+def comparar_motores(archivos_html, procesos=1):
+    """
+    Extrae las notas con los dos motores y las compara nota a nota.
+    Retorna la lista de diferencias: {numero, campo, bs4, lxml}.
+    """
+    resultados = {m: extraer_posiciones(archivos_html, detalle=False, motor=m, procesos=procesos) for m in MOTORES}
+    por_numero = {m: {} for m in MOTORES}
+    for motor, notas in resultados.items():
+        for nota in notas:
+            por_numero[motor].setdefault(nota['numero'], []).append(nota)
+
+    diferencias = []
+    for numero in sorted(set(por_numero['bs4']) | set(por_numero['lxml'])):
+        de_bs4, de_lxml = por_numero['bs4'].get(numero, []), por_numero['lxml'].get(numero, [])
+        if len(de_bs4) != len(de_lxml):
+            diferencias.append({'numero': numero, 'campo': 'apariciones', 'bs4': len(de_bs4), 'lxml': len(de_lxml)})
+            continue
+        for nota_bs4, nota_lxml in zip(de_bs4, de_lxml):
+            for campo in sorted(set(nota_bs4) | set(nota_lxml)):
+                if nota_bs4.get(campo) != nota_lxml.get(campo):
+                    diferencias.append({'numero': numero, 'campo': campo,
+                                        'bs4': nota_bs4.get(campo), 'lxml': nota_lxml.get(campo)})
+    return diferencias
+
+
+def serializar_posiciones(notas):
+    """JSON de las posiciones, tal como se guarda en posiciones_notas.json"""
+    return json.dumps(notas, ensure_ascii=False, indent=2)
+
+
+def guardar_posiciones(notas, output_file):
+    """Guarda las posiciones de las notas en JSON"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(serializar_posiciones(notas))
+
+
+def parse_args():
+    script_dir = Path(__file__).parent
+    p = argparse.ArgumentParser(description='Extraer las posiciones de las notas de los HTML de la BVMC')
+    p.add_argument('--html-dir', default=str(script_dir.parent / 'html-bvmc'), help='Carpeta con los HTML')
+    p.add_argument('-o', '--output', default=str(script_dir.parent / 'posiciones_notas.json'), help='JSON de salida')
+    p.add_argument('--motor', choices=sorted(MOTORES), default='lxml',
+                   help='Parser HTML (default: lxml; bs4 es la implementación original)')
+    p.add_argument('--procesos', type=int, default=3, help='Archivos a procesar en paralelo (default: 3)')
+    p.add_argument('--verificar', action='store_true',
+                   help='No escribir: comprobar que la salida coincide byte a byte con el JSON existente')
+    p.add_argument('--comparar-motores', action='store_true',
+                   help='No escribir: extraer con bs4 y con lxml y comprobar que dan el mismo resultado')
+    return p.parse_args()
+
+
+def main():
+    """Función principal"""
+    args = parse_args()
+    html_dir = Path(args.html_dir)
+    output_file = Path(args.output)
+    archivos_html = sorted(html_dir.glob('*.html'))
+    
+    if args.comparar_motores:
+        print("Comparando los motores bs4 y lxml...")
+        diferencias = comparar_motores(archivos_html, procesos=args.procesos)
+        if not diferencias:
+            print("✓ Los dos motores dan el mismo resultado")
+            return
+        print(f"✗ {len(diferencias)} diferencias entre bs4 y lxml:", file=sys.stderr)
+        for d in diferencias[:20]:
+            print(f"  Nota {d['numero']} ({d['campo']}): bs4={d['bs4']!r}  lxml={d['lxml']!r}", file=sys.stderr)
+        sys.exit(1)
+    
+    print(f"Extrayendo posiciones de notas de los archivos HTML (motor: {args.motor})...")
+    
+    # Procesar todos los archivos HTML
+    todas_las_notas = extraer_posiciones(archivos_html, motor=args.motor, procesos=args.procesos)
     
     print(f"\n✓ Total de notas encontradas: {len(todas_las_notas)}")
     
+    if args.verificar:
+        with open(output_file, 'r', encoding='utf-8') as f:
+            existente = f.read()
+        if serializar_posiciones(todas_las_notas) == existente:
+            print(f"✓ Salida idéntica a {output_file}")
+            return
+        print(f"✗ La salida difiere de {output_file}", file=sys.stderr)
+        sys.exit(1)
+    
     # Guardar en JSON para análisis
-    output_file = script_dir.parent / 'posiciones_notas.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(todas_las_notas, f, ensure_ascii=False, indent=2)
+    guardar_posiciones(todas_las_notas, output_file)
     
     print(f"✓ Posiciones guardadas en: {output_file}")
     
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de versos para el mapeo de notas al XML de Fuenteovejuna.
+
+Parsea la obra una sola vez y precalcula, para cada <l>:
+  - su texto normalizado
+  - el contexto ampliado (±2 versos hermanos) ya normalizado
+  - su xpath
+
+Además construye un índice invertido token normalizado → versos, de modo que
+buscar una palabra anotada es una consulta a diccionario seguida de puntuar
+unos pocos candidatos, en lugar de recorrer toda la obra en cada nota.
+
+Para mapear todas las notas de una vez, `buscar_lote` construye un autómata
+de Aho–Corasick con las palabras anotadas y las de sus contextos y recorre
+el texto normalizado de la obra (versos separados por '\n') una sola vez.
+
+Cuando una palabra no aparece tal cual, `buscar_aproximada` la busca por
+distancia de edición en un árbol BK del vocabulario de la obra (variantes
+ortográficas entre la BVMC y la edición TEI).
+"""
+
+import re
+from bisect import bisect_right
+from collections import defaultdict
+from lxml import etree
+
+from aho_corasick import AutomataAhoCorasick
+from arbol_bk import ArbolBK
+from normalizacion import normalizar_texto
+
+
+TEI_NS = {'tei': 'http://www.tei-c.org/ns/1.0'}
+
+
+_PATRON_DIGITOS = re.compile(r'\d+')
+
+
+def distancia_maxima(token):
+    """Distancia de edición admitida para un token según su longitud"""
+    if len(token) <= 3:
+        return 0
+    if len(token) <= 6:
+        return 1
+    return 2
+
+
+def _trigramas(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class IndiceVersos:
+    """
+    Índice de solo lectura sobre los versos (<l>) de un XML TEI.
+
+    Los candidatos que devuelve `buscar` son idénticos (mismo orden, mismos
+    scores) a los que producía el recorrido completo de la obra por nota.
+    """
+
+    def __init__(self, xml_file):
+        tree = etree.parse(str(xml_file))
+        root = tree.getroot()
+
+        # Datos por verso, en orden de documento
+        self.numeros = []
+        self.textos = []
+        self.textos_norm = []
+        self.contextos_norm = []
+        self.xpaths = []
+
+        # token normalizado -> índices de versos que lo contienen
+        self.indice = defaultdict(list)
+        # trigrama -> tokens del vocabulario que lo contienen
+        self._trigramas = defaultdict(set)
+        # token buscado -> índices de versos candidatos (memoizado)
+        self._cache_tokens = {}
+        # árbol BK del vocabulario (se construye en la primera búsqueda aproximada)
+        self._arbol_bk = None
+        # token buscado -> {verso: distancia} (memoizado)
+        self._cache_aproximada = {}
+
+        versos = root.xpath('.//tei:l', namespaces=TEI_NS)
+        textos_crudos = {}
+        for l in versos:
+            textos_crudos[l] = ''.join(l.itertext())
+
+        for i, l in enumerate(versos):
+            texto_verso = textos_crudos[l]
+            texto_norm = normalizar_texto(texto_verso)
+
+            self.numeros.append(l.get('n', ''))
+            self.textos.append(texto_verso.strip())
+            self.textos_norm.append(texto_norm)
+            self.contextos_norm.append(self._contexto_ampliado(l, textos_crudos))
+            self.xpaths.append(tree.getpath(l))
+
+            for token in set(texto_norm.split()):
+                self.indice[token].append(i)
+
+        for token in self.indice:
+            for tri in _trigramas(token):
+                self._trigramas[tri].add(token)
+
+        # Texto normalizado de toda la obra y posición de inicio de cada verso
+        # (el separador '\n' no aparece en los textos normalizados)
+        self.texto_obra = '\n'.join(self.textos_norm)
+        self.inicios = []
+        posicion = 0
+        for texto_norm in self.textos_norm:
+            self.inicios.append(posicion)
+            posicion += len(texto_norm) + 1
+
+    @staticmethod
+    def _contexto_ampliado(l, textos_crudos):
+        """Texto normalizado de los versos hermanos en una ventana de ±2 posiciones"""
+        parent = l.getparent()
+        if parent is None:
+            return None
+        hermanos = list(parent)
+        index = hermanos.index(l)
+        versos_cerca = []
+        for i in range(max(0, index - 2), min(len(hermanos), index + 3)):
+            hermano = hermanos[i]
+            if isinstance(hermano.tag, str) and hermano.tag.endswith('l'):
+                texto = textos_crudos.get(hermano)
+                if texto is None:
+                    texto = ''.join(hermano.itertext())
+                versos_cerca.append(texto)
+        return normalizar_texto(' '.join(versos_cerca))
+
+    def __len__(self):
+        return len(self.textos)
+
+    def _versos_con_token(self, token):
+        """Índices de los versos con algún token que contenga `token` como subcadena"""
+        if token in self._cache_tokens:
+            return self._cache_tokens[token]
+
+        if len(token) >= 3:
+            tris = sorted(_trigramas(token), key=lambda t: len(self._trigramas.get(t, ())))
+            posibles = set(self._trigramas.get(tris[0], ()))
+            for tri in tris[1:]:
+                if not posibles:
+                    break
+                posibles &= self._trigramas.get(tri, set())
+        else:
+            posibles = self.indice.keys()
+
+        versos = set()
+        for vocablo in posibles:
+            if token in vocablo:
+                versos.update(self.indice[vocablo])
+
+        resultado = sorted(versos)
+        self._cache_tokens[token] = resultado
+        return resultado
+
+    def candidatos(self, palabra_norm):
+        """Índices (en orden de documento) de los versos que contienen la palabra normalizada"""
+        tokens = palabra_norm.split()
+        if not tokens:
+            # La cadena vacía está contenida en cualquier verso
+            return list(range(len(self)))
+        # Cualquier token de la palabra es subcadena de algún token del verso:
+        # el más largo es el más selectivo
+        token = max(tokens, key=len)
+        return [i for i in self._versos_con_token(token)
+                if palabra_norm in self.textos_norm[i]]
+
+    def puntuar(self, i, palabras_contexto, versos_de=None):
+        """
+        Score de coincidencia del contexto con el verso i y sus vecinos.
+        Con `versos_de` (palabra -> versos que la contienen, de `ocurrencias`)
+        no se vuelve a buscar cada palabra en el texto del verso.
+        """
+        if not palabras_contexto:
+            return 0
+        if versos_de is None:
+            texto_norm = self.textos_norm[i]
+            palabras_encontradas = sum(1 for p in palabras_contexto if p in texto_norm)
+        else:
+            palabras_encontradas = sum(1 for p in palabras_contexto if i in versos_de[p])
+        score = palabras_encontradas / len(palabras_contexto)
+
+        contexto_ampliado_norm = self.contextos_norm[i]
+        if contexto_ampliado_norm is not None:
+            palabras_encontradas_amp = sum(1 for p in palabras_contexto if p in contexto_ampliado_norm)
+            score_ampliado = palabras_encontradas_amp / len(palabras_contexto)
+            if score_ampliado > score:
+                score = score_ampliado
+        return score
+
+    def _candidato(self, i, score):
+        return {
+            'verso': self.numeros[i],
+            'texto': self.textos[i],
+            'score': score,
+            'xpath': self.xpaths[i]
+        }
+
+    def buscar(self, palabra, contexto):
+        """
+        Busca una palabra en el índice y retorna las posibles ubicaciones,
+        ordenadas por score (mismo formato que `encontrar_palabra_en_xml`)
+        """
+        palabra_norm = normalizar_texto(palabra)
+        palabras_contexto = normalizar_texto(contexto).split()
+
+        candidatos = [self._candidato(i, self.puntuar(i, palabras_contexto))
+                      for i in self.candidatos(palabra_norm)]
+
+        # Ordenar por score
+        candidatos.sort(key=lambda x: x['score'], reverse=True)
+        return candidatos
+
+    def ocurrencias(self, patrones):
+        """
+        Recorre la obra una vez con un autómata de todos los patrones
+        (normalizados). Genera (patrón, índice_verso, inicio, fin), con las
+        posiciones relativas al texto normalizado del verso.
+        """
+        automata = AutomataAhoCorasick(patrones)
+        inicios = self.inicios
+        for inicio, fin, pid in automata.buscar(self.texto_obra):
+            i = bisect_right(inicios, inicio) - 1
+            yield automata.patrones[pid], i, inicio - inicios[i], fin - inicios[i]
+
+    def buscar_lote(self, consultas):
+        """
+        Equivalente a `[buscar(palabra, contexto) for palabra, contexto in consultas]`,
+        con un único recorrido de la obra para todas las palabras y contextos
+        """
+        consultas = [(normalizar_texto(palabra), normalizar_texto(contexto).split())
+                     for palabra, contexto in consultas]
+
+        patrones = set()
+        for palabra_norm, palabras_contexto in consultas:
+            patrones.add(palabra_norm)
+            patrones.update(palabras_contexto)
+        patrones.discard('')
+
+        versos_de = defaultdict(set)
+        for patron, i, _, _ in self.ocurrencias(sorted(patrones)):
+            versos_de[patron].add(i)
+
+        resultados = []
+        for palabra_norm, palabras_contexto in consultas:
+            if palabra_norm:
+                versos = sorted(versos_de[palabra_norm])
+            else:
+                # La cadena vacía está contenida en cualquier verso
+                versos = range(len(self))
+            candidatos = [self._candidato(i, self.puntuar(i, palabras_contexto, versos_de))
+                          for i in versos]
+            candidatos.sort(key=lambda x: x['score'], reverse=True)
+            resultados.append(candidatos)
+        return resultados
+
+    def buscar_aproximada(self, palabra, contexto):
+        """
+        Como `buscar`, pero cada token de la palabra puede estar en el verso
+        con una distancia de edición de hasta `distancia_maxima(token)`. Se
+        ignoran los dígitos (números de nota pegados a la palabra en el HTML).
+        Retorna solo los versos con la menor distancia total, con la clave
+        adicional 'distancia', ordenados por score.
+        """
+        tokens = [t for t in _PATRON_DIGITOS.sub('', normalizar_texto(palabra)).split() if t]
+        palabras_contexto = _PATRON_DIGITOS.sub('', normalizar_texto(contexto)).split()
+        if not tokens:
+            return []
+        if self._arbol_bk is None:
+            self._arbol_bk = ArbolBK(sorted(self.indice))
+
+        # verso -> distancia total de los tokens encontrados hasta ahora
+        distancias = None
+        for token in tokens:
+            por_verso = self._cache_aproximada.get(token)
+            if por_verso is None:
+                por_verso = {}
+                for d, vocablo in self._arbol_bk.buscar(token, distancia_maxima(token)):
+                    for i in self.indice[vocablo]:
+                        if d < por_verso.get(i, d + 1):
+                            por_verso[i] = d
+                self._cache_aproximada[token] = por_verso
+            if distancias is None:
+                distancias = por_verso
+            else:
+                distancias = {i: d + por_verso[i] for i, d in distancias.items() if i in por_verso}
+            if not distancias:
+                return []
+
+        minima = min(distancias.values())
+        candidatos = []
+        for i in sorted(i for i, d in distancias.items() if d == minima):
+            candidato = self._candidato(i, self.puntuar(i, palabras_contexto))
+            candidato['distancia'] = minima
+            candidatos.append(candidato)
+        candidatos.sort(key=lambda x: x['score'], reverse=True)
+        return candidatos
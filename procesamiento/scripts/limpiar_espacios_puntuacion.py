@@ -4,16 +4,36 @@
 Limpia espacios en blanco innecesarios antes de signos de puntuación en XML TEI.
 
 Elimina espacios, tabulaciones y saltos de línea que aparecen inmediatamente
-antes de signos de puntuación como , ? : ; . ! )
+antes de signos de puntuación como , ? : ; . ! ) ]
+
+Solo se tocan los nodos de texto, nunca etiquetas, atributos ni la
+declaración DOCTYPE (con los valores de sus entidades). Como script, el
+archivo se procesa en flujo con expat: el marcado se copia tal cual a la
+salida y cada tramo de texto se limpia al llegar la siguiente etiqueta, así
+que la memoria no depende del tamaño del archivo. La salida se escribe en
+la codificación declarada en el documento.
 
 Uso:
   python limpiar_espacios_puntuacion.py archivo.xml --inplace --backup
 """
 
 import argparse
+import os
 import sys
 import shutil
 import re
+from xml.parsers import expat
+
+from etapas import etapa
+
+# Espacios en blanco seguidos de un signo de puntuación
+PATRON_ESPACIO_PUNTUACION = re.compile(r'\s+([,?:;.!)\]])')
+
+# Bytes leídos por bloque al limpiar en flujo
+TAMANO_BLOQUE = 1 << 16
+
+# Codificación de la declaración XML (<?xml ... encoding="..."?>)
+PATRON_CODIFICACION = re.compile(rb'^<\?xml[^>]*?\sencoding\s*=\s*["\']([A-Za-z][A-Za-z0-9._-]*)["\']')
 
 
 def parse_args():
@@ -36,59 +56,153 @@ def parse_args():
     return p.parse_args()
 
 
-def limpiar_espacios_puntuacion(texto):
+def limpiar_nodo_texto(texto, antes_de_cierre=False):
     """
-    Limpia espacios en blanco antes de signos de puntuación.
-    
-    Estrategia:
-    - Elimina espacios/tabs/newlines antes de: , ? : ; . ! ) ]
-    - Elimina espacios después de > si van seguidos de puntuación (ej: <tag>, texto)
-    - Preserva un solo espacio después de etiquetas XML cerradas si es necesario
+    Aplica la limpieza a un único nodo de texto (text o tail).
+    Si el nodo va seguido de una etiqueta de cierre, elimina también el
+    espacio final. La usan tanto limpiar_arbol() como la limpieza en flujo.
+    Retorna (texto_limpio, espacios_eliminados).
     """
-    
-    # Patrones de puntuación problemática
-    # Busca: espacios en blanco (incluye \n, \t, espacios) + signo de puntuación
-    patrones = [
-        (r'\s+([,?:;.!)\]])', r'\1'),  # Eliminar espacios antes de puntuación
-        (r'>\s+([,?:;.!])', r'>\1'),   # Eliminar espacios después de > si sigue puntuación
-        (r'\s+(\s*</)', r'\1'),         # Limpiar espacios extra antes de cierre de etiquetas
-    ]
-    
-    resultado = texto
-    for patron, reemplazo in patrones:
-        resultado = re.sub(patron, reemplazo, resultado)
-    
-    return resultado
+    resultado, cambios = PATRON_ESPACIO_PUNTUACION.subn(r'\1', texto)
+    if antes_de_cierre:
+        resultado = resultado.rstrip()
+    return resultado, cambios
+
+
+def limpiar_arbol(root):
+    """
+    Limpia los espacios antes de puntuación en un árbol XML en memoria,
+    tocando solo nodos de texto (nunca etiquetas ni atributos).
+    Retorna el número de espacios eliminados.
+    """
+    eliminados = 0
+    for elem in root.iter():
+        if not isinstance(elem.tag, str):
+            # Comentarios e instrucciones de procesamiento
+            continue
+        hijos = list(elem)
+        if elem.text:
+            elem.text, cambios = limpiar_nodo_texto(elem.text, antes_de_cierre=not hijos)
+            eliminados += cambios
+        for i, hijo in enumerate(hijos):
+            if hijo.tail:
+                hijo.tail, cambios = limpiar_nodo_texto(hijo.tail, antes_de_cierre=(i == len(hijos) - 1))
+                eliminados += cambios
+    return eliminados
+
+
+@etapa('limpiar_espacios_puntuacion', orden=70)
+def etapa_limpiar_espacios_puntuacion(root, opciones):
+    """Elimina espacios antes de puntuación en los nodos de texto"""
+    return {'espacios_eliminados': limpiar_arbol(root)}
+
+
+class LimpiadorFlujo:
+    """
+    Limpieza en flujo sobre los eventos de expat.
+
+    Sin más manejadores que el DefaultHandler, expat entrega el documento
+    tal como está escrito, trozo a trozo: el marcado (etiquetas, comentarios,
+    instrucciones de procesamiento) se escribe sin cambios y el texto se
+    acumula hasta el siguiente trozo de marcado, que decide si va antes de
+    una etiqueta de cierre. Es la misma regla que limpiar_arbol().
+
+    La declaración DOCTYPE también llega por trozos ('<!DOCTYPE', el nombre,
+    '[', las declaraciones, ']', '>'), y los valores de las entidades
+    parecerían texto: se copia entera sin tocar. No se usan
+    StartDoctypeDeclHandler/EndDoctypeDeclHandler porque con ellos expat ya
+    no entrega al DefaultHandler la apertura ni el cierre de la declaración.
+    """
+
+    def __init__(self, escribir):
+        self.escribir = escribir
+        self.texto = []
+        self.en_cdata = False
+        self.en_doctype = False
+        self.en_subconjunto = False
+        self.eliminados = 0
+
+    def _vaciar(self, antes_de_cierre):
+        if not self.texto:
+            return
+        texto = ''.join(self.texto)
+        self.texto = []
+        limpio, cambios = limpiar_nodo_texto(texto, antes_de_cierre=antes_de_cierre)
+        self.eliminados += cambios
+        self.escribir(limpio)
+
+    def fragmento(self, dato):
+        if self.en_doctype:
+            self.escribir(dato)
+            if dato == '[':
+                self.en_subconjunto = True
+            elif dato == ']':
+                self.en_subconjunto = False
+            elif dato == '>' and not self.en_subconjunto:
+                self.en_doctype = False
+        elif self.en_cdata:
+            # El contenido de CDATA se copia sin tocar
+            self.escribir(dato)
+            self.en_cdata = dato != ']]>'
+        elif not dato.startswith('<'):
+            self.texto.append(dato)
+        else:
+            self._vaciar(antes_de_cierre=dato.startswith('</'))
+            self.escribir(dato)
+            self.en_cdata = dato == '<![CDATA['
+            self.en_doctype = dato == '<!DOCTYPE'
+
+    def cerrar(self):
+        self._vaciar(antes_de_cierre=False)
+
+
+def limpiar_flujo(entrada, escribir, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Limpia un XML leído de `entrada` (binario) y escribe el resultado con
+    `escribir`. Retorna el número de espacios eliminados.
+    """
+    limpiador = LimpiadorFlujo(escribir)
+    parser = expat.ParserCreate()
+    parser.DefaultHandler = limpiador.fragmento
+    while True:
+        bloque = entrada.read(tamano_bloque)
+        parser.Parse(bloque, not bloque)
+        if not bloque:
+            break
+    limpiador.cerrar()
+    return limpiador.eliminados
+
+
+def codificacion_declarada(cabecera):
+    """Codificación con la que está escrito un XML, a partir de sus primeros bytes"""
+    if cabecera.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16'
+    m = PATRON_CODIFICACION.match(cabecera)
+    return m.group(1).decode('ascii') if m else 'utf-8'
 
 
 def limpiar_archivo(input_path, output_path):
-    """Lee el archivo, limpia y guarda."""
-    
-    try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            contenido = f.read()
-    except Exception as e:
-        print(f'Error leyendo {input_path}: {e}', file=sys.stderr)
-        sys.exit(1)
-    
-    # Contar ocurrencias antes
-    import re
-    antes = len(re.findall(r'\s+[,?:;.!)\]]', contenido))
-    
-    # Limpiar
-    contenido_limpio = limpiar_espacios_puntuacion(contenido)
-    
-    # Contar después
-    despues = len(re.findall(r'\s+[,?:;.!)\]]', contenido_limpio))
-    
+    """
+    Limpia el archivo en flujo y guarda el resultado (a través de un
+    temporal, así que la salida puede ser la propia entrada).
+    Retorna los espacios eliminados.
+    """
+    temporal = str(output_path) + '.tmp'
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(contenido_limpio)
-    except Exception as e:
-        print(f'Error escribiendo {output_path}: {e}', file=sys.stderr)
+        with open(input_path, 'rb') as entrada:
+            # La declaración XML se copia tal cual: la salida va en la misma codificación
+            codificacion = codificacion_declarada(entrada.read(1024))
+            entrada.seek(0)
+            with open(temporal, 'w', encoding=codificacion, errors='xmlcharrefreplace', newline='') as salida:
+                eliminados = limpiar_flujo(entrada, salida.write)
+    except (OSError, LookupError, expat.ExpatError) as e:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        print(f'Error limpiando {input_path}: {e}', file=sys.stderr)
         sys.exit(1)
-    
-    return antes, despues
+
+    os.replace(temporal, output_path)
+    return eliminados
 
 
 def main():
@@ -110,12 +224,10 @@ def main():
                 out_path = args.input + '.clean.xml'
     
     # Limpiar
-    antes, despues = limpiar_archivo(args.input, out_path)
+    eliminados = limpiar_archivo(args.input, out_path)
     
     print(f'✓ Limpieza completada')
-    print(f'  Espacios antes de puntuación encontrados: {antes}')
-    print(f'  Espacios restantes: {despues}')
-    print(f'  Espacios eliminados: {antes - despues}')
+    print(f'  Espacios eliminados: {eliminados}')
     print(f'  Archivo guardado: {out_path}')
 
 
@@ -1,19 +1,44 @@
 import re
+from lxml import etree
 
-# Leer el archivo
-with open('fuenteovejuna.xml', 'r', encoding='utf-8') as f:
-    contenido = f.read()
+from etapas import etapa
 
-# Eliminar todos los ns0: de las etiquetas
-contenido = re.sub(r'<ns0:', '<', contenido)
-contenido = re.sub(r'</ns0:', '</', contenido)
 
-# También eliminar xmlns:ns0 si aparece
-contenido = re.sub(r'\s*xmlns:ns0="[^"]*"', '', contenido)
+def limpiar_contenido(contenido):
+    """Elimina los prefijos ns0: que deja ElementTree al serializar"""
+    # Eliminar todos los ns0: de las etiquetas
+    contenido = re.sub(r'<ns0:', '<', contenido)
+    contenido = re.sub(r'</ns0:', '</', contenido)
 
-# Guardar el archivo limpio
-with open('fuenteovejuna.xml', 'w', encoding='utf-8') as f:
-    f.write(contenido)
+    # También eliminar xmlns:ns0 si aparece
+    contenido = re.sub(r'\s*xmlns:ns0="[^"]*"', '', contenido)
+    return contenido
 
-print("✓ Archivo limpiado correctamente")
-print("✓ Todos los prefijos ns0: han sido eliminados")
+
+@etapa('limpiar_namespaces', orden=10)
+def etapa_limpiar_namespaces(root, opciones):
+    """Elimina declaraciones de namespace sin uso"""
+    # Con el árbol en memoria no hay prefijos ns0: (solo aparecen al
+    # serializar con ElementTree); basta con retirar las declaraciones sobrantes
+    antes = len(root.nsmap)
+    etree.cleanup_namespaces(root)
+    return {'namespaces_eliminados': antes - len(root.nsmap)}
+
+
+def main():
+    # Leer el archivo
+    with open('fuenteovejuna.xml', 'r', encoding='utf-8') as f:
+        contenido = f.read()
+
+    contenido = limpiar_contenido(contenido)
+
+    # Guardar el archivo limpio
+    with open('fuenteovejuna.xml', 'w', encoding='utf-8') as f:
+        f.write(contenido)
+
+    print("✓ Archivo limpiado correctamente")
+    print("✓ Todos los prefijos ns0: han sido eliminados")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Localizador de versos para el XML TEI de Fuenteovejuna.
+
+Recorre el árbol una sola vez y construye tablas de acceso directo a los
+elementos <l> y <seg>:
+  - por número de verso (@n)
+  - por xml:id del verso (l-N, l-N-a, l-N-b...)
+  - por xml:id del segmento (seg-N-k), junto con el verso que lo contiene
+
+Funciona igual con árboles de lxml y de xml.etree.ElementTree, para que lo
+puedan usar todos los scripts de procesamiento.
+"""
+
+XML_ID = '{http://www.w3.org/XML/1998/namespace}id'
+
+
+def nombre_local(tag):
+    """Nombre del elemento sin namespace ('' para comentarios e instrucciones)"""
+    if not isinstance(tag, str):
+        return ''
+    return tag.rsplit('}', 1)[-1]
+
+
+class LocalizadorVersos:
+    """Tablas de búsqueda en O(1) sobre los versos y segmentos de una obra"""
+
+    def __init__(self, root):
+        self.versos = []          # <l> en orden de documento
+        self.por_n = {}           # @n -> <l>
+        self.por_id = {}          # xml:id -> <l>
+        self.segs = {}            # xml:id -> <seg>
+        self.verso_de_seg = {}    # xml:id de <seg> -> <l> que lo contiene
+
+        for elem in root.iter():
+            nombre = nombre_local(elem.tag)
+            if nombre == 'l':
+                self._registrar_verso(elem)
+            elif nombre == 'seg':
+                seg_id = elem.get(XML_ID)
+                if seg_id:
+                    self.segs.setdefault(seg_id, elem)
+
+    def _registrar_verso(self, l):
+        self.versos.append(l)
+        n = l.get('n')
+        if n is not None:
+            self.por_n.setdefault(n, l)
+        l_id = l.get(XML_ID)
+        if l_id:
+            self.por_id.setdefault(l_id, l)
+        for sub in l.iter():
+            if nombre_local(sub.tag) == 'seg':
+                seg_id = sub.get(XML_ID)
+                if seg_id:
+                    self.verso_de_seg.setdefault(seg_id, l)
+
+    def __len__(self):
+        return len(self.versos)
+
+    def verso(self, clave):
+        """
+        Retorna el <l> que corresponde a la clave, o None.
+        La clave puede ser un número de verso ('12' o 12), un xml:id de verso
+        ('l-12', 'l-12-b') o de segmento ('seg-12-1'), con o sin '#' inicial.
+        """
+        clave = str(clave).lstrip('#')
+        if clave in self.por_n:
+            return self.por_n[clave]
+        if clave in self.por_id:
+            return self.por_id[clave]
+        return self.verso_de_seg.get(clave)
+
+    def id_en_uso(self, xml_id):
+        """Indica si el xml:id ya está asignado a un verso o segmento"""
+        return xml_id in self.por_id or xml_id in self.segs
+
+    def asignar_id(self, l, nuevo_id):
+        """Cambia el xml:id de un verso manteniendo las tablas actualizadas"""
+        anterior = l.get(XML_ID)
+        if anterior and self.por_id.get(anterior) is l:
+            del self.por_id[anterior]
+        l.set(XML_ID, nuevo_id)
+        self.por_id.setdefault(nuevo_id, l)
+
+    def registrar_seg(self, seg_id, l, seg=None):
+        """Reserva el xml:id de un segmento nuevo del verso `l`"""
+        self.segs.setdefault(seg_id, seg)
+        self.verso_de_seg.setdefault(seg_id, l)
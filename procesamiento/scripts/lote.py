@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Procesamiento por lotes de un corpus de comedias.
+
+Ejecuta el pipeline TEI completo (ver pipeline.py) sobre cada obra de una
+carpeta o patrón glob, repartiendo las obras entre varios procesos. Cada
+obra puede tener su propio mapeo de notas: se busca `<obra>.json` en la
+carpeta indicada con --mapeos, o `<obra>.mapeo.json` junto al XML. Si no hay
+mapeo, la etapa aplicar_notas se omite para esa obra. Del mismo modo, sus
+notas se buscan en `<obra>.xml` dentro de --notas-dir, o en `<obra>.notas.xml`
+junto al XML; las notas enlazadas se escriben junto a la obra procesada
+(`<obra>.notas.xml` en --salida, o el mismo archivo con --inplace).
+
+Al terminar muestra los tiempos por obra y por etapa y los fallos.
+
+Uso:
+  python lote.py corpus/ --salida procesadas/
+  python lote.py "corpus/*.xml" --mapeos mapeos/ --procesos 8 --informe informe.json
+  python lote.py corpus/ --salida procesadas/ --mapeos mapeos/ --notas-dir notas/
+  python lote.py corpus/ --inplace --backup --etapas numerar_e_identificar_versos
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from pipeline import procesar_archivo
+
+
+def es_obra(ruta):
+    """Los <obra>.notas.xml y <obra>.mapeo.* acompañan a una obra, no lo son"""
+    nombre = ruta.name.lower()
+    return nombre.endswith('.xml') and not nombre.endswith('.notas.xml') and '.mapeo.' not in nombre
+
+
+def listar_obras(origen):
+    """Archivos XML de una carpeta (no recursivo) o de un patrón glob, ordenados"""
+    ruta = Path(origen)
+    if ruta.is_dir():
+        return sorted(p for p in ruta.glob('*.xml') if es_obra(p))
+    return sorted(p for p in map(Path, glob.glob(origen, recursive=True)) if es_obra(p))
+
+
+def buscar_mapeo(obra, mapeos_dir=None):
+    """Mapeo de notas de una obra, o None si no tiene"""
+    candidatos = []
+    if mapeos_dir:
+        candidatos.append(Path(mapeos_dir) / f'{obra.stem}.json')
+    candidatos.append(obra.with_name(f'{obra.stem}.mapeo.json'))
+    for candidato in candidatos:
+        if candidato.exists():
+            return candidato
+    return None
+
+
+def buscar_notas(obra, notas_dir=None):
+    """notas.xml de una obra, o None si no tiene"""
+    candidatos = []
+    if notas_dir:
+        candidatos.append(Path(notas_dir) / f'{obra.stem}.xml')
+    candidatos.append(obra.with_name(f'{obra.stem}.notas.xml'))
+    for candidato in candidatos:
+        if candidato.exists():
+            return candidato
+    return None
+
+
+def procesar_obra(obra, salida, nombres, opciones, backup):
+    """
+    Procesa una obra (se ejecuta en un proceso del pool).
+    Nunca lanza excepciones: los errores se devuelven en el resultado.
+    """
+    t0 = time.perf_counter()
+    resultado = {'obra': str(obra), 'salida': str(salida), 'ok': False, 'etapas': [], 'error': None}
+    try:
+        informe = procesar_archivo(obra, salida, nombres, opciones, backup=backup, detalle=False)
+        resultado['etapas'] = [{'nombre': n, 'segundos': s, 'resumen': r} for n, r, s in informe]
+        resultado['ok'] = True
+    except Exception as e:
+        resultado['error'] = f'{type(e).__name__}: {e}'
+        resultado['traza'] = traceback.format_exc()
+    resultado['segundos'] = time.perf_counter() - t0
+    return resultado
+
+
+def procesar_lote(obras, salida_dir=None, mapeos_dir=None, nombres=None, opciones=None,
+                  procesos=None, backup=False, detalle=True, notas_dir=None):
+    """
+    Procesa todas las obras en un ProcessPoolExecutor.
+    Con salida_dir=None se sobrescribe cada obra. Retorna los resultados en
+    el orden de `obras`.
+    """
+    opciones = opciones or {}
+    tareas = []
+    for obra in obras:
+        opciones_obra = dict(opciones)
+        mapeo = buscar_mapeo(obra, mapeos_dir)
+        opciones_obra['mapeo'] = str(mapeo) if mapeo else None
+        salida = Path(salida_dir) / obra.name if salida_dir else obra
+        notas = buscar_notas(obra, notas_dir)
+        opciones_obra['notas'] = str(notas) if notas else None
+        if notas and salida_dir:
+            opciones_obra['notas_salida'] = str(salida.with_name(f'{obra.stem}.notas.xml'))
+        tareas.append((obra, salida, nombres, opciones_obra, backup and salida_dir is None))
+
+    resultados = {}
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = {pool.submit(procesar_obra, *tarea): tarea[0] for tarea in tareas}
+        for futuro in as_completed(futuros):
+            res = futuro.result()
+            resultados[futuros[futuro]] = res
+            if detalle:
+                marca = '✓' if res['ok'] else '✗'
+                print(f"  {marca} {Path(res['obra']).name} ({res['segundos']:.3f} s)"
+                      + ('' if res['ok'] else f" — {res['error']}"))
+
+    return [resultados[obra] for obra in obras]
+
+
+def resumir(resultados, segundos_total):
+    """Estadísticas agregadas del lote"""
+    ok = [r for r in resultados if r['ok']]
+    por_etapa = {}
+    for r in ok:
+        for e in r['etapas']:
+            por_etapa[e['nombre']] = por_etapa.get(e['nombre'], 0.0) + e['segundos']
+    return {
+        'obras': len(resultados),
+        'correctas': len(ok),
+        'fallidas': len(resultados) - len(ok),
+        'segundos_total': segundos_total,
+        'segundos_obras': sum(r['segundos'] for r in resultados),
+        'segundos_por_etapa': por_etapa,
+    }
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Ejecutar el pipeline TEI sobre un corpus de obras en paralelo')
+    p.add_argument('origen', help='Carpeta con XML TEI o patrón glob (entre comillas)')
+    p.add_argument('--salida', help='Carpeta de salida (obligatoria salvo con --inplace)')
+    p.add_argument('--inplace', action='store_true', help='Sobrescribir cada obra')
+    p.add_argument('--backup', action='store_true', help='Con --inplace, copiar cada obra a .bak antes')
+    p.add_argument('--mapeos', help='Carpeta con un <obra>.json de mapeo de notas por obra')
+    p.add_argument('--notas-dir', help='Carpeta con un <obra>.xml de notas por obra (default: <obra>.notas.xml)')
+    p.add_argument('--etapas', help='Etapas a ejecutar, separadas por comas (default: todas)')
+    p.add_argument('--procesos', type=int, default=os.cpu_count(), help='Procesos en paralelo (default: núcleos)')
+    p.add_argument('--esquema', nargs='?', const=True,
+                   help='Validar cada obra escrita contra el RelaxNG local (ver validar_esquema.py)')
+    p.add_argument('--informe', help='Guardar el informe completo en JSON')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if not args.inplace and not args.salida:
+        print('Indica --salida o --inplace', file=sys.stderr)
+        sys.exit(1)
+
+    obras = listar_obras(args.origen)
+    if not obras:
+        print(f'No se encontraron XML en {args.origen}', file=sys.stderr)
+        sys.exit(1)
+
+    if args.salida:
+        Path(args.salida).mkdir(parents=True, exist_ok=True)
+
+    nombres = [n.strip() for n in args.etapas.split(',') if n.strip()] if args.etapas else None
+
+    print(f"=== Lote: {len(obras)} obras, {args.procesos} procesos ===\n")
+    t0 = time.perf_counter()
+    resultados = procesar_lote(obras, None if args.inplace else args.salida, args.mapeos, nombres,
+                               opciones={'esquema': args.esquema}, procesos=args.procesos, backup=args.backup,
+                               notas_dir=args.notas_dir)
+    resumen = resumir(resultados, time.perf_counter() - t0)
+
+    print(f"\n=== Tiempos por obra ===")
+    for r in sorted(resultados, key=lambda r: r['segundos'], reverse=True):
+        estado = 'OK   ' if r['ok'] else 'FALLO'
+        print(f"  {estado} {r['segundos']:8.3f} s  {Path(r['obra']).name}")
+
+    print(f"\n=== Tiempo acumulado por etapa ===")
+    for nombre, segundos in sorted(resumen['segundos_por_etapa'].items(), key=lambda x: -x[1]):
+        print(f"  {nombre:32s} {segundos:8.3f} s")
+
+    print(f"\n=== RESUMEN ===")
+    print(f"Obras procesadas: {resumen['correctas']}/{resumen['obras']}")
+    print(f"Tiempo total: {resumen['segundos_total']:.3f} s (suma por obra: {resumen['segundos_obras']:.3f} s)")
+
+    fallidas = [r for r in resultados if not r['ok']]
+    if fallidas:
+        print(f"\n=== Fallos ({len(fallidas)}) ===")
+        for r in fallidas:
+            print(f"  {r['obra']}: {r['error']}")
+
+    if args.informe:
+        with open(args.informe, 'w', encoding='utf-8') as f:
+            json.dump({'resumen': resumen, 'obras': resultados}, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ Informe guardado en: {args.informe}")
+
+    if fallidas:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,86 +3,328 @@
 """
 Script para mapear las notas del HTML al XML de Fuenteovejuna
 Busca las palabras anotadas en el XML y sugiere dónde insertar cada nota
+
+Con --alinear, en lugar de resolver cada nota por separado se alinea la
+secuencia de notas (numeradas en orden de lectura) con la de versos:
+  1. Las notas con un único candidato hacen de anclas y acotan la ventana de
+     versos de las notas intermedias (con un margen de tolerancia).
+  2. Una programación dinámica con haz limitado elige para cada nota un
+     candidato de su ventana (o ninguno) maximizando coincidencia de
+     contexto y avance monótono por la obra.
+
+Con --aproximada, las notas cuya palabra no aparece tal cual se buscan por
+distancia de edición en un árbol BK del vocabulario de la obra.
 """
 
-import re
+import argparse
 import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from lxml import etree
+
+from indice_versos import IndiceVersos
+
+
+# Índices ya construidos, por ruta del XML
+_indices = {}
 
 
-def normalizar_texto(texto):
-    """Normaliza el texto para comparación"""
-    # Convertir a minúsculas
-    texto = texto.lower()
-    # Eliminar signos de puntuación y espacios extras
-    texto = re.sub(r'[¿?¡!,;:.—\-\(\)\[\]«»""]', '', texto)
-    texto = ' '.join(texto.split())
-    return texto
+def obtener_indice(xml_file):
+    """Retorna el índice de versos del XML, reconstruyéndolo solo si el archivo cambia"""
+    ruta = Path(xml_file).resolve()
+    estado = ruta.stat()
+    firma = (estado.st_mtime_ns, estado.st_size)
+    guardado = _indices.get(str(ruta))
+    if guardado is None or guardado[0] != firma:
+        guardado = (firma, IndiceVersos(ruta))
+        _indices[str(ruta)] = guardado
+    return guardado[1]
 
 
 def encontrar_palabra_en_xml(xml_file, palabra, contexto, numero_nota, num_linea_aprox=None):
     """
-    Busca una palabra en el XML y retorna las posibles ubicaciones
+    Busca una palabra en el XML y retorna las posibles ubicaciones.
+    Con num_linea_aprox, a igual score van primero los versos más cercanos.
+    """
+    candidatos = obtener_indice(xml_file).buscar(palabra, contexto)
+    if num_linea_aprox is not None:
+        candidatos.sort(key=lambda c: (-c['score'], _distancia(c['verso'], num_linea_aprox)))
+    return candidatos
+
+
+def _distancia(verso, num_linea):
+    """Distancia entre el número de un verso y una línea aproximada"""
+    return abs(int(verso) - int(num_linea)) if str(verso).isdigit() else float('inf')
+
+
+# Score de contexto mínimo para aceptar sin revisión una coincidencia aproximada
+SCORE_MINIMO_APROXIMADA = 0.5
+
+
+def clasificar_candidatos(nota, candidatos):
+    """
+    Retorna ('mapeo' | 'no_encontradas' | 'multiples', entrada) según los
+    candidatos encontrados para la nota
+    """
+    numero = nota['numero']
+    palabra = nota['palabra']
+    
+    if not candidatos:
+        return 'no_encontradas', nota
+    claro = len(candidatos) == 1 or (len(candidatos) > 1 and candidatos[0]['score'] > candidatos[1]['score'])
+    aproximada = 'distancia' in candidatos[0]
+    if aproximada and candidatos[0]['score'] < SCORE_MINIMO_APROXIMADA:
+        # Una coincidencia aproximada sin apoyo del contexto se revisa a mano
+        claro = False
+    if claro:
+        # Hay un candidato claro
+        entrada = {
+            'numero_nota': numero,
+            'palabra': palabra,
+            'verso': candidatos[0]['verso'],
+            'texto_verso': candidatos[0]['texto'],
+            'score': candidatos[0]['score'],
+            'xpath': candidatos[0]['xpath']
+        }
+        if aproximada:
+            entrada['distancia'] = candidatos[0]['distancia']
+        return 'mapeo', entrada
+    # Múltiples candidatos con scores similares
+    return 'multiples', {
+        'numero_nota': numero,
+        'palabra': palabra,
+        'contexto': nota['contexto'],
+        'candidatos': candidatos[:5]  # Top 5
+    }
+
+
+# Parámetros de la alineación
+TOLERANCIA_ORDEN = 20       # versos que una nota puede retroceder respecto a la anterior
+SALTO_MAXIMO = 80           # avance (en versos) que todavía cuenta como monótono
+HAZ = 64                    # estados que se conservan en cada paso
+PESO_ORDEN = 0.5            # premio por respetar el orden de lectura
+PESO_DISTANCIA = 0.01       # penalización (por SALTO_MAXIMO versos) del salto
+
+
+def ventanas_por_anclas(posiciones, tolerancia=TOLERANCIA_ORDEN):
+    """
+    Ventana (mínimo, máximo) de posiciones de verso admisibles para cada
+    nota: entre el ancla anterior y la siguiente (notas con un único
+    candidato), ampliada en `tolerancia` versos por cada lado
+    """
+    anterior = [None] * len(posiciones)
+    siguiente = [None] * len(posiciones)
+    ancla = None
+    for j, pos in enumerate(posiciones):
+        anterior[j] = ancla
+        if len(pos) == 1:
+            ancla = pos[0]
+    ancla = None
+    for j in range(len(posiciones) - 1, -1, -1):
+        siguiente[j] = ancla
+        if len(posiciones[j]) == 1:
+            ancla = posiciones[j][0]
+    
+    return [(a - tolerancia if a is not None else float('-inf'),
+             s + tolerancia if s is not None else float('inf'))
+            for a, s in zip(anterior, siguiente)]
+
+
+def alinear_notas(posiciones, scores, tolerancia=TOLERANCIA_ORDEN, salto_maximo=SALTO_MAXIMO, haz=HAZ):
+    """
+    Alineación monótona de la secuencia de notas con la de versos.
+
+    posiciones[j] y scores[j] son las posiciones de verso de los candidatos
+    de la nota j y sus scores de contexto. Retorna, por nota, el índice del
+    candidato elegido o None si conviene dejarla sin mapear.
+    """
+    # estado: última posición elegida -> (puntuación, traza)
+    # la traza es una lista enlazada (elección, traza_anterior) para no copiar
+    estados = {-1: (0.0, None)}
+    for pos_nota, score_nota in zip(posiciones, scores):
+        nuevos = {}
+        
+        def proponer(ultima, total, traza):
+            actual = nuevos.get(ultima)
+            if actual is None or total > actual[0]:
+                nuevos[ultima] = (total, traza)
+        
+        for ultima, (total, traza) in estados.items():
+            # Dejar la nota sin mapear
+            proponer(ultima, total, (None, traza))
+            for k, (pos, score) in enumerate(zip(pos_nota, score_nota)):
+                if ultima >= 0 and pos < ultima - tolerancia:
+                    continue
+                ganancia = 1.0 + score
+                if ultima < 0 or ultima <= pos <= ultima + salto_maximo:
+                    ganancia += PESO_ORDEN
+                if ultima >= 0:
+                    ganancia -= PESO_DISTANCIA * abs(pos - ultima) / salto_maximo
+                proponer(max(ultima, pos), total + ganancia, (k, traza))
+        
+        # Haz: solo los mejores estados pasan al siguiente paso
+        estados = dict(sorted(nuevos.items(), key=lambda e: -e[1][0])[:haz])
+    
+    _, traza = max(estados.values(), key=lambda e: e[0])
+    elecciones = []
+    while traza is not None:
+        eleccion, traza = traza
+        elecciones.append(eleccion)
+    return elecciones[::-1]
+
+
+def buscar_candidatos(indice, consultas, aproximada=False):
+    """
+    Candidatos exactos de cada (palabra, contexto) y, si se pide, los
+    aproximados de las que no tienen ninguno. Retorna [(exactos, aproximados)].
+    """
+    resultados = []
+    for (palabra, contexto), exactos in zip(consultas, indice.buscar_lote(consultas)):
+        aproximados = None
+        if aproximada and not exactos:
+            aproximados = indice.buscar_aproximada(palabra, contexto)
+        resultados.append((exactos, aproximados))
+    return resultados
+
+
+def _iniciar_trabajador(xml_file):
+    """
+    Con fork el trabajador hereda el índice ya construido (copia en
+    escritura) y obtener_indice lo encuentra en caché; con spawn se construye
+    una vez por proceso.
+    """
+    obtener_indice(xml_file)
+
+
+def _buscar_bloque(xml_file, consultas, aproximada):
+    return buscar_candidatos(obtener_indice(xml_file), consultas, aproximada)
+
+
+def buscar_candidatos_en_paralelo(xml_file, consultas, aproximada=False, jobs=2):
+    """
+    Como buscar_candidatos, repartiendo las notas en bloques contiguos entre
+    `jobs` procesos. Los bloques se reúnen en su orden, así que el resultado
+    es idéntico al de la versión secuencial.
+    """
+    tam_bloque = max(1, -(-len(consultas) // (jobs * 4)))
+    bloques = [consultas[i:i + tam_bloque] for i in range(0, len(consultas), tam_bloque)]
+    metodo = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(metodo),
+                             initializer=_iniciar_trabajador, initargs=(str(xml_file),)) as pool:
+        partes = pool.map(_buscar_bloque, [str(xml_file)] * len(bloques), bloques,
+                          [aproximada] * len(bloques))
+        return [r for parte in partes for r in parte]
+
+
+def mapear_notas(notas, xml_file, detalle=True, alinear=False, aproximada=False, jobs=1):
     """
-    tree = etree.parse(xml_file)
-    root = tree.getroot()
+    Mapea todas las notas sobre los versos del XML.
+    Con alinear=True las notas se resuelven en conjunto (ver alinear_notas).
+    Con aproximada=True, las notas sin ninguna coincidencia exacta se buscan
+    por distancia de edición (las entradas llevan la clave 'distancia').
+    Con jobs > 1 la búsqueda de candidatos se reparte entre procesos que
+    comparten el índice de versos.
+    Retorna el diccionario con 'mapeo', 'no_encontradas' y 'multiples'.
+    """
+    # Parsear el XML una sola vez e indexar los versos (antes de crear los
+    # procesos, para que lo hereden)
+    indice = obtener_indice(xml_file)
+    if detalle:
+        print(f"Versos indexados: {len(indice)}")
     
-    # Definir namespaces
-    ns = {'tei': 'http://www.tei-c.org/ns/1.0'}
+    resultado = {'mapeo': [], 'no_encontradas': [], 'multiples': []}
     
-    palabra_norm = normalizar_texto(palabra)
-    contexto_norm = normalizar_texto(contexto)
+    consultas = [(nota['palabra'], nota['contexto']) for nota in notas]
+    if jobs > 1 and len(consultas) > 1:
+        encontrados = buscar_candidatos_en_paralelo(xml_file, consultas, aproximada, jobs)
+    else:
+        # Candidatos de todas las notas en un único recorrido de la obra
+        encontrados = buscar_candidatos(indice, consultas, aproximada)
+    todos_candidatos = [exactos for exactos, _ in encontrados]
     
-    candidatos = []
+    if alinear:
+        todos_candidatos = resolver_por_alineacion(indice, todos_candidatos, detalle)
     
-    # Buscar en todos los elementos <l> (versos)
-    for l in root.xpath('.//tei:l', namespaces=ns):
-        num_verso = l.get('n', '')
-        texto_verso = ''.join(l.itertext())
-        texto_verso_norm = normalizar_texto(texto_verso)
+    recuperadas = 0
+    for i, (nota, candidatos, (_, aproximados)) in enumerate(zip(notas, todos_candidatos, encontrados), 1):
+        if detalle and i % 50 == 0:
+            print(f"Procesando nota {i}/{len(notas)}...")
+        
+        if not candidatos and aproximados:
+            candidatos = aproximados
+            recuperadas += 1
         
-        # Verificar si la palabra está en este verso
-        if palabra_norm in texto_verso_norm:
-            # Calcular score de coincidencia con el contexto
-            # Buscar palabras del contexto en el verso
-            palabras_contexto = contexto_norm.split()
-            palabras_encontradas = sum(1 for p in palabras_contexto if p in texto_verso_norm)
-            score = palabras_encontradas / len(palabras_contexto) if palabras_contexto else 0
-            
-            # Buscar en versos adyacentes para mejor contexto
-            parent = l.getparent()
-            if parent is not None:
-                index = list(parent).index(l)
-                versos_cerca = []
-                for i in range(max(0, index-2), min(len(parent), index+3)):
-                    if i < len(parent) and parent[i].tag.endswith('l'):
-                        versos_cerca.append(''.join(parent[i].itertext()))
-                contexto_ampliado = ' '.join(versos_cerca)
-                contexto_ampliado_norm = normalizar_texto(contexto_ampliado)
-                
-                # Recalcular score con contexto ampliado
-                palabras_encontradas_amp = sum(1 for p in palabras_contexto if p in contexto_ampliado_norm)
-                score_ampliado = palabras_encontradas_amp / len(palabras_contexto) if palabras_contexto else 0
-                
-                if score_ampliado > score:
-                    score = score_ampliado
-            
-            candidatos.append({
-                'verso': num_verso,
-                'texto': texto_verso.strip(),
-                'score': score,
-                'xpath': tree.getpath(l)
-            })
-    
-    # Ordenar por score
-    candidatos.sort(key=lambda x: x['score'], reverse=True)
+        grupo, entrada = clasificar_candidatos(nota, candidatos)
+        resultado[grupo].append(entrada)
     
-    return candidatos
+    if detalle and aproximada:
+        print(f"Notas recuperadas por búsqueda aproximada: {recuperadas}")
+    
+    return resultado
+
+
+def resolver_por_alineacion(indice, todos_candidatos, detalle=True):
+    """
+    Reordena los candidatos de cada nota según la alineación: el elegido
+    pasa a ser el único de su nota; las notas que la alineación deja sin
+    mapear conservan sus candidatos (limitados a su ventana si queda alguno)
+    """
+    posicion_de = {xpath: i for i, xpath in enumerate(indice.xpaths)}
+    posiciones = [[posicion_de[c['xpath']] for c in candidatos] for candidatos in todos_candidatos]
+    
+    # Reducir cada nota a los candidatos de su ventana
+    ventanas = ventanas_por_anclas(posiciones)
+    en_ventana = []
+    for candidatos, pos, (minimo, maximo) in zip(todos_candidatos, posiciones, ventanas):
+        dentro = [k for k, p in enumerate(pos) if minimo <= p <= maximo]
+        en_ventana.append(dentro or list(range(len(pos))))
+    
+    elecciones = alinear_notas(
+        [[posiciones[j][k] for k in ks] for j, ks in enumerate(en_ventana)],
+        [[todos_candidatos[j][k]['score'] for k in ks] for j, ks in enumerate(en_ventana)],
+    )
+    
+    resueltos = []
+    resueltas_multiples = 0
+    for j, (candidatos, ks, eleccion) in enumerate(zip(todos_candidatos, en_ventana, elecciones)):
+        if eleccion is None:
+            resueltos.append([candidatos[k] for k in ks])
+            continue
+        if len(candidatos) > 1 and candidatos[0]['score'] <= candidatos[1]['score']:
+            resueltas_multiples += 1
+        resueltos.append([candidatos[ks[eleccion]]])
+    
+    if detalle:
+        media = sum(len(ks) for ks in en_ventana) / max(len(en_ventana), 1)
+        print(f"Alineación: {media:.1f} candidatos por nota en ventana, "
+              f"{resueltas_multiples} notas ambiguas resueltas")
+    return resueltos
+
+
+def guardar_mapeo(resultado, output_file):
+    """Guarda el mapeo en JSON"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'mapeo': resultado['mapeo'],
+            'no_encontradas': resultado['no_encontradas'],
+            'multiples': resultado['multiples']
+        }, f, ensure_ascii=False, indent=2)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Mapear las notas del HTML al XML')
+    p.add_argument('--alinear', action='store_true',
+                   help='Resolver las notas en conjunto alineándolas con el orden de los versos')
+    p.add_argument('--aproximada', action='store_true',
+                   help='Buscar por distancia de edición las notas sin coincidencia exacta')
+    p.add_argument('--jobs', type=int, default=1,
+                   help='Procesos para buscar los candidatos en paralelo (default: 1)')
+    return p.parse_args()
 
 
 def main():
     """Función principal"""
+    args = parse_args()
     script_dir = Path(__file__).parent
     posiciones_file = script_dir.parent / 'posiciones_notas.json'
     xml_file = script_dir.parent / 'fuenteovejuna.xml'
@@ -95,50 +337,15 @@ def main():
     
     print(f"Notas a procesar: {len(notas)}")
     
-    # Procesar cada nota
-    mapeo = []
-    no_encontradas = []
-    multiples = []
-    
-    for i, nota in enumerate(notas, 1):
-        numero = nota['numero']
-        palabra = nota['palabra']
-        contexto = nota['contexto']
-        
-        if i % 50 == 0:
-            print(f"Procesando nota {i}/{len(notas)}...")
-        
-        candidatos = encontrar_palabra_en_xml(xml_file, palabra, contexto, numero)
-        
-        if not candidatos:
-            no_encontradas.append(nota)
-        elif len(candidatos) == 1 or (len(candidatos) > 1 and candidatos[0]['score'] > candidatos[1]['score']):
-            # Hay un candidato claro
-            mapeo.append({
-                'numero_nota': numero,
-                'palabra': palabra,
-                'verso': candidatos[0]['verso'],
-                'texto_verso': candidatos[0]['texto'],
-                'score': candidatos[0]['score'],
-                'xpath': candidatos[0]['xpath']
-            })
-        else:
-            # Múltiples candidatos con scores similares
-            multiples.append({
-                'numero_nota': numero,
-                'palabra': palabra,
-                'contexto': contexto,
-                'candidatos': candidatos[:5]  # Top 5
-            })
+    resultado = mapear_notas(notas, xml_file, alinear=args.alinear,
+                             aproximada=args.aproximada, jobs=args.jobs)
+    mapeo = resultado['mapeo']
+    no_encontradas = resultado['no_encontradas']
+    multiples = resultado['multiples']
     
     # Guardar resultados
     output_file = script_dir.parent / 'mapeo_notas.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            'mapeo': mapeo,
-            'no_encontradas': no_encontradas,
-            'multiples': multiples
-        }, f, ensure_ascii=False, indent=2)
+    guardar_mapeo(resultado, output_file)
     
     print(f"\n✓ Mapeo guardado en: {output_file}")
     print(f"\n=== Estadísticas ===")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas de versos y detección de candidatos a versos partidos.
+
+Calcula en un solo recorrido las sílabas estimadas de todos los versos de una
+o varias obras y las guarda en columnas compactas (`array`), junto con el
+parlamento al que pertenece cada verso. La detección de versos partidos se
+hace después sobre esas columnas, comparando el último verso de cada
+parlamento con el primero del siguiente, sin volver a tocar el XML.
+
+Dos estimaciones de sílabas:
+  - contar_silabas_aprox    : grupos vocálicos (la aproximación de siempre)
+  - contar_silabas_metricas : separa hiatos, aplica sinalefa entre palabras
+                              y ajusta por final agudo o esdrújulo
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from array import array
+
+from localizador_versos import nombre_local
+
+
+VOCALES = 'aeiouáéíóúü'
+FUERTES = set('aeoáéó')
+DEBILES_ACENTUADAS = set('íú')
+ACENTUADAS = set('áéíóú')
+
+_PATRON_NO_PALABRA = re.compile(r'[^\w\s]')
+_PATRON_GRUPO_VOCALICO = re.compile(f'[{VOCALES}]+')
+
+
+def contar_silabas_aprox(texto):
+    """Cuenta sílabas aproximadas como número de grupos vocálicos"""
+    texto = _PATRON_NO_PALABRA.sub('', texto.lower())
+    return len(_PATRON_GRUPO_VOCALICO.findall(texto))
+
+
+def es_verso_corto(verso_texto, umbral=6):
+    """Indica si el verso tiene como mucho `umbral` sílabas aproximadas"""
+    return contar_silabas_aprox(verso_texto) <= umbral
+
+
+def _nucleos_grupo(grupo):
+    """Divide un grupo vocálico en núcleos silábicos (separa hiatos)"""
+    nucleos = [grupo[0]]
+    for a, b in zip(grupo, grupo[1:]):
+        hiato = (a in FUERTES and b in FUERTES) or \
+                (a in DEBILES_ACENTUADAS and b in FUERTES) or \
+                (a in FUERTES and b in DEBILES_ACENTUADAS)
+        if hiato:
+            nucleos.append(b)
+        else:
+            nucleos[-1] += b
+    return nucleos
+
+
+def _nucleos(palabra):
+    """Núcleos silábicos de una palabra, en orden"""
+    if palabra == 'y':
+        return ['y']
+    return [n for g in _PATRON_GRUPO_VOCALICO.findall(palabra) for n in _nucleos_grupo(g)]
+
+
+def _empieza_por_vocal(palabra):
+    if palabra.startswith('h'):
+        palabra = palabra[1:]
+    return palabra[:1] in VOCALES or palabra == 'y'
+
+
+def _termina_en_vocal(palabra):
+    return palabra[-1:] in VOCALES or palabra == 'y'
+
+
+def _ajuste_final(palabra):
+    """+1 si la última palabra es aguda, -1 si es esdrújula, 0 si es llana"""
+    nucleos = _nucleos(palabra)
+    if not nucleos:
+        return 0
+    if len(nucleos) == 1:
+        return 1
+    for posicion, nucleo in enumerate(reversed(nucleos)):
+        if ACENTUADAS & set(nucleo):
+            return {0: 1, 1: 0}.get(posicion, -1)
+    # Sin tilde: aguda si termina en consonante distinta de n o s
+    if palabra[-1] not in VOCALES and palabra[-1] not in 'ns':
+        return 1
+    return 0
+
+
+def contar_silabas_metricas(texto):
+    """
+    Estimación métrica de sílabas: núcleos vocálicos con hiatos, menos una
+    sílaba por cada sinalefa, más el ajuste por final agudo o esdrújulo
+    """
+    palabras = _PATRON_NO_PALABRA.sub('', texto.lower()).split()
+    if not palabras:
+        return 0
+    total = sum(len(_nucleos(p)) for p in palabras)
+    for anterior, siguiente in zip(palabras, palabras[1:]):
+        if _termina_en_vocal(anterior) and _empieza_por_vocal(siguiente):
+            total -= 1
+    return max(total + _ajuste_final(palabras[-1]), 0)
+
+
+class MetricasVersos:
+    """
+    Columnas de métricas de todos los versos de un corpus.
+
+    Por verso: sílabas aproximadas, sílabas métricas, si tiene @part, su
+    parlamento y su obra. Por parlamento: hablante, primer y último verso
+    (hijos directos de <sp>) y número de versos.
+    """
+
+    def __init__(self):
+        # Columnas por verso
+        self.elementos = []
+        self.textos = []
+        self.silabas = array('B')
+        self.silabas_metricas = array('B')
+        self.partido = array('B')
+        self.obra = array('H')
+
+        # Columnas por parlamento
+        self.hablantes = []
+        self.sp_primero = array('i')
+        self.sp_ultimo = array('i')
+        self.sp_num_versos = array('H')
+        self.sp_obra = array('H')
+
+        self.obras = []
+
+    @classmethod
+    def desde_archivos(cls, rutas):
+        """Construye las métricas de una o varias obras"""
+        metricas = cls()
+        for ruta in rutas:
+            metricas.anadir_obra(ET.parse(ruta).getroot(), str(ruta))
+        return metricas
+
+    def anadir_obra(self, root, nombre=''):
+        """Añade todos los versos y parlamentos de una obra"""
+        num_obra = len(self.obras)
+        self.obras.append(nombre)
+        indice_de = {}
+
+        parlamentos = []
+        for elem in root.iter():
+            tag = nombre_local(elem.tag)
+            if tag == 'sp':
+                parlamentos.append(elem)
+            elif tag == 'l':
+                texto = ' '.join(''.join(elem.itertext()).split())
+                indice_de[elem] = len(self.elementos)
+                self.elementos.append(elem)
+                self.textos.append(texto)
+                self.silabas.append(min(contar_silabas_aprox(texto), 255))
+                self.silabas_metricas.append(min(contar_silabas_metricas(texto), 255))
+                self.partido.append(1 if elem.get('part') else 0)
+                self.obra.append(num_obra)
+
+        for sp in parlamentos:
+            speaker = None
+            versos = []
+            for hijo in sp:
+                tag = nombre_local(hijo.tag)
+                if tag == 'speaker' and speaker is None:
+                    speaker = hijo.text or ''
+                elif tag == 'l':
+                    versos.append(indice_de[hijo])
+            self.hablantes.append(speaker)
+            self.sp_primero.append(versos[0] if versos else -1)
+            self.sp_ultimo.append(versos[-1] if versos else -1)
+            self.sp_num_versos.append(min(len(versos), 65535))
+            self.sp_obra.append(num_obra)
+
+    def __len__(self):
+        return len(self.elementos)
+
+    def candidatos_partidos(self, umbral=7, suma_min=7, suma_max=12, metrico=False):
+        """
+        Pares (último verso de un parlamento, primer verso del siguiente) que
+        pueden formar un verso partido: ambos cortos, sin @part, de hablantes
+        distintos y cuya suma de sílabas está entre suma_min y suma_max
+        """
+        silabas = self.silabas_metricas if metrico else self.silabas
+        candidatos = []
+
+        for s in range(len(self.hablantes) - 1):
+            t = s + 1
+            if self.sp_obra[s] != self.sp_obra[t]:
+                continue
+            hablante1, hablante2 = self.hablantes[s], self.hablantes[t]
+            if hablante1 is None or hablante2 is None or hablante1 == hablante2:
+                continue
+            a, b = self.sp_ultimo[s], self.sp_primero[t]
+            if a < 0 or b < 0 or self.partido[a] or self.partido[b]:
+                continue
+            s1, s2 = silabas[a], silabas[b]
+            if s1 > umbral or s2 > umbral or not (suma_min <= s1 + s2 <= suma_max):
+                continue
+            candidatos.append({
+                'obra': self.obras[self.obra[a]],
+                'speaker1': hablante1,
+                'verso1': self.textos[a],
+                'silabas1': s1,
+                'speaker2': hablante2,
+                'verso2': self.textos[b],
+                'silabas2': s2,
+                'suma': s1 + s2,
+                'num_versos_sp1': self.sp_num_versos[s],
+                'num_versos_sp2': self.sp_num_versos[t],
+                'elemento1': self.elementos[a],
+                'elemento2': self.elementos[b],
+            })
+        return candidatos
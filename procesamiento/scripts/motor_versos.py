@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Numeración e identificación de versos en un solo recorrido.
+
+Recorre los <l> una vez en orden de documento siguiendo el estado de los
+versos partidos (part I/M/F) y, en la misma pasada:
+
+  - numera (@n) de forma continua los versos completos y los iniciales
+    (part="I") de los actos, y quita @n de las partes M y F;
+  - asigna xml:id l-N a los versos completos y l-N-a, l-N-b… a las partes,
+    por orden de aparición;
+  - corrige las partes no iniciales que arrastran el sufijo -a (el error que
+    antes arreglaba corregir_ids_versos_partidos.py aparte).
+
+Los xml:id existentes que no caen en ese caso no se tocan, para no romper
+los target de las notas. Cada cambio se anota en el informe.
+
+Con `desde` (xml:id del primer verso editado, o de uno anterior si el
+editado es nuevo y aún no lo tiene) los versos anteriores solo se
+leen para reconstruir el estado (contador y partes) y únicamente se
+modifican los que van a partir de él.
+
+numerar_versos.py, anadir_ids_versos.py y corregir_ids_versos_partidos.py
+son envoltorios de este motor; en el pipeline es una sola etapa.
+
+Uso:
+  python motor_versos.py ../../assets/xml/fuenteovejuna.xml --simular
+  python motor_versos.py ../../assets/xml/fuenteovejuna.xml --desde l-1200
+  python motor_versos.py obra.xml -o obra.ids.xml --informe cambios.json
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from lxml import etree
+
+from etapas import etapa
+from localizador_versos import XML_ID, nombre_local
+
+
+XML_POR_DEFECTO = Path(__file__).parent.parent.parent / 'assets' / 'xml' / 'fuenteovejuna.xml'
+
+# Partes de un verso partido que no llevan @n
+PARTES_SIN_NUMERO = ('M', 'F')
+
+
+class SecuenciaVersos:
+    """
+    Estado de la convención de ids a lo largo de los versos: último número
+    visto y cuántas partes de cada número han aparecido.
+    """
+
+    def __init__(self):
+        self.ultimo = None
+        self.partes = defaultdict(int)
+
+    def id_para(self, n, part):
+        """
+        (número, xml:id esperado) del siguiente verso, o (None, None) si no
+        tiene número propio ni hay uno anterior del que sea parte.
+        """
+        if n:
+            self.ultimo = n
+        numero = n or (self.ultimo if part else None)
+        if not numero:
+            return None, None
+        if part:
+            sufijo = chr(ord('a') + self.partes[numero])
+            self.partes[numero] += 1
+            return numero, f'l-{numero}-{sufijo}'
+        return numero, f'l-{numero}'
+
+
+def recoger_versos(root):
+    """
+    Un único recorrido del árbol: lista de (verso, acto, en_obra) con el
+    índice del <div type="act"> que contiene al verso (o None) y si está
+    dentro de un <div type="play">, más los xml:id de <l> y <seg> ya en uso.
+    Retorna (versos, hay_actos, usados).
+    """
+    versos = []
+    usados = set()
+    hay_actos = False
+    actos = 0
+    pila = [(root, None, False)]
+    while pila:
+        elem, acto, en_obra = pila.pop()
+        nombre = nombre_local(elem.tag)
+        if nombre == 'div':
+            if elem.get('type') == 'act':
+                hay_actos = True
+                actos += 1
+                acto = actos
+            elif elem.get('type') == 'play':
+                en_obra = True
+        elif nombre == 'l':
+            versos.append((elem, acto, en_obra))
+        if nombre in ('l', 'seg') and elem.get(XML_ID):
+            usados.add(elem.get(XML_ID))
+        hijos = [h for h in elem if isinstance(h.tag, str)]
+        for hijo in reversed(hijos):
+            pila.append((hijo, acto, en_obra))
+    return versos, hay_actos, usados
+
+
+def _cambio(cambios, verso, atributo, antes, despues):
+    cambios.append({'verso': verso.get(XML_ID), 'atributo': atributo, 'antes': antes, 'despues': despues})
+
+
+def procesar_versos(root, numerar=True, ids=True, corregir=True, desde=None):
+    """
+    Numera e identifica los versos en una sola pasada.
+
+    numerar  asigna @n continuo en los actos (o en el div play si no hay actos)
+    ids      añade xml:id a los versos que no lo tienen
+    corregir cambia el sufijo -a de las partes M/F por el que les corresponde
+    desde    xml:id (o elemento) del primer verso que se puede modificar
+
+    Retorna un informe con los recuentos, los ids en uso que impidieron un
+    cambio y la lista de cambios (verso, atributo, antes, después).
+    """
+    versos, hay_actos, usados = recoger_versos(root)
+    informe = {'versos': len(versos), 'numerados': 0, 'ids_anadidos': 0, 'ya_con_id': 0,
+               'ids_corregidos': 0, 'ids_en_uso': [], 'versos_por_acto': defaultdict(int), 'cambios': []}
+    cambios = informe['cambios']
+
+    secuencia = SecuenciaVersos()
+    contador = 1
+    editable = desde is None
+
+    for l, acto, en_obra in versos:
+        editable = editable or l is desde or l.get(XML_ID) == desde
+        part = l.get('part')
+        numerable = acto is not None if hay_actos else en_obra
+        if acto is not None:
+            informe['versos_por_acto'][acto] += 1
+
+        # Antes de `desde` el contador avanza igual, pero no se escribe nada
+        if numerar and numerable:
+            if part is None or part == 'I':
+                nuevo = str(contador)
+                contador += 1
+                informe['numerados'] += 1
+                if editable and l.get('n') != nuevo:
+                    _cambio(cambios, l, 'n', l.get('n'), nuevo)
+                    l.set('n', nuevo)
+            elif part in PARTES_SIN_NUMERO and editable and 'n' in l.attrib:
+                _cambio(cambios, l, 'n', l.get('n'), None)
+                del l.attrib['n']
+
+        if not (ids or corregir):
+            continue
+        numero, esperado = secuencia.id_para(l.get('n'), part)
+        if esperado is None:
+            continue
+        actual = l.get(XML_ID)
+        if actual:
+            informe['ya_con_id'] += 1
+            if not (corregir and editable and part in PARTES_SIN_NUMERO
+                    and actual == f'l-{numero}-a' and esperado != actual):
+                continue
+        elif not (ids and editable):
+            continue
+
+        if esperado in usados:
+            informe['ids_en_uso'].append({'verso': actual, 'esperado': esperado})
+            continue
+        _cambio(cambios, l, 'xml:id', actual, esperado)
+        usados.discard(actual)
+        usados.add(esperado)
+        l.set(XML_ID, esperado)
+        informe['ids_corregidos' if actual else 'ids_anadidos'] += 1
+
+    if not editable:
+        raise ValueError(f"No se encontró el verso {desde} desde el que procesar")
+    informe['versos_por_acto'] = dict(informe['versos_por_acto'])
+    return informe
+
+
+@etapa('numerar_e_identificar_versos', orden=20)
+def etapa_numerar_e_identificar_versos(root, opciones):
+    """Numera los versos y asigna o corrige sus xml:id en un solo recorrido"""
+    informe = procesar_versos(root, desde=opciones.get('desde_verso'))
+    return {
+        'versos_numerados': informe['numerados'],
+        'ids_anadidos': informe['ids_anadidos'],
+        'ids_corregidos': informe['ids_corregidos'],
+        'cambios': len(informe['cambios']),
+    }
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Numerar los versos y asignar sus xml:id en un solo recorrido')
+    p.add_argument('input', nargs='?', default=str(XML_POR_DEFECTO), help='Archivo XML/TEI (default: assets/xml/fuenteovejuna.xml)')
+    p.add_argument('-o', '--output', help='Archivo de salida (default: sobrescribe la entrada)')
+    p.add_argument('--desde', help='xml:id del primer verso editado; los anteriores no se modifican')
+    p.add_argument('--sin-numerar', action='store_true', help='No tocar @n')
+    p.add_argument('--sin-corregir', action='store_true', help='No corregir los sufijos -a de las partes M/F')
+    p.add_argument('--informe', help='Guardar la lista de cambios en JSON')
+    p.add_argument('--simular', action='store_true', help='Mostrar los cambios sin escribir')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    tree = etree.parse(args.input)
+    try:
+        informe = procesar_versos(tree.getroot(), numerar=not args.sin_numerar,
+                                  corregir=not args.sin_corregir, desde=args.desde)
+    except ValueError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Versos: {informe['versos']}  numerados: {informe['numerados']}")
+    print(f"  ids añadidos: {informe['ids_anadidos']}  corregidos: {informe['ids_corregidos']}  "
+          f"ya con id: {informe['ya_con_id']}")
+    print(f"  Cambios: {len(informe['cambios'])}")
+    for c in informe['ids_en_uso']:
+        print(f"⚠ xml:id={c['esperado']} ya está en uso; no se asigna a {c['verso'] or 'verso sin id'}",
+              file=sys.stderr)
+
+    if args.informe:
+        with open(args.informe, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+        print(f"✓ Informe guardado en: {args.informe}")
+
+    if args.simular:
+        print("(simulación: no se ha escrito nada)")
+        return
+    salida = args.output or args.input
+    tree.write(salida, encoding='utf-8', xml_declaration=True)
+    print(f"✓ Archivo guardado: {salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Normalización de texto compartida por los scripts de procesamiento.
+
+Reúne en un solo sitio las funciones que antes estaban duplicadas:
+  - limpiar_texto      : entidades HTML y espacios (extracción de la BVMC)
+  - normalizar_texto   : minúsculas sin puntuación (mapeo de notas)
+  - normalizar_nombre  : mayúsculas sin diacríticos (nombres de personajes)
+
+Las tablas de traducción se construyen una vez al importar el módulo y las
+normalizaciones que se repiten con las mismas cadenas están memoizadas.
+"""
+
+import html
+import unicodedata
+from functools import lru_cache
+
+
+# Signos que se eliminan al comparar texto de notas y versos
+PUNTUACION_COMPARACION = '¿?¡!,;:.—-()[]«»"'
+TABLA_SIN_PUNTUACION = str.maketrans('', '', PUNTUACION_COMPARACION)
+
+
+def normalizar_espacios(texto):
+    """Colapsa cualquier secuencia de espacios en blanco en un solo espacio"""
+    return ' '.join(texto.split())
+
+
+def decodificar_entidades(texto):
+    """Convierte las entidades HTML (&ntilde;, &aacute;, &iquest;...) en caracteres"""
+    if '&' not in texto:
+        return texto
+    return html.unescape(texto)
+
+
+def limpiar_texto(texto):
+    """Limpia el texto de espacios y entidades HTML"""
+    return normalizar_espacios(decodificar_entidades(texto))
+
+
+@lru_cache(maxsize=8192)
+def normalizar_texto(texto):
+    """Normaliza el texto para comparación (minúsculas, sin puntuación ni espacios extra)"""
+    return normalizar_espacios(texto.lower().translate(TABLA_SIN_PUNTUACION))
+
+
+@lru_cache(maxsize=1024)
+def normalizar_nombre(texto):
+    """Mayúsculas sin diacríticos, para comparar nombres de personajes"""
+    texto = texto or ''
+    if not texto.isascii():
+        texto = unicodedata.normalize('NFD', texto)
+        texto = ''.join(ch for ch in texto if unicodedata.category(ch) != 'Mn')
+    return texto.upper().strip()
@@ -1,9 +1,8 @@
 import xml.etree.ElementTree as ET
 import re
 
-# Cargar el archivo XML
-tree = ET.parse('fuenteovejuna.xml')
-root = tree.getroot()
+from localizador_versos import nombre_local
+from motor_versos import procesar_versos
 
 # Namespace TEI
 ns = {'tei': 'http://www.tei-c.org/ns/1.0'}
@@ -11,47 +10,32 @@ ns = {'tei': 'http://www.tei-c.org/ns/1.0'}
 # Registrar el namespace para evitar prefijos ns0:
 ET.register_namespace('', 'http://www.tei-c.org/ns/1.0')
 
-print("=" * 80)
-print("NUMERACIÓN AUTOMÁTICA DE VERSOS")
-print("=" * 80)
-print()
-
-# Encontrar todos los <div type="act"> en el documento
-acts = root.findall('.//div[@type="act"]', ns)
-
-if not acts:
-    # Si no hay actos definidos, buscar el div principal
-    acts = root.findall('.//div[@type="play"]', ns)
-
-contador_global = 1
-
-for act_idx, act in enumerate(acts, 1):
-    # Encontrar todos los versos <l> en este acto
-    versos = act.findall('.//l', ns)
-    
-    print(f"Procesando {'Acto' if len(acts) > 1 else 'Obra'} {act_idx}: {len(versos)} versos encontrados")
-    
-    for verso in versos:
-        # Obtener el atributo part si existe
-        part = verso.get('part')
-        
-        # Solo numerar versos que son iniciales (part="I") o que no tienen part (versos completos)
-        if part is None or part == 'I':
-            # Asignar el número al verso
-            verso.set('n', str(contador_global))
-            contador_global += 1
-        elif part in ['M', 'F']:
-            # Los versos medios y finales no se numeran, pero pueden tener referencia
-            # Eliminar el atributo 'n' si existe para versos M/F
-            if 'n' in verso.attrib:
-                del verso.attrib['n']
-
-print()
-print(f"Total de versos numerados: {contador_global - 1}")
-print()
-
-# Guardar el archivo XML
-print("Guardando cambios en fuenteovejuna.xml...")
+
+def buscar_actos(root):
+    """Retorna los <div type="act"> del documento (o el div principal si no hay actos)"""
+    divs = [e for e in root.iter() if nombre_local(e.tag) == 'div']
+    acts = [d for d in divs if d.get('type') == 'act']
+
+    if not acts:
+        # Si no hay actos definidos, buscar el div principal
+        acts = [d for d in divs if d.get('type') == 'play']
+    return acts
+
+
+def numerar(root, detalle=True):
+    """
+    Numera los versos de forma continua a lo largo de todos los actos.
+    Retorna el número de versos numerados.
+    """
+    informe = procesar_versos(root, ids=False, corregir=False)
+
+    if detalle:
+        por_acto = informe['versos_por_acto'] or {1: informe['versos']}
+        for act_idx, versos in sorted(por_acto.items()):
+            print(f"Procesando {'Acto' if len(por_acto) > 1 else 'Obra'} {act_idx}: {versos} versos encontrados")
+
+    return informe['numerados']
+
 
 # Convertir a string y escribir con formato
 def indent(elem, level=0):
@@ -70,17 +54,41 @@ def indent(elem, level=0):
         if level and (not elem.tail or not elem.tail.strip()):
             elem.tail = i
 
-indent(root)
 
-# Escribir el archivo con declaración XML
-tree.write('fuenteovejuna.xml', encoding='utf-8', xml_declaration=True)
+def main():
+    # Cargar el archivo XML
+    tree = ET.parse('fuenteovejuna.xml')
+    root = tree.getroot()
+
+    print("=" * 80)
+    print("NUMERACIÓN AUTOMÁTICA DE VERSOS")
+    print("=" * 80)
+    print()
+
+    total = numerar(root)
+
+    print()
+    print(f"Total de versos numerados: {total}")
+    print()
+
+    # Guardar el archivo XML
+    print("Guardando cambios en fuenteovejuna.xml...")
+
+    indent(root)
+
+    # Escribir el archivo con declaración XML
+    tree.write('fuenteovejuna.xml', encoding='utf-8', xml_declaration=True)
+
+    print("✓ Archivo guardado correctamente")
+    print()
+    print("RESUMEN:")
+    print(f"  - Versos numerados: {total}")
+    print(f"  - Los versos con part='I' reciben numeración")
+    print(f"  - Los versos con part='M' o part='F' no se numeran")
+    print(f"  - Los versos completos (sin part) se numeran normalmente")
+    print()
+    print("Puedes ejecutar este script cada vez que hagas cambios en los versos.")
+
 
-print("✓ Archivo guardado correctamente")
-print()
-print("RESUMEN:")
-print(f"  - Versos numerados: {contador_global - 1}")
-print(f"  - Los versos con part='I' reciben numeración")
-print(f"  - Los versos con part='M' o part='F' no se numeran")
-print(f"  - Los versos completos (sin part) se numeran normalmente")
-print()
-print("Puedes ejecutar este script cada vez que hagas cambios en los versos.")
+if __name__ == '__main__':
+    main()
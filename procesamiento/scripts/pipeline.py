@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pipeline de procesamiento del XML TEI en una sola pasada.
+
+Parsea el archivo una vez, ejecuta las etapas elegidas sobre el árbol en
+memoria y lo serializa una sola vez al final (con, como mucho, una copia de
+seguridad). Las etapas son las transformaciones de los scripts de esta
+carpeta, registradas con `etapas.etapa`.
+
+Uso:
+  python pipeline.py --listar
+  python pipeline.py assets/xml/fuenteovejuna.xml --inplace --backup
+  python pipeline.py assets/xml/fuenteovejuna.xml -o salida.xml \\
+      --etapas numerar_e_identificar_versos,anadir_ids_sp
+  python pipeline.py assets/xml/fuenteovejuna.xml --inplace --mapeo ../mapeo_notas.json \\
+      --notas assets/xml/notas.xml
+  python pipeline.py assets/xml/fuenteovejuna.xml -o salida.xml --validar
+  python pipeline.py assets/xml/fuenteovejuna.xml --inplace --renumerar-sp --mapa-sp renombrados_sp.json
+  python pipeline.py assets/xml/fuenteovejuna.xml --inplace --esquema --notas assets/xml/notas.xml
+"""
+
+import argparse
+import importlib
+import json
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from lxml import etree
+
+from etapas import ETAPAS, etapas_ordenadas
+
+
+# Scripts que registran etapas al importarse
+MODULOS_ETAPAS = [
+    'limpiar_namespaces',
+    'motor_versos',
+    'anadir_ids_sp',
+    'asignar_who',
+    'limpiar_espacios_puntuacion',
+    'aplicar_notas_xml',
+]
+
+
+def cargar_etapas():
+    """Importa los scripts de procesamiento para que registren sus etapas"""
+    for modulo in MODULOS_ETAPAS:
+        importlib.import_module(modulo)
+    return ETAPAS
+
+
+def seleccionar_etapas(nombres, opciones):
+    """
+    Retorna (etapas_a_ejecutar, omitidas). Si no se indican nombres se usan
+    todas las etapas, omitiendo las que requieren opciones no proporcionadas.
+    """
+    cargar_etapas()
+    explicitas = nombres is not None
+    seleccion = []
+    omitidas = []
+    for e in etapas_ordenadas(nombres):
+        faltan = [r for r in e.requiere if not opciones.get(r)]
+        if faltan:
+            if explicitas:
+                raise ValueError(f"La etapa '{e.nombre}' requiere: {', '.join(faltan)}")
+            omitidas.append((e.nombre, faltan))
+            continue
+        seleccion.append(e)
+    return seleccion, omitidas
+
+
+def ejecutar_etapas(root, etapas, opciones, detalle=True):
+    """
+    Ejecuta las etapas sobre el árbol en memoria. Retorna [(nombre, resumen, segundos)].
+    Con opciones['validar'], después de cada etapa comprueba las referencias
+    (ver validar_referencias.py) y se detiene si la etapa introduce errores.
+    """
+    validar = opciones.get('validar')
+    if validar:
+        from validar_referencias import claves_errores
+        errores = claves_errores(root, opciones.get('notas'))
+
+    informe = []
+    for e in etapas:
+        t0 = time.perf_counter()
+        resumen = e.funcion(root, opciones)
+        segundos = time.perf_counter() - t0
+        informe.append((e.nombre, resumen, segundos))
+        if detalle:
+            print(f"  ✓ {e.nombre} ({segundos:.3f} s): {resumen}")
+        if validar:
+            nuevos = claves_errores(root, opciones.get('notas')) - errores
+            if nuevos:
+                ejemplos = '; '.join(sorted(nuevos)[:3])
+                raise ValueError(f"La etapa '{e.nombre}' introduce {len(nuevos)} errores de integridad: {ejemplos}")
+    return informe
+
+
+def procesar_archivo(entrada, salida, nombres=None, opciones=None, backup=False,
+                     pretty_print=False, detalle=True):
+    """
+    Parsea `entrada`, ejecuta las etapas y escribe el resultado en `salida`.
+    Después, si alguna etapa dejó destinos de notas, enlaza opciones['notas']
+    y lo escribe en opciones['notas_salida'] (por defecto, el propio archivo).
+    Retorna el informe de `ejecutar_etapas`.
+    """
+    opciones = opciones if opciones is not None else {}
+    opciones['destinos_notas'] = {}
+    etapas, omitidas = seleccionar_etapas(nombres, opciones)
+
+    if detalle:
+        for nombre, faltan in omitidas:
+            print(f"  - {nombre} omitida (falta: {', '.join(faltan)})")
+
+    parser = etree.XMLParser(remove_blank_text=False)
+    tree = etree.parse(str(entrada), parser)
+
+    informe = ejecutar_etapas(tree.getroot(), etapas, opciones, detalle=detalle)
+
+    if backup:
+        shutil.copy2(entrada, str(entrada) + '.bak')
+        if detalle:
+            print(f"✓ Backup creado: {entrada}.bak")
+
+    tree.write(str(salida), encoding='utf-8', xml_declaration=True, pretty_print=pretty_print)
+
+    if opciones['destinos_notas'] and opciones.get('notas'):
+        informe.append(enlazar_notas_salida(opciones, detalle))
+    if opciones.get('esquema'):
+        informe.append(validar_salida(salida, opciones, detalle))
+    return informe
+
+
+def enlazar_notas_salida(opciones, detalle=True):
+    """Enlaza notas.xml con los <seg> creados, una vez escrita la obra"""
+    from aplicar_notas_xml import enlazar_archivo_notas
+
+    t0 = time.perf_counter()
+    salida = opciones.get('notas_salida') or opciones['notas']
+    enlace = enlazar_archivo_notas(opciones['notas'], opciones['destinos_notas'], salida)
+    segundos = time.perf_counter() - t0
+    resumen = {'notas_enlazadas': enlace['notas_enlazadas'], 'conflictos': len(enlace['conflictos']),
+               'salida': str(salida)}
+    if detalle:
+        print(f"  ✓ enlazar_notas ({segundos:.3f} s): {resumen}")
+    return ('enlazar_notas', resumen, segundos)
+
+
+def validar_salida(salida, opciones, detalle=True):
+    """
+    Comprobación posterior a la escritura: valida la salida (y notas.xml, si
+    se indicó) contra el esquema RelaxNG local (ver validar_esquema.py).
+    Retorna la entrada del informe o lanza ValueError si no es válida.
+    """
+    from validar_esquema import validar_archivos
+
+    esquema = opciones['esquema']
+    notas = opciones.get('notas_salida') or opciones.get('notas')
+    rutas = [str(salida)] + ([notas] if notas else [])
+    t0 = time.perf_counter()
+    try:
+        resultados = validar_archivos(rutas, None if esquema is True else esquema)
+    except (OSError, etree.LxmlError) as e:
+        raise ValueError(f'No se pudo validar contra el esquema: {e}')
+    segundos = time.perf_counter() - t0
+
+    invalidos = {r: v for r, v in resultados.items() if not v['valido']}
+    if invalidos:
+        ejemplos = []
+        for ruta, v in invalidos.items():
+            for e in v['errores'][:2]:
+                donde = f" [{e['xml_id']}]" if e['xml_id'] else ''
+                ejemplos.append(f"{Path(ruta).name}:{e['linea']}{donde} {e['mensaje']}")
+        ejemplos = '; '.join(ejemplos)
+        raise ValueError(f"{len(invalidos)} archivo(s) no válidos según el esquema: {ejemplos}")
+
+    resumen = ', '.join(f"{Path(r).name} válido" + (' (caché)' if v['cache'] else '') for r, v in resultados.items())
+    if detalle:
+        print(f"  ✓ validar_esquema ({segundos:.3f} s): {resumen}")
+    return ('validar_esquema', resumen, segundos)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Ejecutar el pipeline TEI con un único parseo y una única escritura')
+    p.add_argument('input', nargs='?', help='Archivo XML/TEI de entrada')
+    p.add_argument('-o', '--output', help='Archivo de salida (default: input.procesado.xml o sobrescribe con --inplace)')
+    p.add_argument('--inplace', action='store_true', help='Sobrescribir archivo de entrada')
+    p.add_argument('--backup', action='store_true', help='Hacer copia de seguridad antes de sobrescribir (input.bak)')
+    p.add_argument('--etapas', help='Etapas a ejecutar, separadas por comas (default: todas)')
+    p.add_argument('--mapeo', help='mapeo_notas.json para la etapa aplicar_notas')
+    p.add_argument('--notas', help='notas.xml cuyas notas se enlazan con los <seg> creados')
+    p.add_argument('--notas-salida', help='Dónde escribir notas.xml enlazado (default: el propio archivo con '
+                                          '--inplace; si no, notas.procesado.xml)')
+    p.add_argument('--validar', action='store_true',
+                   help='Comprobar las referencias después de cada etapa y detenerse si alguna las rompe')
+    p.add_argument('--esquema', nargs='?', const=True,
+                   help='Validar la salida (y --notas) contra el RelaxNG local tras escribir; '
+                        'sin ruta, el del <?xml-model?> en procesamiento/esquemas/')
+    p.add_argument('--desde-verso',
+                   help='xml:id del primer verso editado: la numeración y los ids solo cambian desde él')
+    p.add_argument('--renumerar-sp', action='store_true',
+                   help='Renumerar todos los <sp> (por defecto se mantienen sus xml:id y solo se asignan los nuevos)')
+    p.add_argument('--mapa-sp', help='Con --renumerar-sp, guardar el mapa {id anterior: id nuevo} en este JSON')
+    p.add_argument('--pretty', action='store_true', help='Indentar la salida')
+    p.add_argument('--listar', action='store_true', help='Listar las etapas disponibles y salir')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.listar:
+        cargar_etapas()
+        for e in etapas_ordenadas():
+            requiere = f" [requiere: {', '.join(e.requiere)}]" if e.requiere else ''
+            print(f"{e.orden:4d}  {e.nombre:32s} {e.descripcion}{requiere}")
+        return
+
+    if not args.input:
+        print('Falta el archivo de entrada (o usa --listar)', file=sys.stderr)
+        sys.exit(1)
+
+    if args.inplace:
+        out_path = args.input
+    elif args.output:
+        out_path = args.output
+    elif args.input.lower().endswith('.xml'):
+        out_path = args.input[:-4] + '.procesado.xml'
+    else:
+        out_path = args.input + '.procesado.xml'
+
+    notas_salida = args.notas_salida
+    if args.notas and not notas_salida:
+        notas_salida = args.notas if args.inplace else str(Path(args.notas).with_suffix('')) + '.procesado.xml'
+
+    nombres = [n.strip() for n in args.etapas.split(',') if n.strip()] if args.etapas else None
+    opciones = {
+        'mapeo': args.mapeo,
+        'notas': args.notas,
+        'notas_salida': notas_salida,
+        'renumerar_sp': args.renumerar_sp,
+        'mapa_ids_sp': {},
+        'desde_verso': args.desde_verso,
+        'validar': args.validar,
+        'esquema': args.esquema,
+    }
+
+    print(f"=== Pipeline TEI: {args.input} ===\n")
+    t0 = time.perf_counter()
+    try:
+        informe = procesar_archivo(args.input, out_path, nombres, opciones,
+                                   backup=args.inplace and args.backup,
+                                   pretty_print=args.pretty)
+    except (KeyError, ValueError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(1)
+    except (OSError, etree.XMLSyntaxError) as e:
+        print(f'Error procesando {args.input}: {e}', file=sys.stderr)
+        sys.exit(1)
+
+    print(f"\n✓ {len(informe)} etapas ejecutadas en {time.perf_counter() - t0:.3f} s")
+    print(f"✓ Archivo guardado: {out_path}")
+    if opciones['destinos_notas'] and args.notas:
+        print(f"✓ Notas enlazadas guardadas: {notas_salida}")
+
+    if args.mapa_sp:
+        with open(args.mapa_sp, 'w', encoding='utf-8') as f:
+            json.dump(opciones['mapa_ids_sp'], f, ensure_ascii=False, indent=2)
+        print(f"✓ Mapa de ids de <sp> ({len(opciones['mapa_ids_sp'])} renombrados): {args.mapa_sp}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pre-renderizado de la sala de lectura.
+
+Convierte el TEI en el mismo HTML de elementos personalizados que genera
+CETEI.js en el navegador (convertEl), para que la página no tenga que
+descargar y transformar el XML en cada visita:
+
+  - cada elemento pasa a <tei-nombre>, con sus atributos copiados;
+  - xmlns se guarda como data-xmlns, xml:id se duplica en id, xml:lang en
+    lang y rendition en class (sin '#');
+  - se añaden data-origname, data-origatts y data-empty como hace CETEI.
+
+Además genera:
+  - la lista de elementos presentes (prefijo:nombre), que la página pasa a
+    CETEIcean.define() para aplicar los comportamientos, junto con el
+    SHA-256 del XML de origen, que también encabeza el HTML en un
+    comentario: la página comprueba que los dos archivos son de la misma
+    construcción (la frescura respecto al XML la garantiza construir.py);
+  - un índice JSON compacto de las notas de notas.xml por id de destino
+    (seg o l), sin las notas que aún no están enlazadas.
+
+Uso:
+  python prerenderizar_lectura.py
+  python prerenderizar_lectura.py ../../assets/xml/fuenteovejuna.xml --notas ../../assets/xml/notas.xml
+  python prerenderizar_lectura.py --salida ../../assets/lectura
+"""
+
+import argparse
+import hashlib
+import json
+import re
+from pathlib import Path
+
+from lxml import etree
+
+
+SCRIPT_DIR = Path(__file__).parent
+ASSETS_DIR = SCRIPT_DIR.parent.parent / 'assets'
+
+# Los mismos prefijos que registra CETEI.js por defecto
+NAMESPACES = {
+    'http://www.tei-c.org/ns/1.0': 'tei',
+    'http://www.tei-c.org/ns/Examples': 'teieg',
+    'http://relaxng.org/ns/structure/1.0': 'rng',
+}
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+
+_ESCAPE_TEXTO = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+_ESCAPE_ATRIBUTO = str.maketrans({'&': '&amp;', '"': '&quot;'})
+_ESPACIOS = re.compile(r'\s+')
+
+
+def nombre_atributo(clave, nsmap):
+    """Nombre calificado de un atributo tal como lo da el DOM (xml:id, xlink:href...)"""
+    qname = etree.QName(clave)
+    if qname.namespace is None:
+        return qname.localname
+    if qname.namespace == XML_NS:
+        return f'xml:{qname.localname}'
+    for prefijo, uri in nsmap.items():
+        if uri == qname.namespace and prefijo:
+            return f'{prefijo}:{qname.localname}'
+    return qname.localname
+
+
+def declaraciones_nuevas(elem):
+    """Declaraciones de espacio de nombres que introduce el elemento (atributos xmlns del DOM)"""
+    padre = elem.getparent()
+    heredadas = padre.nsmap if padre is not None else {}
+    return [('xmlns' if prefijo is None else f'xmlns:{prefijo}', uri)
+            for prefijo, uri in elem.nsmap.items() if heredadas.get(prefijo) != uri]
+
+
+def atributos_html(elem):
+    """
+    Atributos de salida de un elemento, en el orden en que los fija convertEl.
+    Retorna (atributos, nombres_originales).
+    """
+    originales = declaraciones_nuevas(elem) + [(nombre_atributo(k, elem.nsmap), v) for k, v in elem.attrib.items()]
+    salida = {}
+    for nombre, valor in originales:
+        if nombre == 'xmlns':
+            salida['data-xmlns'] = valor
+        else:
+            salida[nombre.lower()] = valor
+        if nombre == 'xml:id':
+            salida['id'] = valor
+        elif nombre == 'xml:lang':
+            salida['lang'] = valor
+        elif nombre == 'rendition':
+            salida['class'] = valor.replace('#', '')
+    return salida, [nombre for nombre, _ in originales]
+
+
+def estilo_tags_decl(elem):
+    """Reglas CSS de los <rendition scheme="css"> de un tagsDecl, como las genera CETEI"""
+    reglas = []
+    for hijo in elem:
+        if not isinstance(hijo.tag, str) or etree.QName(hijo).localname != 'rendition' or hijo.get('scheme') != 'css':
+            continue
+        texto = ''.join(hijo.itertext())
+        selector = hijo.get('selector')
+        if selector is not None:
+            selector = re.sub(r'([^#, >]+\w*)', r'tei-\1', selector).replace('#tei-', '#')
+        else:
+            selector = '.' + (hijo.get(f'{{{XML_NS}}}id') or '')
+        reglas.append(f'{selector}{{\n{texto}\n}}\n')
+    return ''.join(reglas)
+
+
+def _escribir(elem, partes, elementos):
+    qname = etree.QName(elem)
+    prefijo = NAMESPACES.get(qname.namespace or '')
+    if prefijo is None:
+        # CETEI importa tal cual los elementos de espacios no registrados
+        etiqueta = qname.localname
+    else:
+        etiqueta = f'{prefijo}-{qname.localname}'.lower()
+        elementos.add(f'{prefijo}:{qname.localname}')
+
+    atributos, originales = atributos_html(elem)
+    atributos['data-origname'] = qname.localname
+    if originales:
+        atributos['data-origatts'] = ' '.join(originales)
+    vacio = elem.text is None and len(elem) == 0
+    if vacio:
+        atributos['data-empty'] = ''
+
+    partes.append(f'<{etiqueta}')
+    for nombre, valor in atributos.items():
+        partes.append(f' {nombre}="{valor.translate(_ESCAPE_ATRIBUTO)}"')
+    partes.append('>')
+
+    if qname.localname == 'tagsDecl':
+        estilo = estilo_tags_decl(elem)
+        if estilo:
+            partes.append(f'<style>{estilo}</style>')
+
+    if elem.text:
+        partes.append(elem.text.translate(_ESCAPE_TEXTO))
+    for hijo in elem:
+        if isinstance(hijo.tag, str):
+            _escribir(hijo, partes, elementos)
+        elif hijo.tag is etree.Comment:
+            partes.append(f'<!--{hijo.text or ""}-->')
+        else:
+            # Una instrucción de procesamiento clonada en HTML se serializa como comentario
+            partes.append(f'<!--?{hijo.target} {hijo.text or ""}?-->')
+        if hijo.tail:
+            partes.append(hijo.tail.translate(_ESCAPE_TEXTO))
+    partes.append(f'</{etiqueta}>')
+
+
+def prerenderizar(root):
+    """
+    HTML de elementos personalizados equivalente al de CETEI.js para el
+    elemento raíz dado. Retorna (html, elementos ordenados).
+    """
+    partes = []
+    elementos = set()
+    _escribir(root, partes, elementos)
+    return ''.join(partes), sorted(elementos)
+
+
+def indice_notas(notas_root):
+    """
+    Índice {id_destino: [nota, ...]} de las notas enlazadas, en orden de
+    documento. Cada nota es {id, n, type, texto}, más 'subtype' si lo tiene
+    y, si apunta a varios destinos, 'target' con todos ellos.
+    """
+    indice = {}
+    for nota in notas_root.iter('{*}note'):
+        destinos = [t.lstrip('#') for t in (nota.get('target') or '').split() if t.lstrip('#')]
+        if not destinos:
+            continue
+        entrada = {
+            'id': nota.get(f'{{{XML_NS}}}id'),
+            'n': nota.get('n'),
+            'type': nota.get('type'),
+            'texto': _ESPACIOS.sub(' ', ''.join(nota.itertext())).strip(),
+        }
+        if nota.get('subtype'):
+            entrada['subtype'] = nota.get('subtype')
+        if len(destinos) > 1:
+            entrada['target'] = destinos
+        for destino in destinos:
+            indice.setdefault(destino, []).append(entrada)
+    return indice
+
+
+def prerenderizar_archivos(xml_file, notas_file, salida_dir, detalle=True):
+    """
+    Escribe <obra>.html, <obra>.elementos.json y notas.json en salida_dir.
+    Retorna las rutas escritas.
+    """
+    xml_file = Path(xml_file)
+    salida_dir = Path(salida_dir)
+    salida_dir.mkdir(parents=True, exist_ok=True)
+
+    fuente = xml_file.read_bytes()
+    huella = hashlib.sha256(fuente).hexdigest()
+    html, elementos = prerenderizar(etree.fromstring(fuente, etree.XMLParser(), base_url=str(xml_file)))
+    ruta_html = salida_dir / f'{xml_file.stem}.html'
+    ruta_html.write_text(f'<!-- fuente: {huella} -->' + html, encoding='utf-8')
+    ruta_elementos = salida_dir / f'{xml_file.stem}.elementos.json'
+    with open(ruta_elementos, 'w', encoding='utf-8') as f:
+        json.dump({'fuente': huella, 'elementos': elementos}, f,
+                  ensure_ascii=False, separators=(',', ':'))
+    rutas = [ruta_html, ruta_elementos]
+
+    if notas_file is not None:
+        # notas.xml puede tener xml:id vacíos, que no son NCName válidos
+        notas_root = etree.parse(str(notas_file), etree.XMLParser(recover=True)).getroot()
+        indice = indice_notas(notas_root)
+        ruta_notas = salida_dir / 'notas.json'
+        with open(ruta_notas, 'w', encoding='utf-8') as f:
+            json.dump(indice, f, ensure_ascii=False, separators=(',', ':'))
+        rutas.append(ruta_notas)
+        if detalle:
+            print(f"  Notas indexadas: {sum(len(v) for v in indice.values())} en {len(indice)} destinos")
+
+    if detalle:
+        print(f"  Elementos distintos: {len(elementos)}")
+        for ruta in rutas:
+            print(f"  ✓ {ruta} ({ruta.stat().st_size / 1024:.1f} KB)")
+    return rutas
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Pre-renderizar el TEI y el índice de notas para la sala de lectura')
+    p.add_argument('xml', nargs='?', default=str(ASSETS_DIR / 'xml' / 'fuenteovejuna.xml'), help='XML TEI de la obra')
+    p.add_argument('--notas', default=str(ASSETS_DIR / 'xml' / 'notas.xml'), help='Archivo de notas TEI')
+    p.add_argument('--sin-notas', action='store_true', help='No generar el índice de notas')
+    p.add_argument('--salida', default=str(ASSETS_DIR / 'lectura'), help='Carpeta de salida')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    print("=== Pre-renderizado de la sala de lectura ===\n")
+    prerenderizar_archivos(args.xml, None if args.sin_notas else args.notas, args.salida)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Publicación de notas.xml en la tabla `notas`.
+
+Compara las notas de notas.xml con las filas de la tabla por un hash de su
+contenido (target, type, subtype, texto) y solo envía las nuevas o
+modificadas:
+
+  - una sola consulta lee el estado actual de la tabla;
+  - un INSERT multi-fila con ON CONFLICT (nota_id, version) DO UPDATE
+    inserta las versiones nuevas y corrige las modificadas;
+  - un UPDATE marca active = false en las demás versiones de cada nota
+    publicada (y, con --desactivar-ausentes, en las notas que ya no están
+    en notas.xml).
+
+Todo va en una transacción. La versión de cada nota es su atributo @n
+("1.0"). Las notas sin xml:id o sin target todavía no están enlazadas y se
+omiten.
+
+El destino puede ser una base SQLite (para pruebas locales, con
+--crear-tabla se crea la tabla con el esquema de supabase_diagram.dblm) o
+una URL postgresql:// si está instalado psycopg.
+
+Uso:
+  python publicar_notas.py prueba.db --crear-tabla
+  python publicar_notas.py postgresql://usuario@host/base --notas ../../assets/xml/notas.xml
+  python publicar_notas.py prueba.db --simular
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from lxml import etree
+
+
+SCRIPT_DIR = Path(__file__).parent
+NOTAS_POR_DEFECTO = SCRIPT_DIR.parent.parent / 'assets' / 'xml' / 'notas.xml'
+XML_ID = '{http://www.w3.org/XML/1998/namespace}id'
+
+CAMPOS = ('nota_id', 'version', 'target', 'type', 'subtype', 'texto_nota')
+CAMPOS_CONTENIDO = ('target', 'type', 'subtype', 'texto_nota')
+
+# Filas por sentencia INSERT; 860 notas caben en un solo lote
+TAMANO_LOTE = 1000
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS notas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nota_id TEXT NOT NULL,
+    target TEXT NOT NULL,
+    version NUMERIC NOT NULL DEFAULT 1.0,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    type TEXT NOT NULL,
+    subtype TEXT,
+    texto_nota TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (nota_id, version)
+)
+"""
+
+_ESPACIOS = re.compile(r'\s+')
+
+
+def normalizar_version(valor):
+    """Versión como en la columna numeric(4,1): '1.0', '2.5'"""
+    return f'{float(valor):.1f}'
+
+
+def hash_contenido(fila):
+    """SHA-256 de los campos de contenido de una nota"""
+    datos = json.dumps([fila.get(c) for c in CAMPOS_CONTENIDO], ensure_ascii=False)
+    return hashlib.sha256(datos.encode('utf-8')).hexdigest()
+
+
+def leer_notas_xml(ruta):
+    """
+    Filas de la tabla a partir de notas.xml.
+    Retorna (filas, omitidas) donde omitidas son las notas sin xml:id o
+    target y las repeticiones de un mismo (xml:id, versión).
+    """
+    # notas.xml puede tener xml:id vacíos, que no son NCName válidos
+    root = etree.parse(str(ruta), etree.XMLParser(recover=True)).getroot()
+    filas, omitidas, vistas = [], 0, set()
+    for nota in root.iter('{*}note'):
+        nota_id = (nota.get(XML_ID) or '').strip()
+        target = ' '.join(t for t in (nota.get('target') or '').split() if t.lstrip('#'))
+        version = normalizar_version(nota.get('n') or '1.0')
+        if not nota_id or not target or (nota_id, version) in vistas:
+            omitidas += 1
+            continue
+        vistas.add((nota_id, version))
+        filas.append({
+            'nota_id': nota_id,
+            'version': version,
+            'target': target,
+            'type': nota.get('type') or '',
+            'subtype': nota.get('subtype') or None,
+            'texto_nota': _ESPACIOS.sub(' ', ''.join(nota.itertext())).strip(),
+        })
+    return filas, omitidas
+
+
+# --- Conexión ------------------------------------------------------------
+
+def conectar(destino):
+    """Conexión DB-API y su marcador de parámetros ('?' en SQLite, '%s' en PostgreSQL)"""
+    if str(destino).startswith(('postgresql://', 'postgres://')):
+        try:
+            import psycopg
+        except ImportError:
+            sys.exit('Para publicar en PostgreSQL hace falta instalar psycopg (pip install psycopg)')
+        return psycopg.connect(destino), '%s'
+    return sqlite3.connect(str(destino)), '?'
+
+
+def leer_tabla(conexion):
+    """{(nota_id, version): fila} con todas las versiones de la tabla"""
+    cursor = conexion.cursor()
+    cursor.execute(f"SELECT {', '.join(CAMPOS)}, active FROM notas")
+    actuales = {}
+    for valores in cursor.fetchall():
+        fila = dict(zip(CAMPOS + ('active',), valores))
+        fila['version'] = normalizar_version(fila['version'])
+        fila['active'] = bool(fila['active'])
+        actuales[(fila['nota_id'], fila['version'])] = fila
+    return actuales
+
+
+# --- Diferencias ---------------------------------------------------------
+
+def planificar(filas, actuales, desactivar_ausentes=False):
+    """
+    Qué hay que enviar para que la tabla refleje `filas`.
+    Retorna {'nuevas', 'modificadas', 'reactivadas', 'sin_cambios', 'desactivar'}:
+    las tres primeras son filas a enviar en el upsert; 'desactivar' son las
+    claves (nota_id, version) activas que dejan de serlo.
+    """
+    plan = {'nuevas': [], 'modificadas': [], 'reactivadas': [], 'sin_cambios': 0, 'desactivar': []}
+    publicadas = {}
+    for fila in filas:
+        clave = (fila['nota_id'], fila['version'])
+        publicadas[fila['nota_id']] = fila['version']
+        actual = actuales.get(clave)
+        if actual is None:
+            plan['nuevas'].append(fila)
+        elif hash_contenido(actual) != hash_contenido(fila):
+            plan['modificadas'].append(fila)
+        elif not actual['active']:
+            plan['reactivadas'].append(fila)
+        else:
+            plan['sin_cambios'] += 1
+
+    for (nota_id, version), actual in actuales.items():
+        if not actual['active']:
+            continue
+        if nota_id in publicadas:
+            if publicadas[nota_id] != version:
+                plan['desactivar'].append((nota_id, version))
+        elif desactivar_ausentes:
+            plan['desactivar'].append((nota_id, version))
+    return plan
+
+
+def _upsert(cursor, filas, marcador):
+    fila_sql = '(' + ', '.join([marcador] * len(CAMPOS)) + ', TRUE)'
+    actualizacion = ', '.join(f'{c} = excluded.{c}' for c in CAMPOS_CONTENIDO)
+    for i in range(0, len(filas), TAMANO_LOTE):
+        lote = filas[i:i + TAMANO_LOTE]
+        parametros = [float(f[c]) if c == 'version' else f[c] for f in lote for c in CAMPOS]
+        cursor.execute(
+            f"INSERT INTO notas ({', '.join(CAMPOS)}, active) VALUES {', '.join([fila_sql] * len(lote))} "
+            f"ON CONFLICT (nota_id, version) DO UPDATE SET {actualizacion}, active = TRUE",
+            parametros)
+
+
+def _desactivar(cursor, claves, marcador):
+    for i in range(0, len(claves), TAMANO_LOTE):
+        lote = claves[i:i + TAMANO_LOTE]
+        valores = ', '.join([f'({marcador}, {marcador})'] * len(lote))
+        parametros = [v for nota_id, version in lote for v in (nota_id, float(version))]
+        cursor.execute(
+            f"WITH salientes (nota_id, version) AS (VALUES {valores}) "
+            f"UPDATE notas SET active = FALSE WHERE active AND EXISTS ("
+            f"SELECT 1 FROM salientes s WHERE s.nota_id = notas.nota_id AND s.version = notas.version)",
+            parametros)
+
+
+def aplicar_plan(conexion, plan, marcador):
+    """Envía el plan en una transacción"""
+    enviar = plan['nuevas'] + plan['modificadas'] + plan['reactivadas']
+    cursor = conexion.cursor()
+    try:
+        if plan['desactivar']:
+            _desactivar(cursor, plan['desactivar'], marcador)
+        if enviar:
+            _upsert(cursor, enviar, marcador)
+        conexion.commit()
+    except Exception:
+        conexion.rollback()
+        raise
+
+
+def publicar_notas(conexion, marcador, filas, desactivar_ausentes=False, simular=False):
+    """Sincroniza la tabla con las filas; retorna el plan ejecutado"""
+    plan = planificar(filas, leer_tabla(conexion), desactivar_ausentes)
+    if not simular:
+        aplicar_plan(conexion, plan, marcador)
+    return plan
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Publicar notas.xml en la tabla notas enviando solo los cambios')
+    p.add_argument('destino', help='Base SQLite o URL postgresql://')
+    p.add_argument('--notas', default=str(NOTAS_POR_DEFECTO), help='Archivo de notas TEI')
+    p.add_argument('--crear-tabla', action='store_true', help='Crear la tabla notas si no existe (solo SQLite)')
+    p.add_argument('--desactivar-ausentes', action='store_true',
+                   help='Desactivar las notas de la tabla que ya no están en notas.xml')
+    p.add_argument('--simular', action='store_true', help='Mostrar los cambios sin escribir en la tabla')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    filas, omitidas = leer_notas_xml(args.notas)
+    conexion, marcador = conectar(args.destino)
+
+    try:
+        if args.crear_tabla:
+            if marcador != '?':
+                sys.exit('--crear-tabla solo está disponible para SQLite')
+            conexion.execute(ESQUEMA_SQLITE)
+        t0 = time.perf_counter()
+        plan = publicar_notas(conexion, marcador, filas, args.desactivar_ausentes, args.simular)
+        segundos = time.perf_counter() - t0
+    finally:
+        conexion.close()
+
+    print(f"Notas en {args.notas}: {len(filas)} ({omitidas} omitidas: sin xml:id o target, o repetidas)")
+    print(f"  Nuevas:       {len(plan['nuevas'])}")
+    print(f"  Modificadas:  {len(plan['modificadas'])}")
+    print(f"  Reactivadas:  {len(plan['reactivadas'])}")
+    print(f"  Sin cambios:  {plan['sin_cambios']}")
+    print(f"  Desactivadas: {len(plan['desactivar'])}")
+    if args.simular:
+        print("\n(simulación: no se ha escrito nada)")
+    else:
+        print(f"\n✓ Tabla actualizada en {segundos:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resolución de pasajes por intervalos de orden de documento.
+
+Recorre el TEI una sola vez y asigna a cada elemento su ordinal en orden de
+documento (preorden), su profundidad, su padre y el ordinal de su último
+descendiente. Con eso un elemento contiene a otro si el ordinal del segundo
+cae en el intervalo del primero, y un pasaje (inicio_xmlid → fin_xmlid de la
+tabla `pasajes`) se reduce a un intervalo [primero, último]: extraer sus
+versos, parlamentos o segmentos es una búsqueda binaria, sin recorrer el
+árbol.
+
+El intervalo se calcula con las reglas de extraerFragmento() en
+assets/js/pasajes.js: si inicio y fin coinciden o el inicio contiene al fin,
+es el propio inicio; si no, se amplían a su <sp>/<stage> y se toman los hijos
+del ancestro común que van del que contiene al inicio al que contiene al fin
+(hasta el último hijo si el fin es el propio ancestro común, porque ningún
+hijo lo contiene: en JS tampoco se corta la captura).
+
+La única diferencia es el rango invertido (el fin va antes que el inicio,
+p. ej. l-100 → l-90): extraerFragmento() no encuentra el fin después del
+inicio y captura hasta el último hijo del ancestro común; aquí se rechaza
+con el motivo "rango invertido", distinto de "no existe" para un id que no
+está en la obra.
+
+Genera una tabla con, para cada pasaje, los ids de sus <l>, <sp> y <seg> y
+los ids de las notas que apuntan dentro de él.
+
+Uso:
+  python resolver_pasajes.py pasajes.json
+  python resolver_pasajes.py pasajes.csv --notas ../../assets/xml/notas.xml -o tabla_pasajes.json
+"""
+
+import argparse
+import csv
+import json
+import sys
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from lxml import etree
+
+from localizador_versos import XML_ID, nombre_local
+
+
+SCRIPT_DIR = Path(__file__).parent
+ASSETS_DIR = SCRIPT_DIR.parent.parent / 'assets'
+
+# Unidades de bloque a las que se amplía un pasaje que empieza o acaba en mitad de un parlamento
+BLOQUES = ('sp', 'stage')
+
+# Elementos cuyos ids se listan en la tabla
+TIPOS_TABLA = ('l', 'sp', 'seg')
+
+
+def normalizar_xml_id(xml_id):
+    return str(xml_id or '').strip().lstrip('#')
+
+
+def destinos_nota(nota):
+    return [t.lstrip('#') for t in (nota.get('target') or '').split() if t.lstrip('#')]
+
+
+class IndiceDocumento:
+    """Ordinal, profundidad, padre y fin de subárbol de cada elemento de un árbol"""
+
+    def __init__(self, root):
+        self.elementos = []      # ordinal -> elemento
+        self.nombres = []        # ordinal -> nombre local
+        self.padres = []         # ordinal -> ordinal del padre (-1 en la raíz)
+        self.profundidades = []  # ordinal -> profundidad (0 en la raíz)
+        self.fines = []          # ordinal -> ordinal del último descendiente
+        self.ordinal = {}        # xml:id -> ordinal
+        self.por_tipo = {}       # nombre local -> ordinales ordenados
+
+        pila = [(root, -1, 0)]
+        while pila:
+            elem, padre, profundidad = pila.pop()
+            o = len(self.elementos)
+            nombre = nombre_local(elem.tag)
+            self.elementos.append(elem)
+            self.nombres.append(nombre)
+            self.padres.append(padre)
+            self.profundidades.append(profundidad)
+            self.fines.append(o)
+            self.por_tipo.setdefault(nombre, []).append(o)
+            xml_id = elem.get(XML_ID)
+            if xml_id:
+                self.ordinal[xml_id] = o
+            hijos = [h for h in elem if isinstance(h.tag, str)]
+            for hijo in reversed(hijos):
+                pila.append((hijo, o, profundidad + 1))
+
+        # El fin de cada subárbol es el mayor fin de sus hijos; en preorden
+        # basta con propagarlo de atrás hacia delante
+        for o in range(len(self.elementos) - 1, 0, -1):
+            p = self.padres[o]
+            if self.fines[o] > self.fines[p]:
+                self.fines[p] = self.fines[o]
+
+    def __len__(self):
+        return len(self.elementos)
+
+    def contiene(self, a, b):
+        """¿El elemento de ordinal a contiene (o es) al de ordinal b?"""
+        return a <= b <= self.fines[a]
+
+    def ancestro(self, o, nombres):
+        """closest() por nombre local, en ordinales; None si no hay"""
+        while o >= 0:
+            if self.nombres[o] in nombres:
+                return o
+            o = self.padres[o]
+        return None
+
+    def subir(self, o, profundidad):
+        """Ancestro de o a la profundidad dada"""
+        while self.profundidades[o] > profundidad:
+            o = self.padres[o]
+        return o
+
+    def ancestro_comun(self, a, b):
+        profundidad = min(self.profundidades[a], self.profundidades[b])
+        a, b = self.subir(a, profundidad), self.subir(b, profundidad)
+        while a != b:
+            a, b = self.padres[a], self.padres[b]
+        return a
+
+    def intervalo(self, inicio_id, fin_id):
+        """
+        Intervalo [primero, último] de ordinales de un pasaje.
+        Retorna (intervalo, None) o, si no se resuelve, (None, motivo).
+        """
+        inicio, fin = self.ordinal.get(inicio_id), self.ordinal.get(fin_id)
+        if inicio is None or fin is None:
+            faltan = [i for i, o in ((inicio_id, inicio), (fin_id, fin)) if o is None]
+            return None, f"no existe {' ni '.join(faltan)}"
+        if self.contiene(inicio, fin):
+            return (inicio, self.fines[inicio]), None
+
+        bloque_inicio = self.ancestro(inicio, BLOQUES)
+        bloque_inicio = inicio if bloque_inicio is None else bloque_inicio
+        bloque_fin = self.ancestro(fin, BLOQUES)
+        bloque_fin = fin if bloque_fin is None else bloque_fin
+        comun = self.ancestro_comun(bloque_inicio, bloque_fin)
+
+        # Hijos del ancestro común desde el que contiene al inicio hasta el que
+        # contiene al fin (o hasta el último, si el fin es el propio ancestro)
+        profundidad = self.profundidades[comun] + 1
+        primero = self.subir(inicio, profundidad)
+        ultimo = self.fines[comun] if fin == comun else self.fines[self.subir(fin, profundidad)]
+        if primero > ultimo:
+            return None, f'rango invertido: {fin_id} va antes que {inicio_id}'
+        return (primero, ultimo), None
+
+    def raices(self, intervalo):
+        """Ordinales de los elementos de nivel superior que cubren el intervalo"""
+        primero, ultimo = intervalo
+        resultado = []
+        o = primero
+        while o <= ultimo:
+            resultado.append(o)
+            o = self.fines[o] + 1
+        return resultado
+
+    def del_tipo(self, nombre, intervalo):
+        """Ordinales de los elementos con ese nombre local dentro del intervalo"""
+        ordinales = self.por_tipo.get(nombre, [])
+        return ordinales[bisect_left(ordinales, intervalo[0]):bisect_right(ordinales, intervalo[1])]
+
+    def ids(self, intervalo):
+        """xml:id de todos los elementos del intervalo, en orden de documento"""
+        return [i for i in (self.elementos[o].get(XML_ID) for o in range(intervalo[0], intervalo[1] + 1)) if i]
+
+
+def indice_notas(notas_root):
+    """{id de destino: [id de nota, ...]} en orden de documento"""
+    indice = {}
+    for nota in notas_root.iter('{*}note'):
+        nota_id = nota.get(XML_ID)
+        if not nota_id:
+            continue
+        for destino in destinos_nota(nota):
+            indice.setdefault(destino, []).append(nota_id)
+    return indice
+
+
+def notas_del_intervalo(indice, intervalo, notas_por_destino):
+    """Ids de las notas que apuntan a algún elemento del intervalo, sin repetir"""
+    vistas = set()
+    notas = []
+    for xml_id in indice.ids(intervalo):
+        for nota_id in notas_por_destino.get(xml_id, ()):
+            if nota_id not in vistas:
+                vistas.add(nota_id)
+                notas.append(nota_id)
+    return notas
+
+
+def resolver_pasaje(indice, pasaje, notas_por_destino=None):
+    """
+    Entrada de la tabla para una fila de `pasajes`.
+    Retorna (entrada, None) o, si no se resuelve, (None, motivo).
+    """
+    inicio_id = normalizar_xml_id(pasaje['inicio_xmlid'])
+    fin_id = normalizar_xml_id(pasaje['fin_xmlid'])
+    intervalo, motivo = indice.intervalo(inicio_id, fin_id)
+    if intervalo is None:
+        return None, motivo
+
+    entrada = {
+        'orden': int(pasaje['orden']),
+        'id': pasaje.get('id'),
+        'acto': pasaje.get('acto'),
+        'titulo': pasaje.get('titulo'),
+        'inicio_xmlid': inicio_id,
+        'fin_xmlid': fin_id,
+        'intervalo': list(intervalo),
+        'profundidad': indice.profundidades[intervalo[0]],
+        'raices': [indice.elementos[o].get(XML_ID) for o in indice.raices(intervalo)],
+    }
+    for nombre in TIPOS_TABLA:
+        entrada[nombre] = [indice.elementos[o].get(XML_ID) for o in indice.del_tipo(nombre, intervalo)
+                           if indice.elementos[o].get(XML_ID)]
+    if notas_por_destino is not None:
+        entrada['notas'] = notas_del_intervalo(indice, intervalo, notas_por_destino)
+    return entrada, None
+
+
+def tabla_pasajes(indice, pasajes, notas_root=None):
+    """
+    Tabla {orden: entrada} de los pasajes que se resuelven y lista de los
+    que no, cada uno con su `motivo`.
+    """
+    notas_por_destino = indice_notas(notas_root) if notas_root is not None else None
+    tabla, fallidos = {}, []
+    for pasaje in pasajes:
+        entrada, motivo = resolver_pasaje(indice, pasaje, notas_por_destino)
+        if entrada is None:
+            fallidos.append(dict(pasaje, motivo=motivo))
+        else:
+            tabla[str(entrada['orden'])] = entrada
+    return tabla, fallidos
+
+
+def cargar_pasajes(ruta):
+    """Filas activas de una exportación de la tabla pasajes (JSON o CSV), ordenadas por `orden`"""
+    ruta = Path(ruta)
+    if ruta.suffix.lower() == '.csv':
+        with open(ruta, 'r', encoding='utf-8', newline='') as f:
+            filas = list(csv.DictReader(f))
+    else:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            filas = json.load(f)
+    activas = [p for p in filas if str(p.get('active', True)).lower() not in ('false', 'f', '0')]
+    return sorted(activas, key=lambda p: int(p['orden']))
+
+
+def cargar_notas(notas_file):
+    # notas.xml puede tener xml:id vacíos, que no son NCName válidos
+    return etree.parse(str(notas_file), etree.XMLParser(recover=True)).getroot()
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Resolver los pasajes a intervalos y generar su tabla de ids y notas')
+    p.add_argument('pasajes', help='Exportación de la tabla pasajes (JSON o CSV)')
+    p.add_argument('--xml', default=str(ASSETS_DIR / 'xml' / 'fuenteovejuna.xml'), help='XML TEI de la obra')
+    p.add_argument('--notas', default=str(ASSETS_DIR / 'xml' / 'notas.xml'), help='Archivo de notas TEI')
+    p.add_argument('-o', '--output', default='tabla_pasajes.json', help='Archivo JSON de salida')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    indice = IndiceDocumento(etree.parse(args.xml).getroot())
+    tabla, fallidos = tabla_pasajes(indice, cargar_pasajes(args.pasajes), cargar_notas(args.notas))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(tabla, f, ensure_ascii=False, indent=2)
+
+    print(f"✓ {len(tabla)} pasajes resueltos sobre {len(indice)} elementos → {args.output}")
+    for pasaje in fallidos:
+        print(f"  ✗ Pasaje {pasaje['orden']} ({pasaje['inicio_xmlid']} → {pasaje['fin_xmlid']}): "
+              f"{pasaje['motivo']}", file=sys.stderr)
+    if fallidos:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
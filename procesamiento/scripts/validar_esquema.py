@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validación RelaxNG de la obra y las notas contra tei_all.
+
+El esquema se lee de una copia local (nunca de la red): por defecto
+procesamiento/esquemas/tei_all.rng, o el archivo con el mismo nombre que el
+href del <?xml-model?> del documento. Se puede descargar de
+https://tei-c.org/release/xml/tei/custom/schema/relaxng/tei_all.rng
+
+Compilar tei_all es lo caro, así que:
+  - el esquema se compila una sola vez por proceso y los procesos de
+    validación lo heredan ya compilado;
+  - los resultados se guardan en una caché en disco por hash del esquema y
+    del documento, de modo que un archivo que no ha cambiado no se vuelve a
+    validar y, si no hay ninguno nuevo, ni siquiera se compila el esquema.
+
+Los archivos se validan en paralelo y cada error se acompaña del xml:id del
+elemento más cercano que lo tiene (o de su posición, p. ej. «note 220», si
+su xml:id está vacío), para localizarlo sin contar líneas.
+
+pipeline.py y lote.py lo usan con --esquema como comprobación opcional tras
+escribir.
+
+Uso:
+  python validar_esquema.py
+  python validar_esquema.py ../../assets/xml/fuenteovejuna.xml ../../assets/xml/notas.xml
+  python validar_esquema.py --esquema /ruta/tei_all.rng --sin-cache
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from lxml import etree
+
+from cache_construccion import hash_archivo
+from localizador_versos import XML_ID, nombre_local
+
+
+SCRIPT_DIR = Path(__file__).parent
+PROCESAMIENTO_DIR = SCRIPT_DIR.parent
+ESQUEMAS_DIR = PROCESAMIENTO_DIR / 'esquemas'
+ESQUEMA_POR_DEFECTO = ESQUEMAS_DIR / 'tei_all.rng'
+CACHE_POR_DEFECTO = PROCESAMIENTO_DIR / '.cache' / 'relaxng.json'
+ARCHIVOS_POR_DEFECTO = [PROCESAMIENTO_DIR.parent / 'assets' / 'xml' / 'fuenteovejuna.xml',
+                        PROCESAMIENTO_DIR.parent / 'assets' / 'xml' / 'notas.xml']
+
+# Errores por archivo que se guardan en el informe
+MAX_ERRORES = 200
+
+# libxml2 deja de informar de errores de parseo tras los primeros 100: con
+# esa cifra el recuento es solo un mínimo
+LIMITE_ERRORES_PARSER = 100
+
+# Forma de los resultados guardados; cambiarla invalida la caché
+VERSION_CACHE = 2
+
+# Esquemas compilados en este proceso, por ruta
+_compilados = {}
+
+
+def esquema_declarado(ruta):
+    """Copia local del esquema del <?xml-model?> del documento, si existe"""
+    with open(ruta, 'rb') as f:
+        cabecera = f.read(4096)
+    try:
+        inicio = cabecera.index(b'<?xml-model')
+        fin = cabecera.index(b'?>', inicio)
+    except ValueError:
+        return None
+    pi = etree.fromstring(b'<r>' + cabecera[inicio:fin + 2] + b'</r>')[0]
+    href = pi.get('href')
+    if not href:
+        return None
+    local = ESQUEMAS_DIR / href.rstrip('/').rsplit('/', 1)[-1]
+    return local if local.exists() else None
+
+
+def compilar(esquema):
+    """RelaxNG compilado (una vez por proceso), sin acceso a la red"""
+    clave = str(Path(esquema).resolve())
+    if clave not in _compilados:
+        parser = etree.XMLParser(no_network=True)
+        _compilados[clave] = etree.RelaxNG(etree.parse(clave, parser))
+    return _compilados[clave]
+
+
+def contexto_ids(tree):
+    """
+    {línea: referencia} del elemento (o su ancestro) que empieza en cada
+    línea: su xml:id o, si lo tiene vacío, su posición (p. ej. «note 220»)
+    """
+    contexto = {}
+    posiciones = {}
+    cuentas = Counter()
+    for elem in tree.iter():
+        if not isinstance(elem.tag, str):
+            continue
+        nombre = nombre_local(elem.tag)
+        cuentas[nombre] += 1
+        if elem.get(XML_ID) == '':
+            posiciones[elem] = f'{nombre} {cuentas[nombre]}'
+        if elem.sourceline in contexto:
+            continue
+        ancestro = elem
+        while ancestro is not None and ancestro.get(XML_ID) is None:
+            ancestro = ancestro.getparent()
+        contexto[elem.sourceline] = (ancestro.get(XML_ID) or posiciones[ancestro]) if ancestro is not None else None
+    return contexto
+
+
+def _xml_id_cercano(contexto, linea):
+    """Referencia del elemento de la línea o, si no la hay, del más cercano anterior"""
+    while linea > 0:
+        if linea in contexto and contexto[linea]:
+            return contexto[linea]
+        linea -= 1
+    return None
+
+
+def validar_documento(ruta, esquema):
+    """
+    Valida un archivo; retorna {'valido', 'errores': [{linea, columna, mensaje, xml_id}]}
+    y, si no es válido, 'total_errores' y 'truncado' cuando el parser dejó de
+    informar (el total es entonces un mínimo)
+    """
+    # notas.xml puede tener xml:id vacíos, que no son NCName válidos: se
+    # recupera el árbol para validarlo y esos errores del parser se informan
+    # junto a los del esquema
+    parser = etree.XMLParser(no_network=True, recover=True)
+    tree = etree.parse(str(ruta), parser)
+    relaxng = compilar(esquema)
+    valido = relaxng.validate(tree)
+    errores_parser = list(parser.error_log)
+    registro = errores_parser + list(relaxng.error_log)
+    if valido and not registro:
+        return {'valido': True, 'errores': []}
+
+    contexto = contexto_ids(tree)
+    errores = [{'linea': e.line, 'columna': e.column, 'mensaje': e.message,
+                'xml_id': _xml_id_cercano(contexto, e.line)}
+               for e in registro[:MAX_ERRORES]]
+    resultado = {'valido': False, 'errores': errores, 'total_errores': len(registro)}
+    if len(errores_parser) >= LIMITE_ERRORES_PARSER:
+        resultado['truncado'] = True
+    return resultado
+
+
+def _validar_tarea(tarea):
+    ruta, esquema = tarea
+    t0 = time.perf_counter()
+    resultado = validar_documento(ruta, esquema)
+    resultado['segundos'] = time.perf_counter() - t0
+    return resultado
+
+
+def cargar_cache(ruta):
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def guardar_cache(cache, ruta):
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    temporal.replace(ruta)
+
+
+def validar_archivos(rutas, esquema=None, cache_file=CACHE_POR_DEFECTO, procesos=None):
+    """
+    Valida los archivos contra su esquema local.
+    Retorna {ruta: resultado}; cada resultado indica además si salió de la caché.
+    """
+    tareas = []
+    for ruta in rutas:
+        esquema_archivo = Path(esquema) if esquema else (esquema_declarado(ruta) or ESQUEMA_POR_DEFECTO)
+        if not esquema_archivo.exists():
+            raise FileNotFoundError(f'No existe el esquema {esquema_archivo} (descárgalo una vez; '
+                                    f'la validación no accede a la red)')
+        tareas.append((str(ruta), str(esquema_archivo)))
+
+    cache = cargar_cache(cache_file) if cache_file else {}
+    resultados, pendientes, claves = {}, [], {}
+    for ruta, esquema_archivo in tareas:
+        clave = f'v{VERSION_CACHE}:{hash_archivo(esquema_archivo)}:{hash_archivo(ruta)}'
+        claves[ruta] = clave
+        if clave in cache:
+            resultados[ruta] = dict(cache[clave], cache=True)
+        else:
+            pendientes.append((ruta, esquema_archivo))
+
+    if pendientes:
+        # Se compila antes de crear los procesos para que lo hereden ya compilado
+        for esquema_archivo in {e for _, e in pendientes}:
+            compilar(esquema_archivo)
+        if len(pendientes) == 1 or procesos == 1:
+            calculados = map(_validar_tarea, pendientes)
+        else:
+            contexto = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=procesos or len(pendientes), mp_context=contexto) as pool:
+                calculados = list(pool.map(_validar_tarea, pendientes))
+        for (ruta, _), resultado in zip(pendientes, calculados):
+            resultados[ruta] = dict(resultado, cache=False)
+            cache[claves[ruta]] = {k: v for k, v in resultado.items() if k != 'segundos'}
+        if cache_file:
+            guardar_cache(cache, cache_file)
+
+    return {ruta: resultados[ruta] for ruta, _ in tareas}
+
+
+def mostrar(resultados, max_errores=20):
+    for ruta, r in resultados.items():
+        origen = ' (caché)' if r.get('cache') else f" ({r.get('segundos', 0):.2f} s)"
+        if r['valido']:
+            print(f"  ✓ {ruta}: válido{origen}")
+            continue
+        total = r.get('total_errores', len(r['errores']))
+        if r.get('truncado'):
+            print(f"  ✗ {ruta}: al menos {total} errores (el parser deja de informar tras "
+                  f"{LIMITE_ERRORES_PARSER}){origen}")
+        else:
+            print(f"  ✗ {ruta}: {total} errores{origen}")
+        for e in r['errores'][:max_errores]:
+            donde = f" [{e['xml_id']}]" if e.get('xml_id') else ''
+            print(f"      línea {e['linea']}{donde}: {e['mensaje']}")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Validar la obra y las notas contra tei_all (RelaxNG) con caché')
+    p.add_argument('archivos', nargs='*', default=[str(r) for r in ARCHIVOS_POR_DEFECTO],
+                   help='Archivos XML (default: fuenteovejuna.xml y notas.xml)')
+    p.add_argument('--esquema', help=f'Esquema RelaxNG local (default: el del xml-model en {ESQUEMAS_DIR}, '
+                                     f'o {ESQUEMA_POR_DEFECTO.name})')
+    p.add_argument('--cache', default=str(CACHE_POR_DEFECTO), help='Archivo de caché de resultados')
+    p.add_argument('--sin-cache', action='store_true', help='Validar siempre, sin leer ni escribir la caché')
+    p.add_argument('--procesos', type=int, help='Procesos en paralelo (default: uno por archivo)')
+    p.add_argument('-o', '--output', help='Guardar los resultados en JSON')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    t0 = time.perf_counter()
+    try:
+        resultados = validar_archivos(args.archivos, args.esquema, None if args.sin_cache else args.cache,
+                                      args.procesos)
+    except (OSError, etree.LxmlError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(2)
+
+    print("=== Validación RelaxNG ===\n")
+    mostrar(resultados)
+    print(f"\nTiempo total: {time.perf_counter() - t0:.2f} s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"✓ Resultados guardados en: {args.output}")
+
+    if not all(r['valido'] for r in resultados.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validación de la integridad referencial entre la obra, las notas y los pasajes.
+
+Recorre cada archivo una sola vez en streaming (iterparse) y reúne conjuntos
+de ids por tipo de elemento; después comprueba las referencias con
+operaciones de conjuntos:
+
+  - ids repetidos en la obra y en notas.xml;
+  - cada target de notas.xml apunta a un id de la obra, y los #seg-… a un
+    <seg> y los #l-… a un <l>;
+  - los <l> tienen xml:id con la forma l-N (o l-N-a, l-N-b… las partes de
+    un verso partido, con el mismo N y sufijos en orden de aparición); un
+    id que no coincide con el @n actual (p. ej. tras insertar un verso,
+    porque los ids existentes no se renumeran) es solo un aviso;
+  - cada sp/@who apunta a un <person> o <personGrp> de particDesc;
+  - con --pasajes, los inicio_xmlid/fin_xmlid de la tabla pasajes existen.
+
+Las notas aún sin enlazar (target "#" o xml:id vacío) se cuentan como
+avisos, no como errores.
+
+Genera un informe JSON y termina con código 1 si hay errores. El pipeline lo
+usa con --validar para comprobar el árbol después de cada etapa.
+
+Uso:
+  python validar_referencias.py
+  python validar_referencias.py ../../assets/xml/fuenteovejuna.xml --notas ../../assets/xml/notas.xml
+  python validar_referencias.py --pasajes pasajes.json -o informe_referencias.json
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from lxml import etree
+
+from localizador_versos import XML_ID, nombre_local
+from motor_versos import SecuenciaVersos
+
+
+SCRIPT_DIR = Path(__file__).parent
+ASSETS_DIR = SCRIPT_DIR.parent.parent / 'assets'
+
+# Prefijo de id -> elemento al que debe apuntar un target con ese prefijo
+TIPO_POR_PREFIJO = {'seg-': 'seg', 'l-': 'l'}
+PERSONAS = ('person', 'personGrp')
+PATRON_L_COMPLETO = re.compile(r'l-\d+')
+PATRON_L_PARTE = re.compile(r'l-(\d+)-([a-z])')
+
+
+def recorrer(ruta, visitar, recover=False):
+    """Llama a visitar(elem) con cada elemento al abrirse y lo vacía al cerrarse"""
+    for evento, elem in etree.iterparse(str(ruta), events=('start', 'end'), recover=recover):
+        if evento == 'start':
+            visitar(elem)
+        else:
+            elem.clear(keep_tail=True)
+
+
+def _referencias(valor):
+    """Ids de un atributo de punteros ("#a #b") sin '#'"""
+    return [t[1:] if t.startswith('#') else t for t in (valor or '').split() if t.lstrip('#')]
+
+
+class IndiceObra:
+    """Ids de la obra por tipo, punteros @who y versos, reunidos elemento a elemento"""
+
+    def __init__(self):
+        self.ids = Counter()                # xml:id -> apariciones
+        self.tipo = {}                      # xml:id -> nombre local
+        self.personas = set()
+        self.who = []                       # (id del sp, [ids])
+        self.versos = []                    # (xml:id, n, part)
+
+    def visitar(self, elem):
+        nombre = nombre_local(elem.tag)
+        xml_id = elem.get(XML_ID)
+        if xml_id:
+            self.ids[xml_id] += 1
+            self.tipo.setdefault(xml_id, nombre)
+            if nombre in PERSONAS:
+                self.personas.add(xml_id)
+        if nombre == 'sp':
+            self.who.append((xml_id, _referencias(elem.get('who'))))
+        elif nombre == 'l':
+            self.versos.append((xml_id, elem.get('n'), elem.get('part')))
+
+    @classmethod
+    def desde_arbol(cls, root):
+        indice = cls()
+        for elem in root.iter():
+            if isinstance(elem.tag, str):
+                indice.visitar(elem)
+        return indice
+
+    @classmethod
+    def desde_archivo(cls, ruta):
+        indice = cls()
+        recorrer(ruta, indice.visitar)
+        return indice
+
+
+class IndiceNotas:
+    """Ids y targets de notas.xml"""
+
+    def __init__(self):
+        self.ids = Counter()
+        self.targets = []                   # (id de la nota, [ids])
+        self.sin_enlazar = []               # ids (o número de orden) de notas sin target o sin id
+
+    def visitar(self, elem):
+        if nombre_local(elem.tag) != 'note':
+            return
+        xml_id = elem.get(XML_ID)
+        destinos = _referencias(elem.get('target'))
+        if not xml_id or not destinos:
+            self.sin_enlazar.append(xml_id or f'#{len(self.targets) + len(self.sin_enlazar) + 1}')
+            return
+        self.ids[xml_id] += 1
+        self.targets.append((xml_id, destinos))
+
+    @classmethod
+    def desde_archivo(cls, ruta):
+        indice = cls()
+        # notas.xml puede tener xml:id vacíos, que no son NCName válidos
+        recorrer(ruta, indice.visitar, recover=True)
+        return indice
+
+
+def ids_esperados_versos(versos):
+    """
+    xml:id que debería tener cada verso según la convención de
+    motor_versos.py: l-N para los completos y l-N-a, l-N-b… por orden para
+    las partes.
+    """
+    secuencia = SecuenciaVersos()
+    return [secuencia.id_para(n, part)[1] for _, n, part in versos]
+
+
+def _problema(tipo, severidad, **datos):
+    return {'tipo': tipo, 'severidad': severidad, **datos}
+
+
+def comprobar(obra, notas=None, pasajes=()):
+    """Lista de problemas encontrados (dicts con tipo, severidad y contexto)"""
+    problemas = []
+
+    for xml_id, veces in obra.ids.items():
+        if veces > 1:
+            problemas.append(_problema('id_duplicado', 'error', archivo='obra', id=xml_id, veces=veces))
+
+    # Versos: presencia de id, forma y orden de las partes. Los ids no se
+    # renumeran al insertar versos, así que el desfase con @n es un aviso
+    partido = None      # (N, último sufijo) del verso partido en curso
+    for (xml_id, n, part), esperado in zip(obra.versos, ids_esperados_versos(obra.versos)):
+        if not xml_id:
+            problemas.append(_problema('l_sin_id', 'error', n=n, part=part, esperado=esperado))
+            continue
+        if esperado is None:
+            problemas.append(_problema('l_sin_numero', 'error', id=xml_id))
+            continue
+        forma = PATRON_L_PARTE.fullmatch(xml_id) if part else PATRON_L_COMPLETO.fullmatch(xml_id)
+        if forma is None:
+            problemas.append(_problema('l_id_forma', 'error', id=xml_id, esperado=esperado, n=n, part=part))
+            partido = None
+            continue
+        if part:
+            if part != 'I' and partido is not None and (forma.group(1) != partido[0] or forma.group(2) <= partido[1]):
+                problemas.append(_problema('l_id_orden_partes', 'error', id=xml_id, anterior=f'l-{partido[0]}-{partido[1]}',
+                                           part=part))
+            partido = forma.groups()
+        else:
+            partido = None
+        if xml_id != esperado:
+            problemas.append(_problema('l_id_convencion', 'aviso', id=xml_id, esperado=esperado, n=n, part=part))
+
+    # sp/@who → particDesc
+    for sp_id, quienes in obra.who:
+        if not quienes:
+            problemas.append(_problema('sp_sin_who', 'aviso', id=sp_id))
+        for quien in set(quienes) - obra.personas:
+            problemas.append(_problema('who_inexistente', 'error', id=sp_id, who=quien))
+
+    if notas is not None:
+        for xml_id, veces in notas.ids.items():
+            if veces > 1:
+                problemas.append(_problema('id_duplicado', 'error', archivo='notas', id=xml_id, veces=veces))
+        for nota_id in notas.sin_enlazar:
+            problemas.append(_problema('nota_sin_enlazar', 'aviso', id=nota_id))
+
+        ids_obra = obra.ids.keys()
+        for nota_id, destinos in notas.targets:
+            for destino in set(destinos) - ids_obra:
+                problemas.append(_problema('target_inexistente', 'error', id=nota_id, target=destino))
+            for destino in set(destinos) & ids_obra:
+                tipo = next((t for p, t in TIPO_POR_PREFIJO.items() if destino.startswith(p)), None)
+                if tipo and obra.tipo[destino] != tipo:
+                    problemas.append(_problema('target_tipo', 'error', id=nota_id, target=destino,
+                                               esperado=tipo, encontrado=obra.tipo[destino]))
+
+    for pasaje in pasajes:
+        for campo in ('inicio_xmlid', 'fin_xmlid'):
+            destino = str(pasaje.get(campo) or '').strip().lstrip('#')
+            if destino not in obra.ids:
+                problemas.append(_problema('pasaje_id_inexistente', 'error', orden=pasaje.get('orden'),
+                                           campo=campo, target=destino))
+    return problemas
+
+
+def informe(problemas, archivos, segundos):
+    """Informe JSON: resumen por tipo y lista de problemas"""
+    por_tipo = Counter(p['tipo'] for p in problemas)
+    return {
+        'archivos': {k: str(v) for k, v in archivos.items() if v},
+        'segundos': round(segundos, 4),
+        'errores': sum(1 for p in problemas if p['severidad'] == 'error'),
+        'avisos': sum(1 for p in problemas if p['severidad'] == 'aviso'),
+        'por_tipo': dict(sorted(por_tipo.items())),
+        'problemas': problemas,
+    }
+
+
+def validar_archivos(xml_file, notas_file=None, pasajes_file=None):
+    """Valida los archivos y retorna el informe"""
+    t0 = time.perf_counter()
+    obra = IndiceObra.desde_archivo(xml_file)
+    notas = IndiceNotas.desde_archivo(notas_file) if notas_file else None
+    pasajes = ()
+    if pasajes_file:
+        from resolver_pasajes import cargar_pasajes
+        pasajes = cargar_pasajes(pasajes_file)
+    problemas = comprobar(obra, notas, pasajes)
+    return informe(problemas, {'obra': xml_file, 'notas': notas_file, 'pasajes': pasajes_file},
+                   time.perf_counter() - t0)
+
+
+def claves_errores(root, notas_file=None):
+    """
+    Conjunto de errores del árbol en memoria (para comparar antes y después
+    de una etapa del pipeline).
+    """
+    notas = IndiceNotas.desde_archivo(notas_file) if notas_file else None
+    problemas = comprobar(IndiceObra.desde_arbol(root), notas)
+    return {json.dumps(p, sort_keys=True, ensure_ascii=False) for p in problemas if p['severidad'] == 'error'}
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Comprobar las referencias cruzadas entre la obra, las notas y los pasajes')
+    p.add_argument('xml', nargs='?', default=str(ASSETS_DIR / 'xml' / 'fuenteovejuna.xml'), help='XML TEI de la obra')
+    p.add_argument('--notas', default=str(ASSETS_DIR / 'xml' / 'notas.xml'), help='Archivo de notas TEI')
+    p.add_argument('--sin-notas', action='store_true', help='No comprobar notas.xml')
+    p.add_argument('--pasajes', help='Exportación de la tabla pasajes (JSON o CSV)')
+    p.add_argument('-o', '--output', help='Guardar el informe JSON en este archivo (default: salida estándar)')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        resultado = validar_archivos(args.xml, None if args.sin_notas else args.notas, args.pasajes)
+    except (OSError, etree.XMLSyntaxError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(2)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"{resultado['errores']} errores, {resultado['avisos']} avisos ({resultado['segundos']:.3f} s)")
+        for tipo, cantidad in resultado['por_tipo'].items():
+            print(f"  {tipo:24s} {cantidad}")
+        print(f"✓ Informe guardado en: {args.output}")
+    else:
+        json.dump(resultado, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if resultado['errores']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()